@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'crawl_jobs',
+        sa.Column('id', sa.String(length=36), primary_key=True, nullable=False),
+        sa.Column('owner_email', sa.String(length=255), sa.ForeignKey('accounts.email'), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('max_articles', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('status', sa.Enum('pending', 'running', 'succeeded', 'failed', name='crawl_job_status'), nullable=False, server_default='pending'),
+        sa.Column('mp_account', sa.String(length=255), nullable=True),
+        sa.Column('event_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('error', sa.String(length=1024), nullable=True),
+        sa.Column('create_time', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('update_time', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finish_time', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_crawl_jobs_owner', 'crawl_jobs', ['owner_email'])
+    op.create_index('ix_crawl_jobs_status', 'crawl_jobs', ['status'])
+
+    op.create_table(
+        'crawl_job_events',
+        sa.Column('job_id', sa.String(length=36), sa.ForeignKey('crawl_jobs.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('seq', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('create_time', sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('crawl_job_events')
+    op.drop_index('ix_crawl_jobs_status', table_name='crawl_jobs')
+    op.drop_index('ix_crawl_jobs_owner', table_name='crawl_jobs')
+    op.drop_table('crawl_jobs')
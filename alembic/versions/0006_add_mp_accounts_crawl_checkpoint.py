@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    crawl_state = sa.Enum('backfilling', 'complete', name='mp_crawl_state')
+    # PostgreSQL 需先创建枚举类型；其它方言为 no-op
+    crawl_state.create(op.get_bind(), checkfirst=True)
+    # 存量账号无法判断是否回填完整，视为 complete（仍走增量）
+    op.add_column('mp_accounts', sa.Column('crawl_state', crawl_state, nullable=False, server_default='complete'))
+    op.add_column('mp_accounts', sa.Column('crawl_offset', sa.Integer(), nullable=True))
+    op.add_column('mp_accounts', sa.Column('crawl_total', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('mp_accounts') as batch_op:
+        batch_op.drop_column('crawl_total')
+        batch_op.drop_column('crawl_offset')
+        batch_op.drop_column('crawl_state')
+    sa.Enum(name='mp_crawl_state').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cookie_rate_limits',
+        sa.Column('token', sa.String(length=128), primary_key=True, nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('refill_at', sa.Float(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('cookie_rate_limits')
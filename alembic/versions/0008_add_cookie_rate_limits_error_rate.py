@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('cookie_rate_limits', sa.Column('error_rate', sa.Float(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('cookie_rate_limits') as batch_op:
+        batch_op.drop_column('error_rate')
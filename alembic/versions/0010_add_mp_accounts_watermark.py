@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 存量账号水位线为空：下次增量抓取按 URL 判定重叠边界，并在到达边界时写入水位线
+    op.add_column('mp_accounts', sa.Column('watermark_time', sa.BigInteger(), nullable=True))
+    op.add_column('mp_accounts', sa.Column('watermark_msgid', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('mp_accounts') as batch_op:
+        batch_op.drop_column('watermark_msgid')
+        batch_op.drop_column('watermark_time')
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'mp_search_candidates',
+        sa.Column('id', sa.String(length=36), primary_key=True, nullable=False),
+        sa.Column('query', sa.String(length=255), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('nickname', sa.String(length=255), nullable=False),
+        sa.Column('fakeid', sa.String(length=64), nullable=False),
+        sa.Column('avatar_url', sa.String(length=1024), nullable=True),
+        sa.Column('signature', sa.String(length=1024), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_mp_search_candidates_query', 'mp_search_candidates', ['query', 'rank'])
+    op.create_index('ix_mp_search_candidates_nickname', 'mp_search_candidates', ['nickname'])
+    op.create_index('ix_mp_search_candidates_fakeid', 'mp_search_candidates', ['fakeid'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mp_search_candidates_fakeid', table_name='mp_search_candidates')
+    op.drop_index('ix_mp_search_candidates_nickname', table_name='mp_search_candidates')
+    op.drop_index('ix_mp_search_candidates_query', table_name='mp_search_candidates')
+    op.drop_table('mp_search_candidates')
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'avatar_cache',
+        sa.Column('url_hash', sa.String(length=64), primary_key=True, nullable=False),
+        sa.Column('url', sa.String(length=1024), nullable=False),
+        sa.Column('etag', sa.String(length=255), nullable=True),
+        sa.Column('last_modified', sa.String(length=64), nullable=True),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('path', sa.String(length=1024), nullable=True),
+        sa.Column('checked_at', sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('avatar_cache')
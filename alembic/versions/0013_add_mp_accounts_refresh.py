@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 存量账号均为空：首次调度按 update_time 计算陈旧度，探测后按近期文章估算发布间隔
+    op.add_column('mp_accounts', sa.Column('refresh_time', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('mp_accounts', sa.Column('publish_interval', sa.Integer(), nullable=True))
+    op.create_index('ix_mp_accounts_refresh_time', 'mp_accounts', ['refresh_time'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mp_accounts_refresh_time', table_name='mp_accounts')
+    with op.batch_alter_table('mp_accounts') as batch_op:
+        batch_op.drop_column('publish_interval')
+        batch_op.drop_column('refresh_time')
@@ -1,59 +1,58 @@
 from __future__ import annotations
 
-from collections.abc import Generator
+import asyncio
+from collections.abc import AsyncGenerator, Generator
 from datetime import datetime, timezone
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.config import settings
-from app.db.session import SessionLocal
+from app.api.middleware import AuthError, decode_user_id, load_user
+from app.db.session import AsyncSessionLocal, SessionLocal
 from app.models.account import Account, ActivationStatus
-from app.services.security import expand_uuid
+from app.services.principal_cache import principal_cache
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
+def get_db(request: Request) -> Generator[Session, None, None]:
+    # 复用鉴权中间件发布的会话（白名单路径上没有，则新建）
+    db = getattr(request.state, "db", None) or SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Account:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 以下依赖均为 async def 且不依赖 get_db：鉴权本身不占用线程池，async 路由全程不经过线程池
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> Account:
+    # 鉴权中间件已校验过 token 并加载了用户，直接复用
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        sub: str | None = payload.get("sub")
-        if sub is None:
-            raise credentials_exception
-        # Backward-compatible: accept both full UUID and compact base64url
-        user_id = sub
-        if len(sub) <= 24 and all(c.isalnum() or c in "-_" for c in sub):
-            try:
-                user_id = expand_uuid(sub)
-            except Exception:
-                # If expansion fails, keep original
-                user_id = sub
-    except JWTError:
-        raise credentials_exception
-
-    user = db.get(Account, user_id)
-    if user is None:
+        user_id = decode_user_id(token)
+        return principal_cache.get(user_id) or await asyncio.to_thread(load_user, SessionLocal(), user_id)
+    except (JWTError, AuthError):
         raise credentials_exception
-    return user
 
 
-def require_active_user(current_user: Account = Depends(get_current_user)) -> Account:
+async def require_active_user(current_user: Account = Depends(get_current_user)) -> Account:
     # 校验激活状态与有效期
     if current_user.activation_status != ActivationStatus.active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account not activated")
@@ -62,7 +61,7 @@ def require_active_user(current_user: Account = Depends(get_current_user)) -> Ac
     return current_user
 
 
-def require_admin_user(current_user: Account = Depends(get_current_user)) -> Account:
+async def require_admin_user(current_user: Account = Depends(get_current_user)) -> Account:
     if current_user.role.name != "admin" and getattr(current_user.role, "value", None) != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privilege required")
     return current_user
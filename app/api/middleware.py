@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.account import Account, ActivationStatus, UserRole
+from app.services.principal_cache import principal_cache
+from app.services.security import expand_uuid
+
+
+# 白名单：健康检查、文档与登录 / 注册
+WHITELISTED_PREFIXES = ("/health", "/docs")
+WHITELISTED_EXACT = {"/openapi.json", "/redoc", "/docs/oauth2-redirect", "/auth/login", "/auth/register"}
+# 未激活用户仍可调用激活接口并查看 /auth/me
+ACTIVATION_ALLOWED_PATHS = {"/activation/activate", "/auth/me"}
+
+
+class AuthError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def decode_user_id(token: str) -> str:
+    """校验 JWT 并返回用户 id（兼容完整 UUID 与 base64url 压缩形式）；失败抛 JWTError。"""
+    payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    sub = payload.get("sub")
+    if not sub:
+        raise JWTError("missing sub")
+    if len(sub) <= 24 and all(c.isalnum() or c in "-_" for c in sub):
+        try:
+            return expand_uuid(sub)
+        except Exception:
+            return sub
+    return sub
+
+
+def load_user(db: Session, user_id: str) -> Account:
+    """
+    缓存未命中时查库加载用户并写入缓存。会话在返回前关闭（归还连接），返回的是已脱离会话、属性均已加载的 Account；
+    关闭后的会话对象仍可继续使用，下游再次访问数据库时才重新签出连接。
+    """
+    generation = principal_cache.generation()
+    try:
+        user = db.get(Account, user_id)
+        if not user:
+            raise AuthError(401, "Could not validate credentials")
+        principal_cache.put(user, generation)
+        return user
+    finally:
+        db.close()
+
+
+def check_activation(user: Account, path: str) -> None:
+    # 管理员跳过激活校验
+    if user.role != UserRole.admin and path not in ACTIVATION_ALLOWED_PATHS:
+        if user.activation_status != ActivationStatus.active:
+            raise AuthError(403, "Account not activated")
+        if user.expired_time is not None and user.expired_time <= datetime.now(timezone.utc):
+            raise AuthError(403, "Activation expired")
+
+
+class AuthActivationMiddleware:
+    """
+    全局鉴权 + 激活校验（纯 ASGI）。
+    与 @app.middleware("http")（BaseHTTPMiddleware）不同，不为每个请求另起任务、不包装响应流：
+    校验通过后直接把 scope / receive / send 交给下游，流式响应（如 /gzhaccount/search/stream）原样透传。
+    用户优先取自进程内缓存（principal_cache），命中时不查库；未命中时在线程中查库，
+    会话在调用下游之前关闭，不会在整个流式响应期间占用连接。
+    校验通过后将会话与已校验的用户发布到 request.state（db / user），
+    由 get_db / get_current_user 复用：整个请求只用一个会话、只查一次用户。
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        # 放行 CORS 预检与白名单路径
+        if scope["method"].upper() == "OPTIONS" or path.startswith(WHITELISTED_PREFIXES) or path in WHITELISTED_EXACT:
+            await self.app(scope, receive, send)
+            return
+
+        error: Optional[AuthError] = None
+        db = SessionLocal()
+        auth_header = Headers(scope=scope).get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            error = AuthError(401, "Not authenticated")
+        else:
+            try:
+                user_id = decode_user_id(auth_header.split(" ", 1)[1])
+                user = principal_cache.get(user_id) or await asyncio.to_thread(load_user, db, user_id)
+                check_activation(user, path)
+            except JWTError:
+                error = AuthError(401, "Could not validate credentials")
+            except AuthError as e:
+                error = e
+        if error is not None:
+            db.close()
+            await JSONResponse(status_code=error.status_code, content={"detail": error.detail})(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        state["db"] = db
+        state["user"] = user
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # get_db 正常会关闭它；路由未依赖 get_db 时也不遗留
+            db.close()
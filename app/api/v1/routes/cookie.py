@@ -4,11 +4,14 @@ import base64
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, require_active_user
+from app.api.deps import get_async_db, get_db, require_active_user
 from app.models.account import Account
 from app.schemas.cookie import (
+    CookieBudgetOut,
+    CookieBudgetResponse,
     CookieChangeRequest,
     CookieDeleteRequest,
     CookieGetResponse,
@@ -16,6 +19,7 @@ from app.schemas.cookie import (
     CookieOut,
 )
 from app.services.cookie import CookieService, WechatLoginResult
+from app.services.rate_limit import CookieRateLimiter
 
 router = APIRouter(prefix="/cookie", tags=["cookie"])
 
@@ -70,12 +74,23 @@ def cookie_delete(payload: CookieDeleteRequest, db: Session = Depends(get_db), c
 
 
 @router.get("/list", response_model=CookieListResponse)
-def cookie_list(db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> CookieListResponse:
-    svc = CookieService(db)
-    items = svc.list_valid_cookies(owner_email=current.email)
+async def cookie_list(db: AsyncSession = Depends(get_async_db), current: Account = Depends(require_active_user)) -> CookieListResponse:
+    items = await CookieService.alist_valid_cookies(db, owner_email=current.email)
     return CookieListResponse(items=[CookieOut.model_validate(i) for i in items])
 
 
+@router.get("/budget", response_model=CookieBudgetResponse)
+def cookie_budget(db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> CookieBudgetResponse:
+    """各有效 cookie 的剩余请求额度（令牌桶，多 worker 共享）。"""
+    items = CookieService(db).list_valid_cookies(owner_email=current.email)
+    limiter = CookieRateLimiter(db)
+    out = []
+    for ck in items:
+        b = limiter.budget(ck.token)
+        out.append(CookieBudgetOut(token=ck.token, name=ck.name, capacity=b.capacity, remaining=b.remaining, queued=b.queued, wait_seconds=b.wait_seconds, error_rate=b.error_rate))
+    return CookieBudgetResponse(items=out)
+
+
 @router.get("/poll", response_model=CookieGetResponse)
 def cookie_poll(login_key: str, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> CookieGetResponse:
     """轮询扫码状态（immediate 模式）。"""
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, require_active_user
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.account import Account
+from app.models.crawl_job import CrawlJob
+from app.schemas.crawl_job import CrawlJobCreate, CrawlJobOut
+from app.services.crawl_jobs import FINISHED_STATUSES, CrawlJobService, runner
+
+router = APIRouter(prefix="/gzhaccount/jobs", tags=["gzhaccount-jobs"])
+
+
+def _enforce_job_access(user: Account, job: CrawlJob | None) -> CrawlJob:
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if user.role.name == "admin" or getattr(user.role, "value", None) == "admin":
+        return job
+    if job.owner_email != user.email:
+        raise HTTPException(status_code=403, detail="Permission denied for this job")
+    return job
+
+
+@router.post("", response_model=CrawlJobOut)
+def crawl_job_create(payload: CrawlJobCreate, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> CrawlJobOut:
+    # 立即返回任务 id，抓取由后台 worker 池执行
+    job = CrawlJobService(db).create_job(owner_email=current.email, name=payload.name, max_articles=payload.max_articles)
+    runner.submit(job.id)
+    return CrawlJobOut.model_validate(job)
+
+
+@router.get("/{job_id}", response_model=CrawlJobOut)
+def crawl_job_get(job_id: str, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> CrawlJobOut:
+    job = _enforce_job_access(current, CrawlJobService(db).get_job(job_id))
+    return CrawlJobOut.model_validate(job)
+
+
+def _poll_job(job_id: str, offset: int) -> tuple[list[str], bool]:
+    # 每次轮询使用独立的短会话，不在整个回放期间占用连接
+    db = SessionLocal()
+    try:
+        svc = CrawlJobService(db)
+        job = svc.get_job(job_id)
+        finished = job is None or job.status in FINISHED_STATUSES
+        return svc.list_events(job_id, offset=offset), finished
+    finally:
+        db.close()
+
+
+@router.get("/{job_id}/stream")
+def crawl_job_stream(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="从第几条事件（seq）开始回放"),
+    db: Session = Depends(get_db),
+    current: Account = Depends(require_active_user),
+):
+    """回放任务进度（NDJSON，每行带 seq），任务未结束时持续推送新事件；断线后可用最后的 seq+1 续读。"""
+    _enforce_job_access(current, CrawlJobService(db).get_job(job_id))
+
+    async def gen():
+        next_offset = offset
+        while True:
+            lines, finished = await asyncio.to_thread(_poll_job, job_id, next_offset)
+            for line in lines:
+                yield line + "\n"
+            next_offset += len(lines)
+            if not lines:
+                if finished:
+                    break
+                await asyncio.sleep(settings.CRAWL_JOB_POLL_SECONDS)
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
@@ -1,88 +1,160 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, require_active_user
+from app.api.deps import get_async_db, get_db, require_active_user
+from app.core.config import settings
 from app.models.account import Account
 from app.schemas.gzhaccount import (
+    GzhBatchStreamRequest,
+    GzhBizStreamRequest,
     GzhSearchRequest,
     GzhSearchResponse,
+    GzhSearchStreamRequest,
     GzhListRequest,
     GzhListResponse,
     MpAccountOut,
     MpArticleOut,
 )
-from app.services.gzhaccount import GzhAccountService
+from app.services.gzhaccount import GzhAccountService, event_to_dict
 
 router = APIRouter(prefix="/gzhaccount", tags=["gzhaccount"]) 
 
 
 @router.post("/search", response_model=GzhSearchResponse)
-def gzh_search(payload: GzhSearchRequest, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> GzhSearchResponse:
+async def gzh_search(payload: GzhSearchRequest, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> GzhSearchResponse:
+    # 异步抓取：等待上游期间不占用线程池线程
     svc = GzhAccountService(db)
     try:
-        acc, arts = svc.search_account(owner_email=current.email, name=payload.name, max_articles=payload.max_articles)
+        acc, arts = await svc.asearch_account(owner_email=current.email, name=payload.name, max_articles=payload.max_articles, prefetch=payload.prefetch, shallow=payload.shallow)
         return GzhSearchResponse(account=MpAccountOut.model_validate(acc) if acc else None, articles=[MpArticleOut.model_validate(a) for a in arts])
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/search/stream")
-def gzh_search_stream(payload: GzhSearchRequest, db: Session = Depends(get_db), current: Account = Depends(require_active_user)):
-    svc = GzhAccountService(db)
 
-    def gen():
-        import json
+def _stream_event_line(evt: dict) -> str:
+    return json.dumps(event_to_dict(evt), ensure_ascii=False) + "\n"
+
+
+async def _wait_disconnected(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(settings.STREAM_DISCONNECT_POLL_SECONDS)
+
+
+def _ndjson_response(events, request: Optional[Request] = None) -> StreamingResponse:
+    """
+    NDJSON 流式响应。传入 request 时，在等待下一条事件的同时检测客户端断开：
+    断开即取消事件生成器（抓取随之协作式停止或转交后台任务），不必等到下一次写 socket 失败。
+    """
+    async def gen():
+        watcher = asyncio.ensure_future(_wait_disconnected(request)) if request is not None else None
+        it = events.__aiter__()
+        step: Optional[asyncio.Future] = None
         try:
-            for evt in svc.stream_search(owner_email=current.email, name=payload.name, max_articles=payload.max_articles):
-                # 将 SQLAlchemy 对象转为 dict
-                def mp_account_to_dict(a):
-                    if not a:
-                        return None
-                    return {
-                        "id": a.id,
-                        "name": a.name,
-                        "biz": a.biz,
-                        "description": a.description,
-                        "category_id": a.category_id,
-                        "owner_email": a.owner_email,
-                        "create_time": a.create_time.isoformat() if a.create_time else None,
-                        "update_time": a.update_time.isoformat() if a.update_time else None,
-                        "avatar_url": a.avatar_url,
-                        "avatar": a.avatar,
-                        "article_account": a.article_account,
-                    }
-
-                def mp_article_to_dict(x):
-                    return {
-                        "id": x.id,
-                        "title": x.title,
-                        "url": x.url,
-                        "cover_url": x.cover_url,
-                        "publish_date": x.publish_date,
-                        "item_show_type": x.item_show_type,
-                        "mp_account": x.mp_account,
-                        "create_time": x.create_time.isoformat() if x.create_time else None,
-                    }
-
-                obj = dict(evt)
-                if obj.get("account") and hasattr(obj["account"], "id"):
-                    obj["account"] = mp_account_to_dict(obj["account"])
-                if obj.get("items") and obj["items"] and hasattr(obj["items"][0], "id"):
-                    obj["items"] = [mp_article_to_dict(i) for i in obj["items"]]
-                yield json.dumps(obj, ensure_ascii=False) + "\n"
+            while True:
+                step = asyncio.ensure_future(it.__anext__())
+                if watcher is not None:
+                    await asyncio.wait({step, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                    if not step.done():
+                        step.cancel()
+                        await asyncio.gather(step, return_exceptions=True)
+                        return
+                try:
+                    evt = await step
+                except StopAsyncIteration:
+                    return
+                yield _stream_event_line(evt)
         except ValueError as e:
             yield json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            # 响应任务从外部被取消时，在途的 __anext__ 仍在运行：先取消并等它结束，否则 aclose 会因生成器仍在运行而失败
+            if step is not None and not step.done():
+                step.cancel()
+                await asyncio.gather(step, return_exceptions=True)
+            await it.aclose()
 
     return StreamingResponse(gen(), media_type="application/x-ndjson")
 
 
-@router.get("/list", response_model=GzhListResponse)
-def gzh_list(name: str = Query(..., min_length=1), offset: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=50), db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> GzhListResponse:
+@router.post("/search/stream")
+def gzh_search_stream(payload: GzhSearchStreamRequest, request: Request, db: Session = Depends(get_db), current: Account = Depends(require_active_user)):
     svc = GzhAccountService(db)
+    return _ndjson_response(
+        svc.astream_search(
+            owner_email=current.email,
+            name=payload.name,
+            max_articles=payload.max_articles,
+            delta=payload.page_items == "delta",
+            final_items=payload.final_items,
+            prefetch=payload.prefetch,
+            shallow=payload.shallow,
+            handoff=payload.on_disconnect == "background",
+            backpressure=payload.backpressure,
+        ),
+        request,
+    )
+
+
+@router.post("/biz/stream")
+def gzh_biz_stream(payload: GzhBizStreamRequest, request: Request, db: Session = Depends(get_db), current: Account = Depends(require_active_user)):
+    """按 biz 直接抓取已知公众号（跳过 searchbiz，每次刷新少消耗一次 cookie 额度），事件同 /search/stream。"""
+    svc = GzhAccountService(db)
+    return _ndjson_response(
+        svc.astream_biz(
+            owner_email=current.email,
+            biz=payload.biz,
+            max_articles=payload.max_articles,
+            delta=payload.page_items == "delta",
+            final_items=payload.final_items,
+            prefetch=payload.prefetch,
+            shallow=payload.shallow,
+            handoff=payload.on_disconnect == "background",
+            backpressure=payload.backpressure,
+        ),
+        request,
+    )
+
+
+@router.post("/batch/stream")
+def gzh_batch_stream(payload: GzhBatchStreamRequest, request: Request, db: Session = Depends(get_db), current: Account = Depends(require_active_user)):
+    """批量并发抓取多个公众号（名称或 biz），NDJSON 输出各账号的进度事件（带 index / target）、summary 与最终的 batch_done。"""
+    names = [n for n in dict.fromkeys(payload.names) if n]
+    bizs = [b for b in dict.fromkeys(payload.bizs) if b]
+    total = len(names) + len(bizs)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="names 与 bizs 不能同时为空")
+    if total > settings.BATCH_MAX_TARGETS:
+        raise HTTPException(status_code=400, detail=f"单次最多 {settings.BATCH_MAX_TARGETS} 个公众号")
+    svc = GzhAccountService(db)
+    return _ndjson_response(
+        svc.astream_batch(
+            owner_email=current.email,
+            names=names,
+            bizs=bizs,
+            max_articles=payload.max_articles,
+            final_items=payload.final_items,
+            prefetch=payload.prefetch,
+            shallow=payload.shallow,
+            handoff=payload.on_disconnect == "background",
+            backpressure=payload.backpressure,
+        ),
+        request,
+    )
+
+
+@router.get("/list", response_model=GzhListResponse)
+async def gzh_list(name: str = Query(..., min_length=1), offset: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=50), db: AsyncSession = Depends(get_async_db), current: Account = Depends(require_active_user)) -> GzhListResponse:
     try:
-        items, total = svc.list_articles(owner_email=current.email, name=name, offset=offset, limit=limit)
+        items, total = await GzhAccountService.alist_articles(db, owner_email=current.email, name=name, offset=offset, limit=limit)
         return GzhListResponse(items=[MpArticleOut.model_validate(i) for i in items], total=total, name=name, offset=offset, limit=limit)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -12,12 +12,15 @@ from app.schemas.gzhaccount_admin_ops import (
     GzhAccountShowRequest,
     GzhAccountChangeRequest,
     GzhAccountDeleteRequest,
+    GzhAccountReconcileRequest,
+    GzhAccountReconcileResponse,
 )
 from app.schemas.gzhaccount import MpAccountOut
 from app.schemas.gzhaccount_list import (
     AccountListQuery, AccountListResponse,
     ArticleListQuery, ArticleListResponse,
 )
+from app.services.gzhaccount import GzhAccountService
 
 
 router = APIRouter(prefix="/gzhaccount", tags=["gzhaccount-admin"]) 
@@ -102,6 +105,15 @@ def gzh_account_delete(payload: GzhAccountDeleteRequest, db: Session = Depends(g
     return {"status": "ok", "deleted": acc.id}
 
 
+@router.post("/reconcile", response_model=GzhAccountReconcileResponse)
+def gzh_account_reconcile(payload: GzhAccountReconcileRequest, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> GzhAccountReconcileResponse:
+    # 按实际文章数修正 article_account；普通用户仅修正自己的账号
+    is_admin = current.role.name == "admin" or getattr(current.role, "value", None) == "admin"
+    svc = GzhAccountService(db)
+    fixed = svc.reconcile_article_counts(name=payload.name, owner_email=None if is_admin else current.email)
+    return GzhAccountReconcileResponse(status="ok", fixed=fixed)
+
+
 @router.post("/list", response_model=AccountListResponse)
 def gzh_account_list(payload: AccountListQuery, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> AccountListResponse:
     # 可按 name/biz 精确过滤；普通用户自动限定 owner_email；管理员可传 owner_email 明确过滤
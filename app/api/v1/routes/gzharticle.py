@@ -2,9 +2,10 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select, or_, and_, delete, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, require_active_user
+from app.api.deps import get_async_db, get_db, require_active_user
 from app.models.account import Account, UserRole
 from app.models.mp_article import MpArticle
 from app.models.mp_account import MpAccount
@@ -23,24 +24,44 @@ def _article_selector_stmt(payload: GzhArticleChangeRequest):
     raise ValueError("必须提供 id 或 url 其中之一")
 
 
+def _is_admin(user: Account) -> bool:
+    return user.role.name == "admin" or getattr(user.role, "value", None) == "admin"
+
+
+def _check_article_owner(user: Account, owner_email: str | None) -> None:
+    if owner_email != user.email:
+        raise HTTPException(status_code=403, detail="Permission denied for this article")
+
+
 def _enforce_article_access(user: Account, article: MpArticle | None, db: Session) -> None:
-    if user.role.name == "admin" or getattr(user.role, "value", None) == "admin":
-        return
     # 普通用户：只允许操作自己的文章（通过 mp_account -> MpAccount.owner_email 校验）
-    if not article:
+    if _is_admin(user) or not article:
         return
-    acc = db.scalar(select(MpAccount).where(MpAccount.name == article.mp_account))
-    if not acc or acc.owner_email != user.email:
-        raise HTTPException(status_code=403, detail="Permission denied for this article")
+    _check_article_owner(user, db.scalar(select(MpAccount.owner_email).where(MpAccount.name == article.mp_account)))
+
+
+async def _aenforce_article_access(user: Account, article: MpArticle | None, db: AsyncSession) -> None:
+    if _is_admin(user) or not article:
+        return
+    _check_article_owner(user, await db.scalar(select(MpAccount.owner_email).where(MpAccount.name == article.mp_account)))
+
+
+def _adjust_article_count(db: Session, account_name: str, delta: int) -> None:
+    db.execute(
+        update(MpAccount)
+        .where(MpAccount.name == account_name)
+        .values(article_account=MpAccount.article_account + delta)
+        .execution_options(synchronize_session=False)
+    )
 
 
 @router.post("/show", response_model=MpArticleOut)
-def gzh_article_show(payload: GzhArticleChangeRequest, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> MpArticleOut:
+async def gzh_article_show(payload: GzhArticleChangeRequest, db: AsyncSession = Depends(get_async_db), current: Account = Depends(require_active_user)) -> MpArticleOut:
     stmt = _article_selector_stmt(payload)
-    obj = db.scalar(stmt)
+    obj = await db.scalar(stmt)
     if not obj:
         raise HTTPException(status_code=404, detail="Article not found")
-    _enforce_article_access(current, obj, db)
+    await _aenforce_article_access(current, obj, db)
     return MpArticleOut.model_validate(obj)
 
 
@@ -73,6 +94,11 @@ def gzh_article_change(payload: GzhArticleChangeRequest, db: Session = Depends(g
             if target.owner_email != current.email:
                 raise HTTPException(status_code=403, detail="Cannot move article to account not owned by you")
 
+    # 文章改挂账号时同步两边的 article_account 计数
+    if "mp_account" in updatable and updatable["mp_account"] != obj.mp_account:
+        _adjust_article_count(db, obj.mp_account, -1)
+        _adjust_article_count(db, updatable["mp_account"], 1)
+
     for k, v in updatable.items():
         setattr(obj, k, v)
     db.add(obj)
@@ -91,12 +117,13 @@ def gzh_article_delete(payload: GzhArticleChangeRequest, db: Session = Depends(g
     _enforce_article_access(current, obj, db)
 
     db.delete(obj)
+    _adjust_article_count(db, obj.mp_account, -1)
     db.commit()
     return {"status": "ok", "deleted": obj.id}
 
 
 @router.post("/list", response_model=ArticleListResponse)
-def gzh_article_list(payload: ArticleListQuery, db: Session = Depends(get_db), current: Account = Depends(require_active_user)) -> ArticleListResponse:
+async def gzh_article_list(payload: ArticleListQuery, db: AsyncSession = Depends(get_async_db), current: Account = Depends(require_active_user)) -> ArticleListResponse:
     # 过滤条件：mp_account/url/title_contains；管理员可传 owner_email 控制范围
     where = []
     if payload.mp_account:
@@ -123,12 +150,12 @@ def gzh_article_list(payload: ArticleListQuery, db: Session = Depends(get_db), c
         stmt_items = stmt_items.where(and_(*where))
     from sqlalchemy import desc
     stmt_items = stmt_items.order_by(desc(MpArticle.publish_date), desc(MpArticle.create_time)).offset(payload.offset).limit(payload.limit)
-    items = db.scalars(stmt_items).all()
+    items = (await db.scalars(stmt_items)).all()
 
     stmt_total = select(func.count()).select_from(MpArticle)
     if where:
         from sqlalchemy import and_
         stmt_total = stmt_total.where(and_(*where))
-    total = int(db.scalar(stmt_total) or 0)
+    total = int(await db.scalar(stmt_total) or 0)
 
     return ArticleListResponse(items=[MpArticleOut.model_validate(i) for i in items], total=total, offset=payload.offset, limit=payload.limit)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -17,12 +17,80 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./app.db"  # can be overwritten by env
+    # Async routes; derived from DATABASE_URL (asyncpg / aiosqlite driver) when empty
+    ASYNC_DATABASE_URL: Optional[str] = None
 
     # Auth / JWT
     JWT_SECRET: str = "change-this-secret"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24h
 
+    # Upstream HTTP (shared httpx.AsyncClient pool for crawls)
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_MAX_CONNECTIONS: int = 200
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 50
+
+    # Per-cookie upstream rate limit (token bucket shared across workers via DB)
+    COOKIE_RATE_CAPACITY: int = 59
+    COOKIE_RATE_PER_HOUR: float = 59.0
+    # Max requests queued on one cookie's bucket (bounded debt); further reservations wait for room
+    COOKIE_RATE_MAX_QUEUE: int = 59
+
+    # Cookie pool scheduling (spread requests across a user's valid cookies)
+    COOKIE_POOL_REFRESH_SECONDS: float = 30.0
+    COOKIE_POOL_ERROR_ALPHA: float = 0.2
+    # Upstream fetch retries (full-jitter exponential backoff) and per-cookie circuit breaker
+    FETCH_MAX_ATTEMPTS: int = 5
+    FETCH_BACKOFF_BASE_SECONDS: float = 1.0
+    FETCH_BACKOFF_MAX_SECONDS: float = 30.0
+    FETCH_BREAKER_THRESHOLD: int = 3
+    FETCH_BREAKER_COOLDOWN_SECONDS: float = 300.0
+
+    # Authenticated principals cached in-process by user id (LRU + TTL; 0 disables)
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+
+    # Background crawl jobs
+    CRAWL_JOB_WORKERS: int = 4
+    CRAWL_JOB_POLL_SECONDS: float = 0.5
+    CRAWL_JOB_STALE_SECONDS: int = 600
+    # Running jobs refresh their heartbeat on this timer too (a job may wait long for cookie budget without progress)
+    CRAWL_JOB_HEARTBEAT_SECONDS: float = 60.0
+    # Progress events of finished jobs are deleted after this many seconds (0 keeps them); checked every CRAWL_JOB_CLEANUP_SECONDS
+    CRAWL_JOB_EVENTS_RETENTION_SECONDS: int = 7 * 86400
+    CRAWL_JOB_CLEANUP_SECONDS: float = 3600.0
+    # searchbiz name -> fakeid resolution cache
+    SEARCHBIZ_CACHE_TTL_SECONDS: int = 86400
+
+    # Avatars: content-addressed store under static/avatars, fetched in background threads
+    AVATAR_REVALIDATE_SECONDS: int = 86400
+    AVATAR_FETCH_WORKERS: int = 2
+
+    # Scheduled refresh of tracked accounts: an account is due once its staleness exceeds
+    # clamp(publish_interval * REFRESH_INTERVAL_FACTOR, REFRESH_MIN_SECONDS, REFRESH_MAX_SECONDS)
+    REFRESH_ENABLED: bool = True
+    REFRESH_TICK_SECONDS: float = 60.0
+    REFRESH_CONCURRENCY: int = 2
+    REFRESH_PER_COOKIE_CONCURRENCY: int = 1
+    REFRESH_MIN_SECONDS: int = 1800
+    REFRESH_MAX_SECONDS: int = 86400
+    REFRESH_INTERVAL_FACTOR: float = 0.5
+
+    # NDJSON streams: how often to check whether the client has gone away while waiting for the next event
+    STREAM_DISCONNECT_POLL_SECONDS: float = 1.0
+    # Events a stream subscriber may fall behind the crawl before its backpressure policy applies
+    # (block: the crawl waits; coalesce: pending page events are merged; drop: only the latest progress is kept)
+    STREAM_BUFFER_EVENTS: int = 32
+    STREAM_BACKPRESSURE: Literal["block", "coalesce", "drop"] = "block"
+
+    # Batch crawl (/gzhaccount/batch/stream): accounts crawled at once, process-wide and per cookie of a user
+    BATCH_MAX_TARGETS: int = 200
+    BATCH_CONCURRENCY: int = 8
+    BATCH_PER_COOKIE_CONCURRENCY: int = 2
+
+    # Parallel page prefetch for backfill (opt-in per request); pages in flight per crawl
+    CRAWL_PREFETCH_CONCURRENCY: int = 4
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
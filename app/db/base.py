@@ -8,7 +8,7 @@ class Base(DeclarativeBase):
 # Import all models here so that Alembic or metadata.create_all can discover them
 try:
     # enforce import order via models.__init__
-    from app.models import Category, Account, ActivationCode, Cookie, MpAccount, MpArticle  # noqa: F401
+    from app.models import Category, Account, ActivationCode, Cookie, MpAccount, MpArticle, CrawlJob, CrawlJobEvent, CookieRateLimit, MpSearchCandidate, AvatarCache  # noqa: F401
 except Exception:
     # During certain tooling, model import may fail; ignore to avoid import-time errors
     pass
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
@@ -10,3 +12,25 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+
+# 异步驱动：PostgreSQL 用 asyncpg，SQLite 用 aiosqlite；已指定其它驱动的 URL 原样使用
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    u = make_url(url)
+    backend, _, driver = u.drivername.partition("+")
+    if backend in ASYNC_DRIVERS and driver in ("", "psycopg2", "psycopg", "pysqlite"):
+        u = u.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return u.render_as_string(hide_password=False)
+
+
+# 与同步引擎指向同一数据库，供 async def 路由使用：等待数据库时不占用线程池线程
+async_engine = create_async_engine(
+    async_database_url(settings.ASYNC_DATABASE_URL or settings.DATABASE_URL),
+    pool_pre_ping=True,
+)
+
+# expire_on_commit=False：提交后访问属性不会触发隐式（同步）加载
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
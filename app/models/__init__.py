@@ -6,3 +6,7 @@ from app.models.activation_code import ActivationCode  # noqa: F401
 from app.models.cookie import Cookie  # noqa: F401
 from app.models.mp_account import MpAccount  # noqa: F401
 from app.models.mp_article import MpArticle  # noqa: F401
+from app.models.crawl_job import CrawlJob, CrawlJobEvent  # noqa: F401
+from app.models.cookie_rate_limit import CookieRateLimit  # noqa: F401
+from app.models.mp_search_candidate import MpSearchCandidate  # noqa: F401
+from app.models.avatar_cache import AvatarCache  # noqa: F401
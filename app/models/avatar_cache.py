@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from sqlalchemy import String, Float
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class AvatarCache(Base):
+    """头像 URL -> 内容寻址文件，附带条件请求所需的 ETag / Last-Modified。"""
+
+    __tablename__ = "avatar_cache"
+
+    url_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256(url)，URL 过长不宜直接做主键
+    url: Mapped[str] = mapped_column(String(1024), nullable=False)
+    etag: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)  # 内容哈希；相同图片只存一份
+    path: Mapped[str | None] = mapped_column(String(1024), nullable=True)  # static/avatars/<sha[:2]>/<sha>.<ext>
+    # 上次（尝试）验证时间（epoch 秒）
+    checked_at: Mapped[float] = mapped_column(Float, nullable=False)
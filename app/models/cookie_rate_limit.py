@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from sqlalchemy import String, Float, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class CookieRateLimit(Base):
+    """按 Cookie.token 的令牌桶状态，存库以便多个 uvicorn worker 共享同一额度。"""
+
+    __tablename__ = "cookie_rate_limits"
+
+    token: Mapped[str] = mapped_column(String(128), primary_key=True)
+    # 当前令牌数；可为负数，表示已排队预约的请求（欠额）
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    # 上次结算时间（epoch 秒），避免不同方言的时区差异
+    refill_at: Mapped[float] = mapped_column(Float, nullable=False)
+    # 乐观锁版本号：UPDATE ... WHERE version = ? 保证并发扣减不丢失
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # 近期请求失败率（指数滑动平均），用于 cookie 池调度
+    error_rate: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timezone
+from enum import Enum
+
+from sqlalchemy import String, DateTime, ForeignKey, Integer, Text, Enum as SAEnum, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class CrawlJobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class CrawlJob(Base):
+    __tablename__ = "crawl_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner_email: Mapped[str] = mapped_column(String(255), ForeignKey("accounts.email"), nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)  # 请求搜索的公众号名称
+    max_articles: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # 调度优先级：数值越大越先执行；浅抓取后的后台回填为低优先级
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    status: Mapped[CrawlJobStatus] = mapped_column(
+        SAEnum(CrawlJobStatus, name="crawl_job_status"), default=CrawlJobStatus.pending, nullable=False
+    )
+    mp_account: Mapped[str | None] = mapped_column(String(255), nullable=True)  # 解析出的公众号昵称
+    event_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    create_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    # 心跳：每写入一条进度以及运行期间每 CRAWL_JOB_HEARTBEAT_SECONDS 刷新，用于识别进程中断后遗留的 running 任务
+    update_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finish_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_crawl_jobs_owner", "owner_email"),
+        Index("ix_crawl_jobs_status", "status"),
+    )
+
+
+class CrawlJobEvent(Base):
+    """任务进度（NDJSON 事件）按序号落库，供 /jobs/{id}/stream 从任意 offset 回放。"""
+
+    __tablename__ = "crawl_job_events"
+
+    job_id: Mapped[str] = mapped_column(String(36), ForeignKey("crawl_jobs.id", ondelete="CASCADE"), primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON 文本
+    create_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -2,12 +2,19 @@ from __future__ import annotations
 
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, ForeignKey, Integer, Index
+from enum import Enum
+
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Integer, Index, Enum as SAEnum
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
 
 
+class CrawlState(str, Enum):
+    backfilling = "backfilling"  # 全量历史回填未完成（含中断），crawl_offset 为下次续抓的 begin
+    complete = "complete"  # 已回填至列表末尾，后续只做增量
+
+
 class MpAccount(Base):
     __tablename__ = "mp_accounts"
 
@@ -22,8 +29,21 @@ class MpAccount(Base):
     avatar_url: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     avatar: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     article_account: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # 全量回填断点：每页入库时同事务更新
+    crawl_state: Mapped[CrawlState] = mapped_column(
+        SAEnum(CrawlState, name="mp_crawl_state"), default=CrawlState.complete, nullable=False
+    )
+    crawl_offset: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    crawl_total: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 记录断点时上游 total_count（发布条数）
+    # 发布水位线：已入库的最新一条文章（update_time 秒级时间戳 + 消息 id），增量抓取在内存中比对判定重叠边界
+    watermark_time: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    watermark_msgid: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # 定时刷新：上次探测时间，以及按近期文章估算的平均发布间隔（秒），用于计算刷新优先级
+    refresh_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    publish_interval: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     __table_args__ = (
         Index("ix_mp_accounts_name_unique", "name", unique=True),
         Index("ix_mp_accounts_biz_unique", "biz", unique=True),
+        Index("ix_mp_accounts_refresh_time", "refresh_time"),
     )
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import String, DateTime, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class MpSearchCandidate(Base):
+    """searchbiz 返回的候选公众号（每次查询最多 5 条），带抓取时间，用于在 TTL 内跳过名称 -> fakeid 的上游搜索。"""
+
+    __tablename__ = "mp_search_candidates"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    query: Mapped[str] = mapped_column(String(255), nullable=False)  # 搜索关键词
+    rank: Mapped[int] = mapped_column(Integer, nullable=False)  # 在搜索结果中的位置，0 为首选
+    nickname: Mapped[str] = mapped_column(String(255), nullable=False)
+    fakeid: Mapped[str] = mapped_column(String(64), nullable=False)
+    avatar_url: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    signature: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    fetched_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        Index("ix_mp_search_candidates_query", "query", "rank"),
+        Index("ix_mp_search_candidates_nickname", "nickname"),
+        Index("ix_mp_search_candidates_fakeid", "fakeid"),
+    )
@@ -41,3 +41,17 @@ class CookieGetResponse(BaseModel):
     cookie: Optional[CookieOut] = None
     qrcode_base64: Optional[str] = None  # base64 image if requested
     login_key: Optional[str] = None  # immediate模式下返回的轮询key
+
+
+class CookieBudgetOut(BaseModel):
+    token: str
+    name: str
+    capacity: int
+    remaining: float  # 当前可立即使用的请求数
+    queued: int  # 排队等待令牌的请求数
+    wait_seconds: float  # 新请求需要等待的秒数
+    error_rate: float  # 近期请求失败率（cookie 池调度依据）
+
+
+class CookieBudgetResponse(BaseModel):
+    items: List[CookieBudgetOut]
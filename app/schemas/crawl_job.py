@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.models.crawl_job import CrawlJobStatus
+
+
+class CrawlJobCreate(BaseModel):
+    name: str = Field(min_length=1, description="公众号名称")
+    max_articles: int = Field(default=0, ge=0, description="要抓取的文章数量，0 表示全量")
+
+
+class CrawlJobOut(BaseModel):
+    id: str
+    owner_email: str
+    name: str
+    max_articles: int
+    priority: int = 0
+    status: CrawlJobStatus
+    mp_account: Optional[str] = None
+    event_count: int
+    error: Optional[str] = None
+    create_time: datetime
+    update_time: Optional[datetime] = None
+    finish_time: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
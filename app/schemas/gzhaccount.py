@@ -1,13 +1,44 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
 class GzhSearchRequest(BaseModel):
     name: str = Field(min_length=1, description="公众号名称")
     max_articles: int = Field(default=0, ge=0, description="要抓取的文章数量，0 表示全量")
+    prefetch: bool = Field(default=False, description="回填（全量）阶段并发预取后续分页，仍受 cookie 额度限制，按发布顺序入库")
+    shallow: bool = Field(default=False, description="仅同步抓取满足 max_articles 所需的页，其余历史排入低优先级后台任务回填")
+
+
+class GzhSearchStreamRequest(GzhSearchRequest):
+    page_items: Literal["delta", "full"] = Field(default="full", description="page 事件的 items：full（默认）每页重发当前前 n 条；delta 仅本页新增")
+    final_items: bool = Field(default=True, description="done 事件是否携带完整文章列表")
+    on_disconnect: Literal["cancel", "background"] = Field(default="cancel", description="客户端断开后：cancel 停止抓取（断点已保存）；background 转交后台任务继续")
+    backpressure: Optional[Literal["block", "coalesce", "drop"]] = Field(default=None, description="客户端读取跟不上抓取时的策略：block 让抓取等待；coalesce 合并积压的 page 事件；drop 只保留最新进度。默认 STREAM_BACKPRESSURE")
+
+
+class GzhBizStreamRequest(BaseModel):
+    biz: str = Field(min_length=1, max_length=64, description="公众号 biz（fakeid），须已入库或近期出现在搜索结果中")
+    max_articles: int = Field(default=0, ge=0, description="要抓取的文章数量，0 表示全量")
+    prefetch: bool = Field(default=False, description="回填（全量）阶段并发预取后续分页")
+    shallow: bool = Field(default=False, description="仅同步抓取满足 max_articles 所需的页，其余历史排入后台任务回填")
+    page_items: Literal["delta", "full"] = Field(default="delta", description="page 事件的 items：delta 仅本页新增；full 每页重发当前前 n 条")
+    final_items: bool = Field(default=True, description="done 事件是否携带完整文章列表")
+    on_disconnect: Literal["cancel", "background"] = Field(default="cancel", description="客户端断开后：cancel 停止抓取（断点已保存）；background 转交后台任务继续")
+    backpressure: Optional[Literal["block", "coalesce", "drop"]] = Field(default=None, description="客户端读取跟不上抓取时的策略：block 让抓取等待；coalesce 合并积压的 page 事件；drop 只保留最新进度。默认 STREAM_BACKPRESSURE")
+
+
+class GzhBatchStreamRequest(BaseModel):
+    names: List[str] = Field(default_factory=list, description="公众号名称列表")
+    bizs: List[str] = Field(default_factory=list, description="公众号 biz（fakeid）列表，须已入库或近期出现在搜索结果中")
+    max_articles: int = Field(default=0, ge=0, description="每个账号要抓取的文章数量，0 表示全量")
+    prefetch: bool = Field(default=False, description="回填（全量）阶段并发预取后续分页")
+    shallow: bool = Field(default=False, description="仅同步抓取满足 max_articles 所需的页，其余历史排入后台任务回填")
+    final_items: bool = Field(default=False, description="各账号的 done 事件是否携带完整文章列表")
+    on_disconnect: Literal["cancel", "background"] = Field(default="cancel", description="客户端断开后：cancel 停止进行中的抓取；background 转交后台任务继续（尚未开始的账号不再抓取）")
+    backpressure: Optional[Literal["block", "coalesce", "drop"]] = Field(default=None, description="客户端读取跟不上抓取时的策略：block 让抓取等待；coalesce 合并积压的 page 事件；drop 只保留最新进度。默认 STREAM_BACKPRESSURE")
 
 
 class MpAccountOut(BaseModel):
@@ -22,6 +53,8 @@ class MpAccountOut(BaseModel):
     avatar_url: Optional[str] = None
     avatar: Optional[str] = None
     article_account: int
+    crawl_state: Optional[str] = None  # backfilling | complete
+    crawl_offset: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -33,7 +66,7 @@ class MpArticleOut(BaseModel):
     url: str
     cover_url: Optional[str] = None
     publish_date: Optional[str] = None
-    item_show_type: Optional[str] = None
+    item_show_type: Optional[int] = None
     mp_account: str
     create_time: datetime
 
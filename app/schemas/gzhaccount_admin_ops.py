@@ -44,3 +44,13 @@ class GzhAccountDeleteRequest(BaseModel):
     def ensure_selector(self) -> None:
         if not (self.id or self.name or self.biz):
             raise ValueError("必须提供 id、name 或 biz 其中之一用于删除")
+
+
+class GzhAccountReconcileRequest(BaseModel):
+    # 为空表示全部（普通用户限定为自己的账号）
+    name: Optional[str] = None
+
+
+class GzhAccountReconcileResponse(BaseModel):
+    status: str
+    fixed: int
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from app.models.activation_code import ActivationCode
 from app.models.account import Account, ActivationStatus
+from app.services.principal_cache import principal_cache
 
 
 def now_iso() -> str:
@@ -106,4 +107,5 @@ class ActivationService:
         self.db.commit()
         self.db.refresh(account)
         self.db.refresh(ac)
+        principal_cache.invalidate(account.id)
         return account, ac
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.models.account import Account, ActivationStatus, UserRole
 from app.models.activation_code import ActivationCode
+from app.services.principal_cache import principal_cache
 from app.services.security import hash_password
 
 
@@ -84,6 +85,7 @@ class AdminUserService:
             acc.expired_time = expired_time
         self.db.add(acc)
         self.db.commit()
+        principal_cache.invalidate(user_id)
         self.db.refresh(acc)
         return acc
 
@@ -97,6 +99,7 @@ class AdminUserService:
                 self.db.delete(ac)
         self.db.delete(acc)
         self.db.commit()
+        principal_cache.invalidate(user_id)
 
 
 class AdminActivationCodeService:
@@ -125,6 +128,7 @@ class AdminActivationCodeService:
         if not ac:
             raise ValueError("Activation code not found")
         # If this code is linked to an account, reset that account's activation fields
+        reset_id: Optional[str] = None
         if ac.user_email:
             acc = self.db.scalar(select(Account).where(Account.email == ac.user_email))
             if acc and acc.activation_code == ac.activation_code:
@@ -132,5 +136,8 @@ class AdminActivationCodeService:
                 acc.activation_status = ActivationStatus.pending
                 acc.expired_time = None
                 self.db.add(acc)
+                reset_id = acc.id
         self.db.delete(ac)
         self.db.commit()
+        if reset_id:
+            principal_cache.invalidate(reset_id)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.avatar_cache import AvatarCache
+from app.models.cookie import Cookie
+from app.models.mp_account import MpAccount
+from app.services.wechat_http import DEFAULT_HEADERS
+
+
+logger = logging.getLogger(__name__)
+
+# 下载失败（或尚无本地文件）时的重试间隔，短于正常的重新验证周期
+RETRY_SECONDS = 300
+
+_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+# 后台下载线程池（进程内共享）与在途 URL，避免同一头像被并发重复拉取
+_executor: Optional[ThreadPoolExecutor] = None
+_inflight: set[str] = set()
+_lock = threading.Lock()
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def schedule_fetch(url: str) -> None:
+    """把头像下载 / 重新验证交给后台线程，调用方不等待任何网络或磁盘 I/O。"""
+    global _executor
+    with _lock:
+        if url in _inflight:
+            return
+        _inflight.add(url)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, settings.AVATAR_FETCH_WORKERS), thread_name_prefix="avatar")
+        _executor.submit(_run_fetch, url)
+
+
+def shutdown_fetcher() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        _inflight.clear()
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_fetch(url: str) -> None:
+    db = SessionLocal()
+    try:
+        AvatarStore(db).fetch(url)
+    except Exception:
+        logger.exception("avatar fetch failed: %s", url)
+    finally:
+        db.close()
+        with _lock:
+            _inflight.discard(url)
+
+
+class AvatarStore:
+    """
+    头像的内容寻址存储：文件按内容 sha256 存放在 static/avatars/<sha[:2]>/<sha>.<ext>，相同图片只存一份。
+    请求路径只调用 resolve（一次主键查询），下载与重新验证在后台线程完成：
+    带 If-None-Match / If-Modified-Since 的条件请求，未变化时上游返回 304，不传输图片内容。
+    下载完成后回填 mp_accounts.avatar 与 cookies.avatar 中引用该 URL 的行。
+    """
+
+    def __init__(self, db: Session, root: str = os.path.join("static", "avatars")) -> None:
+        self.db = db
+        self.root = root
+
+    def lookup(self, url: str) -> Optional[str]:
+        if not url:
+            return None
+        row = self.db.get(AvatarCache, _url_key(url))
+        return row.path if row else None
+
+    def resolve(self, url: str) -> Optional[str]:
+        """返回已缓存的本地路径（首次为 None，由后台下载后回填），缓存过期时安排后台重新验证。"""
+        if not url:
+            return None
+        row = self.db.get(AvatarCache, _url_key(url))
+        if row is None or self._stale(row):
+            schedule_fetch(url)
+        return row.path if row else None
+
+    def fetch(self, url: str) -> Optional[str]:
+        """（后台线程）条件请求下载头像，写入内容寻址文件并更新缓存行，返回本地路径。"""
+        key = _url_key(url)
+        row = self.db.get(AvatarCache, key)
+        headers = dict(DEFAULT_HEADERS)
+        if row is not None and row.path and os.path.exists(row.path):
+            if row.etag:
+                headers['If-None-Match'] = row.etag
+            if row.last_modified:
+                headers['If-Modified-Since'] = row.last_modified
+        try:
+            r = requests.get(url, headers=headers, timeout=10)
+        except Exception:
+            r = None
+        now = time.time()
+        if r is None or r.status_code != 200 or not r.content:
+            # 未变化或失败：只刷新验证时间，保留已有文件
+            self._save(row, key, url, checked_at=now)
+            return row.path if row else None
+
+        sha = hashlib.sha256(r.content).hexdigest()
+        ext = _EXTENSIONS.get((r.headers.get('content-type') or '').split(';')[0].strip().lower(), '.jpg')
+        path = os.path.join(self.root, sha[:2], f"{sha}{ext}")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(r.content)
+            os.replace(tmp, path)
+        self._save(
+            row,
+            key,
+            url,
+            checked_at=now,
+            etag=r.headers.get('etag'),
+            last_modified=r.headers.get('last-modified'),
+            sha256=sha,
+            path=path,
+        )
+        self._apply(url, path)
+        return path
+
+    def _stale(self, row: AvatarCache) -> bool:
+        age = time.time() - row.checked_at
+        return age > (settings.AVATAR_REVALIDATE_SECONDS if row.path else RETRY_SECONDS)
+
+    def _save(self, row: Optional[AvatarCache], key: str, url: str, **values) -> None:
+        if row is None:
+            row = AvatarCache(url_hash=key, url=url)
+            self.db.add(row)
+        for k, v in values.items():
+            setattr(row, k, v)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # 其它进程同时首建：以对方结果为准
+            self.db.rollback()
+
+    def _apply(self, url: str, path: str) -> None:
+        for model in (MpAccount, Cookie):
+            self.db.execute(
+                update(model)
+                .where(and_(model.avatar_url == url, or_(model.avatar.is_(None), model.avatar != path)))
+                .values(avatar=path)
+                .execution_options(synchronize_session=False)
+            )
+        self.db.commit()
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
 import os
 import pickle
 import re
+import shutil
 import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
@@ -13,9 +15,12 @@ from urllib.parse import parse_qs, urlparse
 
 import requests
 from sqlalchemy import and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.cookie import Cookie as CookieModel
+from app.services.avatar_store import AvatarStore
+from app.services.wechat_http import forget_cookie_jar
 
 # 全局内存存储（仅单进程测试环境）：login_key -> 会话状态
 IMMEDIATE_STORE: dict[str, dict] = {}
@@ -42,6 +47,37 @@ class WechatLoginResult:
     login_key: Optional[str] = None
 
 
+def _valid_cookies_stmt(owner_email: str):
+    now = datetime.now(timezone.utc)
+    return (
+        select(CookieModel)
+        .where(and_(CookieModel.owner_email == owner_email, CookieModel.expire_time > now))
+        .order_by(CookieModel.created_time.desc())
+    )
+
+
+def _expired_cookies_stmt(owner_email: Optional[str] = None):
+    now = datetime.now(timezone.utc)
+    if owner_email:
+        return select(CookieModel).where(
+            and_(CookieModel.owner_email == owner_email, CookieModel.expire_time <= now)
+        )
+    return select(CookieModel).where(CookieModel.expire_time <= now)
+
+
+def _remove_local_dirs(cookies: list[CookieModel]) -> None:
+    for obj in cookies:
+        if not obj.local:
+            continue
+        # 进程内缓存的登录态 jar 随 cookie 一起移除
+        forget_cookie_jar(obj.local)
+        try:
+            if os.path.isdir(obj.local):
+                shutil.rmtree(obj.local, ignore_errors=True)
+        except Exception:
+            pass
+
+
 class CookieService:
     def __init__(self, db: Session, static_root: str = os.path.join("static", "cookies")) -> None:
         self.db = db
@@ -74,13 +110,18 @@ class CookieService:
 
     def list_valid_cookies(self, owner_email: str) -> list[CookieModel]:
         self.cleanup_expired(owner_email)
-        now = datetime.now(timezone.utc)
-        stmt = (
-            select(CookieModel)
-            .where(and_(CookieModel.owner_email == owner_email, CookieModel.expire_time > now))
-            .order_by(CookieModel.created_time.desc())
-        )
-        return self.db.scalars(stmt).all()
+        return self.db.scalars(_valid_cookies_stmt(owner_email)).all()
+
+    @staticmethod
+    async def alist_valid_cookies(db: AsyncSession, owner_email: str) -> list[CookieModel]:
+        """list_valid_cookies 的异步版本，使用 AsyncSession（供 async def 路由，不占用线程池）。"""
+        expired = (await db.scalars(_expired_cookies_stmt(owner_email))).all()
+        if expired:
+            await asyncio.to_thread(_remove_local_dirs, expired)
+            for obj in expired:
+                await db.delete(obj)
+            await db.commit()
+        return (await db.scalars(_valid_cookies_stmt(owner_email))).all()
 
     def delete_cookie(self, owner_email: str, token: str) -> None:
         obj = self.db.scalar(
@@ -90,38 +131,18 @@ class CookieService:
         )
         if not obj:
             raise ValueError("Cookie not found for this user")
-        # remove folder
-        try:
-            if obj.local and os.path.isdir(obj.local):
-                import shutil
-                shutil.rmtree(obj.local, ignore_errors=True)
-        except Exception:
-            pass
+        _remove_local_dirs([obj])
         self.db.delete(obj)
         self.db.commit()
 
     def cleanup_expired(self, owner_email: Optional[str] = None) -> int:
-        now = datetime.now(timezone.utc)
-        if owner_email:
-            stmt = select(CookieModel).where(
-                and_(CookieModel.owner_email == owner_email, CookieModel.expire_time <= now)
-            )
-        else:
-            stmt = select(CookieModel).where(CookieModel.expire_time <= now)
-        expired = self.db.scalars(stmt).all()
-        count = 0
+        expired = self.db.scalars(_expired_cookies_stmt(owner_email)).all()
+        _remove_local_dirs(expired)
         for obj in expired:
-            try:
-                if obj.local and os.path.isdir(obj.local):
-                    import shutil
-                    shutil.rmtree(obj.local, ignore_errors=True)
-            except Exception:
-                pass
             self.db.delete(obj)
-            count += 1
-        if count:
+        if expired:
             self.db.commit()
-        return count
+        return len(expired)
 
     # ------------------ WeChat Login Flow ------------------
     def wechat_login(self, *, timeout_seconds: int = 180) -> WechatLoginResult:
@@ -381,13 +402,15 @@ class CookieService:
             expire_time=expire,
             name=result.name or "",
             avatar_url=result.avatar_url or None,
-            avatar=result.avatar_local or None,
+            avatar=result.avatar_local or AvatarStore(self.db).lookup(result.avatar_url or ""),
             local=result.folder_local or "",
             is_current=True,
         )
         self.db.add(obj)
         self.db.commit()
         self.db.refresh(obj)
+        if obj.local:
+            forget_cookie_jar(obj.local)
         return obj
 
     # ------------------ Helpers ------------------
@@ -440,7 +463,7 @@ class CookieService:
                     name = nn.group(1) if nn else "公众号"
                     himg = re.search(r"head_img\s*:\s*['\"]([^'\"]+)['\"]", js)
                     avatar_url = _normalize(himg.group(1)) if himg else ""
-                    avatar_local = self._download_avatar(avatar_url, folder) if avatar_url else ""
+                    avatar_local = self._download_avatar(avatar_url) if avatar_url else ""
                     return name, avatar_url, avatar_local
                 # 备用：在整页中直接找字段
                 nn2 = re.search(r"nick[_ ]?name\s*[:=]\s*['\"]([^'\"]+)['\"]", content)
@@ -448,7 +471,7 @@ class CookieService:
                 if nn2 or himg2:
                     name = nn2.group(1) if nn2 else "公众号"
                     avatar_url = _normalize(himg2.group(1)) if himg2 else ""
-                    avatar_local = self._download_avatar(avatar_url, folder) if avatar_url else ""
+                    avatar_local = self._download_avatar(avatar_url) if avatar_url else ""
                     return name, avatar_url, avatar_local
 
             # 2) 账号详情页：action=show
@@ -464,22 +487,12 @@ class CookieService:
                 if nn3 or himg3:
                     name = nn3.group(1) if nn3 else "公众号"
                     avatar_url = _normalize(himg3.group(1)) if himg3 else ""
-                    avatar_local = self._download_avatar(avatar_url, folder) if avatar_url else ""
+                    avatar_local = self._download_avatar(avatar_url) if avatar_url else ""
                     return name, avatar_url, avatar_local
         except Exception:
             pass
         return "公众号", "", ""
 
-    def _download_avatar(self, avatar_url: str, folder: str) -> str:
-        if not avatar_url:
-            return ""
-        try:
-            r = requests.get(avatar_url, timeout=10)
-            if r.status_code == 200:
-                path = os.path.join(folder, "avatar.jpg")
-                with open(path, "wb") as f:
-                    f.write(r.content)
-                return path
-        except Exception:
-            pass
-        return ""
+    def _download_avatar(self, avatar_url: str) -> str:
+        # 头像走内容寻址缓存：不在登录流程中下载，首次为空，后台下载完成后回填 cookies.avatar
+        return AvatarStore(self.db).resolve(avatar_url) or ""
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.cookie import Cookie
+from app.models.cookie_rate_limit import CookieRateLimit
+from app.services.rate_limit import CookieRateLimiter, refund_later
+
+
+MSG_NO_COOKIE = "当前没有可用的cookie，请先登录并设置当前cookie"
+MSG_COOKIE_EXPIRED = "当前cookie已过期，请重新登录"
+
+
+class CircuitBreaker:
+    """
+    进程内的 per-cookie 熔断器：连续失败 FETCH_BREAKER_THRESHOLD 次（或一次频控 / 登录失效）后，
+    该 cookie 在 FETCH_BREAKER_COOLDOWN_SECONDS 内不参与调度；冷却结束后半开，下一次成功即恢复。
+    """
+
+    def __init__(self) -> None:
+        # token -> (连续失败次数, 熔断截止的 monotonic 时间)
+        self._state: dict[str, tuple[int, float]] = {}
+        self._mutex = threading.Lock()
+
+    def is_open(self, token: str) -> bool:
+        with self._mutex:
+            state = self._state.get(token)
+        return state is not None and state[1] > time.monotonic()
+
+    def record(self, token: str, *, ok: bool, trip: bool = False) -> None:
+        with self._mutex:
+            if ok:
+                self._state.pop(token, None)
+                return
+            fails, until = self._state.get(token, (0, 0.0))
+            fails += 1
+            if trip or fails >= settings.FETCH_BREAKER_THRESHOLD:
+                until = time.monotonic() + settings.FETCH_BREAKER_COOLDOWN_SECONDS
+                fails = 0
+            self._state[token] = (fails, until)
+
+
+breaker = CircuitBreaker()
+
+
+@dataclass(frozen=True)
+class PooledCookie:
+    """调度用的 cookie 快照（与 ORM 会话解耦，commit 后访问属性不会触发重新加载）。"""
+    token: str
+    local: str
+    name: Optional[str]
+    is_current: bool
+
+
+class CookiePool:
+    """
+    在用户所有未过期的 cookie 之间调度上游请求：每次请求选“剩余额度 ×（1 - 近期失败率）”最高的 cookie，
+    额度全部耗尽时选排队最短的。选中后在其令牌桶上预约，因此同一次抓取的各页、以及并发的多次抓取
+    会自然分摊到多个登录态上。失败率按请求结果做指数滑动平均，存于 cookie_rate_limits，多 worker 共享。
+    处于熔断中的 cookie 不参与挑选；全部熔断时退回在所有 cookie 中挑选（由令牌桶和退避控制节奏）。
+    """
+
+    def __init__(self, db: Session, limiter: Optional[CookieRateLimiter] = None) -> None:
+        self.db = db
+        self.limiter = limiter or CookieRateLimiter(db)
+        # owner_email -> (加载时间, cookies)；cookie 列表变化不频繁，短时间内复用避免每页都查一次
+        self._cache: dict[str, tuple[float, list[PooledCookie]]] = {}
+        # 异步并发使用（如分页预取）时串行化对 self.db 的访问；Session 不是线程安全的
+        self._alock: Optional[asyncio.Lock] = None
+
+    def cookies(self, owner_email: str) -> list[PooledCookie]:
+        hit = self._cache.get(owner_email)
+        now = time.monotonic()
+        if hit and now - hit[0] < settings.COOKIE_POOL_REFRESH_SECONDS:
+            return hit[1]
+        # 在 SQL 中比较过期时间，兼容 SQLite 读出的 naive datetime
+        stmt = (
+            select(Cookie.token, Cookie.local, Cookie.name, Cookie.is_current)
+            .where(and_(Cookie.owner_email == owner_email, Cookie.expire_time > datetime.now(timezone.utc)))
+            .order_by(Cookie.is_current.desc(), Cookie.created_time.desc())
+        )
+        items = [PooledCookie(token=r.token, local=r.local, name=r.name, is_current=bool(r.is_current)) for r in self.db.execute(stmt)]
+        self._cache[owner_email] = (now, items)
+        return items
+
+    def ensure_available(self, owner_email: str) -> None:
+        """没有任何可用 cookie 时抛 ValueError（文案与原“当前 cookie”检查一致）。"""
+        if self.cookies(owner_email):
+            return
+        has_any = self.db.scalar(select(Cookie.token).where(Cookie.owner_email == owner_email).limit(1))
+        raise ValueError(MSG_COOKIE_EXPIRED if has_any else MSG_NO_COOKIE)
+
+    def pick(self, owner_email: str) -> PooledCookie:
+        candidates = self.cookies(owner_email)
+        if not candidates:
+            self.ensure_available(owner_email)
+        candidates = [c for c in candidates if not breaker.is_open(c.token)] or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        rows = {
+            r.token: r
+            for r in self.db.scalars(
+                select(CookieRateLimit)
+                .where(CookieRateLimit.token.in_([c.token for c in candidates]))
+                .execution_options(populate_existing=True)
+            )
+        }
+        now = time.time()
+        # max() 取首个最大值：同分时按 cookies() 的顺序，优先当前 cookie
+        return max(candidates, key=lambda c: self._score(rows.get(c.token), now))
+
+    def lease(self, owner_email: str) -> tuple[PooledCookie, bool, float]:
+        """选出 cookie 并预约一个令牌，返回 (cookie, 是否已预约, 需要等待的秒数)，含义同 CookieRateLimiter.reserve。"""
+        ck = self.pick(owner_email)
+        return (ck, *self.limiter.reserve(ck.token))
+
+    async def aacquire(self, owner_email: str) -> PooledCookie:
+        """
+        选出 cookie、预约并等待到可以请求。等待期间被取消（放弃抓取、关闭预取等）时退还预约：
+        请求尚未发出，不应占用该 cookie 的额度。
+        """
+        lock = self._lock()
+        while True:
+            await lock.acquire()
+            lease = asyncio.ensure_future(asyncio.to_thread(self.lease, owner_email))
+            # 线程中的预约不可中断：即使本协程被取消，也要等它结束才放开 self.db
+            lease.add_done_callback(lambda _: lock.release())
+            try:
+                ck, reserved, wait = await asyncio.shield(lease)
+            except asyncio.CancelledError:
+                # 预约照常完成，完成后退还
+                lease.add_done_callback(_refund_lease)
+                raise
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                except asyncio.CancelledError:
+                    if reserved:
+                        refund_later(ck.token)
+                    raise
+            if reserved:
+                return ck
+
+    async def areport(self, token: str, *, ok: bool, trip: bool = False) -> None:
+        async with self._lock():
+            await asyncio.to_thread(self.report, token, ok=ok, trip=trip)
+
+    def report(self, token: str, *, ok: bool, trip: bool = False) -> None:
+        """记录一次请求结果，更新该 cookie 的失败率滑动平均与熔断状态；trip=True 时立即熔断。"""
+        breaker.record(token, ok=ok, trip=trip)
+        alpha = settings.COOKIE_POOL_ERROR_ALPHA
+        self.db.execute(
+            update(CookieRateLimit)
+            .where(CookieRateLimit.token == token)
+            .values(error_rate=CookieRateLimit.error_rate * (1 - alpha) + (0.0 if ok else alpha))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def _score(self, row: Optional[CookieRateLimit], now: float) -> float:
+        if row is None:
+            return self.limiter.capacity
+        available = self.limiter._refilled(row, now)
+        if available < 1:
+            # 已无可立即使用的额度：按排队长度排序，排在所有有额度的 cookie 之后
+            return available - 1
+        return available * (1 - row.error_rate)
+
+    def _lock(self) -> asyncio.Lock:
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        return self._alock
+
+
+def _refund_lease(lease: asyncio.Future) -> None:
+    if lease.cancelled() or lease.exception() is not None:
+        return
+    ck, reserved, _ = lease.result()
+    if reserved:
+        refund_later(ck.token)
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update, and_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.crawl_job import CrawlJob, CrawlJobEvent, CrawlJobStatus
+from app.services.gzhaccount import GzhAccountService, event_to_dict
+
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (CrawlJobStatus.succeeded, CrawlJobStatus.failed)
+
+PRIORITY_NORMAL = 0
+PRIORITY_BACKFILL = -10  # 浅抓取后补全历史的后台任务，让位于用户直接提交的任务
+
+
+class CrawlJobService:
+    """crawl_jobs / crawl_job_events 的读写，均为短事务。"""
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def create_job(self, *, owner_email: str, name: str, max_articles: int = 0, priority: int = PRIORITY_NORMAL) -> CrawlJob:
+        job = CrawlJob(owner_email=owner_email, name=name, max_articles=max_articles, priority=priority, status=CrawlJobStatus.pending)
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def find_active_job(self, *, owner_email: str, name: str) -> Optional[CrawlJob]:
+        """同一用户、同一公众号尚未结束的任务（用于避免重复排队回填）。"""
+        stmt = select(CrawlJob).where(
+            and_(CrawlJob.owner_email == owner_email, CrawlJob.name == name, CrawlJob.status.not_in(FINISHED_STATUSES))
+        )
+        return self.db.scalars(stmt.limit(1)).first()
+
+    def get_job(self, job_id: str) -> Optional[CrawlJob]:
+        return self.db.get(CrawlJob, job_id)
+
+    def claim(self, job_id: str) -> bool:
+        """pending -> running 原子切换；多进程部署时只有一个 worker 能拿到任务。"""
+        res = self.db.execute(
+            update(CrawlJob)
+            .where(and_(CrawlJob.id == job_id, CrawlJob.status == CrawlJobStatus.pending))
+            .values(status=CrawlJobStatus.running, update_time=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return bool(res.rowcount)
+
+    def append_event(self, job_id: str, seq: int, evt: dict) -> dict:
+        """写入一条进度事件（附带 seq），同时刷新任务心跳与事件计数。返回已序列化的事件。"""
+        payload = {"seq": seq, **event_to_dict(evt)}
+        values: dict = {"event_count": seq + 1, "update_time": datetime.now(timezone.utc)}
+        if evt.get("type") == "account" and payload.get("account"):
+            values["mp_account"] = payload["account"]["name"]
+        self.db.add(CrawlJobEvent(job_id=job_id, seq=seq, payload=json.dumps(payload, ensure_ascii=False)))
+        self.db.execute(update(CrawlJob).where(CrawlJob.id == job_id).values(**values).execution_options(synchronize_session=False))
+        self.db.commit()
+        return payload
+
+    def heartbeat(self, job_id: str) -> bool:
+        """刷新 running 任务的心跳；任务已不在 running（已结束或被判超时复位）时返回 False。"""
+        res = self.db.execute(
+            update(CrawlJob)
+            .where(and_(CrawlJob.id == job_id, CrawlJob.status == CrawlJobStatus.running))
+            .values(update_time=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return bool(res.rowcount)
+
+    def finish(self, job_id: str, *, status: CrawlJobStatus, error: Optional[str] = None) -> None:
+        now = datetime.now(timezone.utc)
+        self.db.execute(
+            update(CrawlJob)
+            .where(CrawlJob.id == job_id)
+            .values(status=status, error=(error or None) and error[:1024], update_time=now, finish_time=now)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def list_events(self, job_id: str, *, offset: int = 0, limit: int = 200) -> list[str]:
+        stmt = (
+            select(CrawlJobEvent.payload)
+            .where(and_(CrawlJobEvent.job_id == job_id, CrawlJobEvent.seq >= offset))
+            .order_by(CrawlJobEvent.seq)
+            .limit(limit)
+        )
+        return list(self.db.scalars(stmt).all())
+
+    def purge_events(self, *, older_than_seconds: int) -> int:
+        """删除结束时间早于 older_than_seconds 秒前的任务的进度事件（任务记录保留），返回删除的事件数。"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than_seconds)
+        expired = select(CrawlJob.id).where(and_(CrawlJob.status.in_(FINISHED_STATUSES), CrawlJob.finish_time < cutoff))
+        res = self.db.execute(delete(CrawlJobEvent).where(CrawlJobEvent.job_id.in_(expired)).execution_options(synchronize_session=False))
+        self.db.commit()
+        return int(res.rowcount or 0)
+
+    def recoverable_jobs(self, *, stale_seconds: int) -> list[tuple[str, int]]:
+        """
+        进程重启后需要重新入队的任务：所有 pending，以及心跳超时的 running（其 worker 已随进程退出）。
+        超时的 running 先复位为 pending，再由 claim 竞争。返回 (job_id, priority)。
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_seconds)
+        self.db.execute(
+            update(CrawlJob)
+            .where(and_(CrawlJob.status == CrawlJobStatus.running, CrawlJob.update_time < cutoff))
+            .values(status=CrawlJobStatus.pending)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        stmt = select(CrawlJob.id, CrawlJob.priority).where(CrawlJob.status == CrawlJobStatus.pending).order_by(CrawlJob.create_time)
+        return [(r.id, r.priority) for r in self.db.execute(stmt)]
+
+
+class CrawlJobRunner:
+    """
+    进程内有界 worker 池：固定数量的 asyncio worker 从队列取任务，调用 GzhAccountService.astream_search 抓取，
+    每个事件落库到 crawl_job_events。HTTP 请求只负责建任务与回放进度，不再阻塞整个抓取过程。
+    运行中的任务按定时器刷新心跳；另有一个清理任务定期删除过期的进度事件。
+    队列按 priority 从高到低、同优先级先进先出出队。
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.PriorityQueue[tuple[int, int, str]]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+        for job_id, priority in await asyncio.to_thread(self._recoverable_jobs):
+            self._put(job_id, priority)
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def submit(self, job_id: str, priority: int = PRIORITY_NORMAL) -> None:
+        """入队；可在事件循环线程或线程池（同步路由 / to_thread）中调用。"""
+        if self._queue is None or self._loop is None:
+            # 尚未启动（例如脚本环境）：任务保留为 pending，下次启动时恢复
+            logger.warning("crawl job runner not started; job %s stays pending", job_id)
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._put(job_id, priority)
+        else:
+            self._loop.call_soon_threadsafe(self._put, job_id, priority)
+
+    def _put(self, job_id: str, priority: int) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait((-priority, next(self._seq), job_id))
+
+    def _recoverable_jobs(self) -> list[tuple[str, int]]:
+        db = SessionLocal()
+        try:
+            return CrawlJobService(db).recoverable_jobs(stale_seconds=settings.CRAWL_JOB_STALE_SECONDS)
+        finally:
+            db.close()
+
+    def _purge_events(self) -> int:
+        db = SessionLocal()
+        try:
+            return CrawlJobService(db).purge_events(older_than_seconds=settings.CRAWL_JOB_EVENTS_RETENTION_SECONDS)
+        finally:
+            db.close()
+
+    def _beat(self, job_id: str) -> bool:
+        # 独立短会话：任务自身的会话此时可能正在线程中写入事件
+        db = SessionLocal()
+        try:
+            return CrawlJobService(db).heartbeat(job_id)
+        finally:
+            db.close()
+
+    async def _janitor(self) -> None:
+        """定期清理已结束任务的过期事件；多个 worker 进程同时执行也只是重复一次幂等的 DELETE。"""
+        if settings.CRAWL_JOB_EVENTS_RETENTION_SECONDS <= 0:
+            return
+        while True:
+            try:
+                purged = await asyncio.to_thread(self._purge_events)
+                if purged:
+                    logger.info("purged %d events of finished crawl jobs", purged)
+            except Exception:
+                logger.exception("crawl job event cleanup failed")
+            await asyncio.sleep(settings.CRAWL_JOB_CLEANUP_SECONDS)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """
+        任务运行期间定时刷新心跳。心跳原先只随进度事件刷新，等待 cookie 额度（令牌桶排队）时可能长时间没有事件，
+        其它 worker 会把仍在运行的任务判为超时、复位后重复执行。
+        """
+        while True:
+            await asyncio.sleep(settings.CRAWL_JOB_HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(self._beat, job_id)
+            except Exception:
+                logger.exception("crawl job %s heartbeat failed", job_id)
+
+    async def _worker(self, index: int) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            _, _, job_id = await queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("crawl job %s crashed", job_id)
+            finally:
+                queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        db = SessionLocal()
+        try:
+            jobs = CrawlJobService(db)
+            if not await asyncio.to_thread(jobs.claim, job_id):
+                return
+            status, error = CrawlJobStatus.succeeded, None
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                job = await asyncio.to_thread(jobs.get_job, job_id)
+                # 断点续跑时 seq 接着已有事件继续编号
+                seq = job.event_count
+                svc = GzhAccountService(db)
+                try:
+                    async for evt in svc.astream_search(
+                        owner_email=job.owner_email,
+                        name=job.name,
+                        max_articles=job.max_articles,
+                        delta=True,
+                        final_items=bool(job.max_articles),
+                    ):
+                        await asyncio.to_thread(jobs.append_event, job_id, seq, evt)
+                        seq += 1
+                        if evt.get("type") == "error":
+                            status, error = CrawlJobStatus.failed, evt.get("message")
+                except Exception as e:
+                    status, error = CrawlJobStatus.failed, f"抓取异常: {e}"
+                    await asyncio.to_thread(jobs.append_event, job_id, seq, {"type": "error", "message": error})
+            finally:
+                heartbeat.cancel()
+            await asyncio.to_thread(jobs.finish, job_id, status=status, error=error)
+        finally:
+            db.close()
+
+
+runner = CrawlJobRunner(settings.CRAWL_JOB_WORKERS)
@@ -1,446 +1,1168 @@
 from __future__ import annotations
 
-import os
+import asyncio
 import time
 import json
+import uuid
+from collections import deque
 from datetime import datetime, timezone
-from typing import List, Optional, Tuple
+from typing import AsyncIterator, List, Optional, Tuple
 from urllib.parse import quote
 
-import requests
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, func, insert, update, desc
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models.cookie import Cookie
-from app.models.mp_account import MpAccount
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.mp_account import CrawlState, MpAccount
 from app.models.mp_article import MpArticle
 
 from app.services.cookie import CookieService
+from app.services.avatar_store import AvatarStore
+from app.services.cookie_pool import CookiePool, breaker
+from app.services.rate_limit import CookieRateLimiter
+from app.services.searchbiz_cache import SearchbizCache, normalize_search_entry
+from app.services.wechat_fetch import GzhFetchError, UpstreamFetcher, check_base_resp, fingerprint
+
+
+PAGE_SIZE = 5
+
+MSG_NOT_FOUND = "未找到公众号"
+MSG_INCOMPLETE = "公众号信息不完整"
+MSG_INTERRUPTED = "抓取中断，已保存断点，下次搜索将继续"
+MSG_ACCOUNT_NOT_FOUND = "先执行 /gzhaccount/search 完成账号建档，再获取文章列表"
+
+
+class _PagePrefetcher:
+    """
+    回填阶段的分页预取：按偏移计划后续分页，最多 window 个请求在途（每个请求仍经 cookie 池排队预约额度），
+    结果按偏移取用。状态机依旧逐页顺序消费，因此入库顺序与断点推进和串行抓取一致。
+    """
+
+    def __init__(self, fetch, window: int) -> None:
+        self._fetch = fetch
+        self._window = max(1, window)
+        self._planned: deque[int] = deque()
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def plan(self, begins: list[int]) -> None:
+        self._planned = deque(b for b in begins if b not in self._tasks)
+        self._fill()
+
+    async def get(self, begin: int) -> tuple[list[dict], int | None]:
+        task = self._tasks.pop(begin, None)
+        if task is None:
+            # 不在计划内（例如断点续抓段的首页）：直接请求
+            task = asyncio.ensure_future(self._fetch(begin))
+        try:
+            return await task
+        finally:
+            self._fill()
+
+    def close(self) -> None:
+        for t in self._tasks.values():
+            if not t.done():
+                t.cancel()
+            elif not t.cancelled():
+                t.exception()  # 取走未消费的失败结果，避免 "exception was never retrieved" 告警
+        self._tasks.clear()
+        self._planned.clear()
+
+    def _fill(self) -> None:
+        while self._planned and len(self._tasks) < self._window:
+            b = self._planned.popleft()
+            self._tasks[b] = asyncio.ensure_future(self._fetch(b))
+
+
+BACKPRESSURE_POLICIES = ("block", "coalesce", "drop")
+
+
+def _page_span(evt: dict) -> int:
+    """一条 page 事件代表的页数（已合并的事件代表多页）。"""
+    return evt.get("coalesced") or evt.get("dropped", 0) + 1
+
+
+def _merge_pages(pages: list[dict], policy: str) -> dict:
+    """
+    把一段连续的 page 事件合并为一条（new_added 累加）：drop 只保留最后一页的 items（dropped 为丢弃的页数）；
+    coalesce 合并最近 STREAM_BUFFER_EVENTS 页的 items（coalesced 为合并的页数），更早页的 items 丢弃并计入 dropped，
+    订阅者一直不读时积压的 items 也有上限。
+    """
+    last = pages[-1]
+    merged = {**last, "new_added": sum(p["new_added"] for p in pages)}
+    span = sum(_page_span(p) for p in pages)
+    if policy == "drop":
+        merged["dropped"] = span - 1
+        return merged
+    # 从最新一页往前保留 items，保留的页数不超过上限（已合并的事件按其仍带 items 的页数计）
+    keep: list[dict] = []
+    kept = 0
+    for p in reversed(pages):
+        n = _page_span(p) - p.get("dropped", 0)
+        if keep and kept + n > settings.STREAM_BUFFER_EVENTS:
+            break
+        keep.insert(0, p)
+        kept += n
+    merged["items"] = [i for p in keep for i in p.get("items") or []]
+    merged["coalesced"] = span
+    merged.pop("dropped", None)
+    if span > kept:
+        merged["dropped"] = span - kept
+    return merged
+
+
+def _compact_events(events: list[dict], policy: str) -> list[dict]:
+    """积压事件的压缩：account / error 等原样保留，连续的 page 事件按策略合并。"""
+    out: list[dict] = []
+    run: list[dict] = []
+    for evt in events:
+        if evt["type"] == "page":
+            run.append(evt)
+            continue
+        if run:
+            out.append(_merge_pages(run, policy))
+            run = []
+        out.append(evt)
+    if run:
+        out.append(_merge_pages(run, policy))
+    return out
+
+
+class _CrawlFlight:
+    """
+    同一公众号（fakeid）进行中的一次抓取（single-flight）。事件按序缓存，后加入的订阅者先回放已有事件再跟随实时进度。
+    抓取方（生产者）与各订阅者的写出（消费者）解耦：每个订阅者积压超过 STREAM_BUFFER_EVENTS 条时按其背压策略处理——
+    coalesce / drop 在 publish 时即把该订阅者的积压压缩进它自己的溢出缓冲（coalesce 合并 page 事件、drop 只保留最新进度），
+    共享缓存随即可以移出这些事件，订阅者一直不读也不拖慢抓取、不让内存增长；block 则让抓取等待该订阅者追上。
+    所有订阅者都已消费的事件即从缓存中移出（account 等事件保留，page 事件只累计为一条不带 items 的摘要），
+    缓存大小只取决于订阅者的积压，不随账号文章数增长；此后加入的订阅者先收到 account 事件与该摘要（truncated 为合并的页数）。
+    depth 为本次抓取的回填深度：0 为全量回填，n 为浅抓取（库中已有 n 条即停止，剩余历史排入后台任务）。
+    仅在创建它的事件循环内共享。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, depth: int = 0) -> None:
+        self.loop = loop
+        self.depth = depth
+        self.events: list[dict] = []  # 尚未被所有订阅者消费的事件；events[0] 的绝对序号为 _base
+        self.finished = False
+        self.backfill_job: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        # 订阅者全部离开（客户端断开）后放弃抓取；handoff=True 时转交后台任务继续
+        self.subscribers = 0
+        self.abandoned = False
+        self.handoff = False
+        self._fetching: Optional[asyncio.Future] = None
+        self._changed = asyncio.Event()
+        self._done = asyncio.Event()
+        self._base = 0
+        self._head: list[dict] = []  # 已移出缓存的非 page 事件
+        self._summary: Optional[dict] = None  # 已移出缓存的 page 事件的摘要
+        # 订阅者 -> 已消费到的绝对序号；block 策略的订阅者积压超限时生产者在 drain 中等待
+        self._positions: dict[int, int] = {}
+        self._blocking: set[int] = set()
+        # coalesce / drop 订阅者 -> 策略；积压超限时压缩到 _overflow（早于其 _positions 的事件）
+        self._lossy: dict[int, str] = {}
+        self._overflow: dict[int, list[dict]] = {}
+        # 订阅者加入时已移出缓存的部分，订阅开始时先回放
+        self._replays: dict[int, list[dict]] = {}
+        self._consumed = asyncio.Event()
+        self._next_id = 0
+
+    def covers(self, depth: int) -> bool:
+        """本次抓取能否满足回填深度为 depth 的请求（全量回填满足一切请求，浅抓取只满足不超过其条数的浅抓取）。"""
+        return self.depth == 0 or 0 < depth <= self.depth
+
+    def attach(self, backpressure: str) -> int:
+        self.subscribers += 1
+        self._next_id += 1
+        self._positions[self._next_id] = self._base
+        self._replays[self._next_id] = list(self._head) + ([self._summary] if self._summary else [])
+        if backpressure == "block":
+            self._blocking.add(self._next_id)
+        else:
+            self._lossy[self._next_id] = backpressure
+        return self._next_id
+
+    def detach(self, sub: int, *, handoff: bool) -> None:
+        self.subscribers -= 1
+        self.handoff = self.handoff or handoff
+        self._positions.pop(sub, None)
+        self._lossy.pop(sub, None)
+        self._overflow.pop(sub, None)
+        self._replays.pop(sub, None)
+        if sub in self._blocking:
+            self._blocking.discard(sub)
+            self._notify_consumed()
+        self._trim()
+        if self.subscribers <= 0 and not self.finished:
+            self.abandon()
+
+    def abandon(self) -> None:
+        """协作式取消：只打断在途的上游请求，数据库步骤由抓取循环在步骤之间检查 abandoned 后退出。"""
+        self.abandoned = True
+        if self._fetching is not None:
+            self._fetching.cancel()
+        self._notify_consumed()
+
+    async def guard(self, aw):
+        """等待一次上游请求；放弃抓取时该请求被取消。"""
+        self._fetching = asyncio.ensure_future(aw)
+        try:
+            return await self._fetching
+        finally:
+            self._fetching = None
+
+    def publish(self, evt: dict) -> None:
+        self.events.append(evt)
+        limit = settings.STREAM_BUFFER_EVENTS
+        for sub, policy in self._lossy.items():
+            if self._end() - self._positions[sub] > limit:
+                self._spill(sub, policy)
+        self._trim()
+        self._notify()
+
+    async def drain(self) -> None:
+        """生产者在每条事件后调用：存在积压超限的 block 订阅者时等待其消费。"""
+        limit = settings.STREAM_BUFFER_EVENTS
+        while not self.abandoned and any(self._end() - self._positions[sub] > limit for sub in self._blocking):
+            await self._consumed.wait()
+
+    def finish(self) -> None:
+        self.finished = True
+        self._done.set()
+        self._notify()
+
+    async def wait_finished(self) -> None:
+        await self._done.wait()
+
+    async def subscribe(self, sub: int) -> AsyncIterator[dict]:
+        for evt in self._replays.pop(sub, []):
+            yield evt
+        while True:
+            # 被压缩的积压早于当前位置，先送出；送出期间生产者可能再次压缩，位置以 _positions 为准
+            backlog = self._overflow.pop(sub, None)
+            if backlog:
+                for evt in backlog:
+                    yield evt
+                continue
+            pos = self._positions[sub]
+            if pos < self._end():
+                evt = self.events[pos - self._base]
+                self._advance(sub, pos + 1)
+                yield evt
+                continue
+            if self.finished:
+                return
+            await self._changed.wait()
+
+    def _end(self) -> int:
+        return self._base + len(self.events)
+
+    def _spill(self, sub: int, policy: str) -> None:
+        """把订阅者的积压按策略压缩进它的溢出缓冲，位置推进到末尾，共享缓存随后可以移出这些事件。"""
+        pos = self._positions[sub]
+        self._overflow[sub] = _compact_events(self._overflow.get(sub, []) + self.events[pos - self._base:], policy)
+        self._positions[sub] = self._end()
+
+    def _advance(self, sub: int, pos: int) -> None:
+        if sub in self._positions:
+            self._positions[sub] = pos
+        if sub in self._blocking:
+            self._notify_consumed()
+        self._trim()
+
+    def _trim(self) -> None:
+        keep_from = min(self._positions.values(), default=self._end())
+        drop = keep_from - self._base
+        if drop <= 0:
+            return
+        for evt in self.events[:drop]:
+            if evt["type"] != "page":
+                self._head.append(evt)
+            elif self._summary is None:
+                self._summary = {**evt, "items": [], "truncated": 1}
+            else:
+                self._summary = {
+                    **evt,
+                    "new_added": self._summary["new_added"] + evt["new_added"],
+                    "items": [],
+                    "truncated": self._summary["truncated"] + 1,
+                }
+        del self.events[:drop]
+        self._base = keep_from
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _notify_consumed(self) -> None:
+        consumed, self._consumed = self._consumed, asyncio.Event()
+        consumed.set()
+
+
+# fakeid -> 进行中的抓取
+_flights: dict[str, _CrawlFlight] = {}
+
+
+class _BatchSlots:
+    """
+    批量抓取的并发闸门（进程内，跨所有批次）：全局至多 BATCH_CONCURRENCY 个账号同时抓取，
+    同一用户至多 cap 个（由调用方按其未熔断 cookie 数 × BATCH_PER_COOKIE_CONCURRENCY 计算）。仅在当前事件循环内有效。
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._total = 0
+        self._owners: dict[str, int] = {}
+
+    async def acquire(self, owner_email: str, cap: int) -> None:
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self._total < settings.BATCH_CONCURRENCY and self._owners.get(owner_email, 0) < cap)
+            self._total += 1
+            self._owners[owner_email] = self._owners.get(owner_email, 0) + 1
+
+    async def release(self, owner_email: str) -> None:
+        cond = self._condition()
+        async with cond:
+            self._total -= 1
+            left = self._owners.get(owner_email, 1) - 1
+            if left > 0:
+                self._owners[owner_email] = left
+            else:
+                self._owners.pop(owner_email, None)
+            cond.notify_all()
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._cond, self._total, self._owners = loop, asyncio.Condition(), 0, {}
+        return self._cond
+
+
+_batch_slots = _BatchSlots()
+
+
+def mp_account_to_dict(a) -> dict | None:
+    if not a:
+        return None
+    return {
+        "id": a.id,
+        "name": a.name,
+        "biz": a.biz,
+        "description": a.description,
+        "category_id": a.category_id,
+        "owner_email": a.owner_email,
+        "create_time": a.create_time.isoformat() if a.create_time else None,
+        "update_time": a.update_time.isoformat() if a.update_time else None,
+        "avatar_url": a.avatar_url,
+        "avatar": a.avatar,
+        "article_account": a.article_account,
+        "crawl_state": a.crawl_state.value if a.crawl_state else None,
+        "crawl_offset": a.crawl_offset,
+    }
+
+
+def mp_article_to_dict(x) -> dict:
+    # 兼容 ORM 对象与批量入库返回的行 dict
+    if isinstance(x, dict):
+        return {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in x.items()}
+    return {
+        "id": x.id,
+        "title": x.title,
+        "url": x.url,
+        "cover_url": x.cover_url,
+        "publish_date": x.publish_date,
+        "item_show_type": x.item_show_type,
+        "mp_account": x.mp_account,
+        "create_time": x.create_time.isoformat() if x.create_time else None,
+    }
+
+
+def _list_articles_stmts(name: str, offset: int, limit: int):
+    """文章列表的查询语句（账号是否存在、分页、总数）。"""
+    return (
+        select(MpAccount.id).where(MpAccount.name == name),
+        select(MpArticle).where(MpArticle.mp_account == name).order_by(desc(MpArticle.create_time)).offset(offset).limit(limit),
+        select(func.count()).where(MpArticle.mp_account == name),
+    )
+
+
+def event_to_dict(evt: dict) -> dict:
+    """将 astream_search 事件中的 SQLAlchemy 对象 / 行 dict 转为可 JSON 序列化的 dict。"""
+    obj = dict(evt)
+    if obj.get("account") and hasattr(obj["account"], "id"):
+        obj["account"] = mp_account_to_dict(obj["account"])
+    if obj.get("items"):
+        obj["items"] = [mp_article_to_dict(i) for i in obj["items"]]
+    return obj
 
 
 class GzhAccountService:
-    def __init__(self, db: Session, static_root: str = os.path.join("static", "mp_accounts")) -> None:
+    def __init__(self, db: Session) -> None:
         self.db = db
-        self.static_root = static_root
-        os.makedirs(self.static_root, exist_ok=True)
+        self.rate_limiter = CookieRateLimiter(db)
+        # 每次上游请求从用户的全部有效 cookie 中挑选，分摊额度
+        self.cookie_pool = CookiePool(db, self.rate_limiter)
+        self.search_cache = SearchbizCache(db)
+        self.avatars = AvatarStore(db)
 
-    def stream_search(self, *, owner_email: str, name: str, max_articles: int = 0):
+    # ------------------- Crawl engine -------------------
+    async def astream_search(self, *, owner_email: str, name: str, max_articles: int = 0, delta: bool = True, final_items: bool = True, prefetch: bool = False, shallow: bool = False, handoff: bool = False, backpressure: Optional[str] = None) -> AsyncIterator[dict]:
         """
-        流式搜索：每处理完一页就产出一条进度消息。
-        采用 NDJSON（每行一个 JSON 对象）风格，由路由层做 JSON 序列化并通过 StreamingResponse 发送。
+        流式搜索：每处理完一页就产出一条进度消息（NDJSON 风格，由路由层序列化后通过 StreamingResponse 发送）。
         事件结构：
-          - {"type": "account", "account": MpAccount}
-          - {"type": "page", "page": int, "new_added": int, "total_db": int, "items": List[MpArticle], "has_more": bool}
-          - {"type": "done", "total_db": int, "items": List[MpArticle]}
+          - {"type": "account", "account": dict}
+          - {"type": "page", "page": int, "new_added": int, "total_db": int, "items": List[dict], "has_more": bool}
+          - {"type": "done", "total_db": int, "items": List[MpArticle], "account": MpAccount, "backfill_job": Optional[str]}
           - {"type": "error", "message": str}
+        delta=True（默认）：page 事件的 items 仅包含本页新插入的文章；delta=False：page 事件携带当前库中的前 n 条。
+        final_items=False 时 done 事件不携带文章列表（items 为空），客户端可自行用增量拼装。
+        上游请求走进程内共享的 httpx.AsyncClient（连接池 + keep-alive，按 cookie 隔离 jar），不占用线程池线程等待网络；
+        数据库读写仍是短事务，放到线程中执行。
+        shallow=True 且 max_articles>0：回填只抓到满足前 n 条所需的页数即返回，其余历史排入低优先级后台任务，
+        done 事件的 backfill_job 为该任务 id（无需回填时为 None）。
+        prefetch=True：回填阶段拿到 total_count 后并发预取后续分页（CRAWL_PREFETCH_CONCURRENCY 个在途），
+        首次抓取大账号时耗时取决于 cookie 额度而非网络往返。
+        同一公众号的并发搜索合并为一次抓取（single-flight），account / page 事件为已序列化的 dict。
         """
-        from sqlalchemy import desc
-
         try:
-            ck = self._get_current_cookie(owner_email)
+            await asyncio.to_thread(self.cookie_pool.ensure_available, owner_email)
         except ValueError as e:
             yield {"type": "error", "message": str(e)}
             return
 
-        session = self._requests_session_from_cookie(folder=ck.local, cookie_string=None)
-        token = ck.token
-
-        # 1) 搜索账号
         try:
-            search_url = f"https://mp.weixin.qq.com/cgi-bin/searchbiz?action=search_biz&token={token}&lang=zh_CN&f=json&ajax=1&random={time.time()}&query={quote(name)}&begin=0&count=5"
-            data = session.get(search_url, timeout=30).json()
+            entry, err = await self._aresolve_entry(owner_email, name)
         except Exception as e:
             yield {"type": "error", "message": f"搜索失败: {e}"}
             return
-        if not data or not data.get('list'):
-            yield {"type": "error", "message": "未找到公众号"}
+        if err:
+            yield {"type": "error", "message": err}
             return
-        entry = data['list'][0]
-        nickname = entry.get('nickname')
-        fakeid = entry.get('fakeid')
-        avatar_url = entry.get('round_head_img') or ''
-        signature = entry.get('signature') or None
-        if not nickname or not fakeid:
-            yield {"type": "error", "message": "公众号信息不完整"}
+        async for evt in self._acrawl_entry(
+            owner_email, entry, max_articles=max_articles, delta=delta, final_items=final_items, prefetch=prefetch, shallow=shallow, handoff=handoff, backpressure=backpressure
+        ):
+            yield evt
+
+    async def astream_biz(self, *, owner_email: str, biz: str, max_articles: int = 0, delta: bool = True, final_items: bool = True, prefetch: bool = False, shallow: bool = False, handoff: bool = False, backpressure: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        按 biz（fakeid）直接抓取，不请求 searchbiz：biz 须已在 mp_accounts 或搜索候选缓存中出现过。
+        事件结构与 astream_search 相同。
+        """
+        try:
+            await asyncio.to_thread(self.cookie_pool.ensure_available, owner_email)
+        except ValueError as e:
+            yield {"type": "error", "message": str(e)}
+            return
+        entry = await asyncio.to_thread(self.search_cache.entry_for_biz, biz)
+        if entry is None:
+            yield {"type": "error", "message": MSG_NOT_FOUND}
             return
+        async for evt in self._acrawl_entry(
+            owner_email, entry, max_articles=max_articles, delta=delta, final_items=final_items, prefetch=prefetch, shallow=shallow, handoff=handoff, backpressure=backpressure
+        ):
+            yield evt
 
-        if avatar_url and avatar_url.startswith('http://'):
-            avatar_url = avatar_url.replace('http://', 'https://')
-        avatar_local = self._download_avatar(nickname, avatar_url) if avatar_url else None
+    async def _acrawl_entry(
+        self,
+        owner_email: str,
+        entry: dict,
+        *,
+        max_articles: int,
+        delta: bool,
+        final_items: bool,
+        prefetch: bool,
+        shallow: bool,
+        handoff: bool = False,
+        backpressure: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        订阅该公众号（按 fakeid）进行中的抓取；没有则发起一次。并发的搜索共享同一次抓取的进度事件，
+        不重复消耗 cookie 额度；done 事件由各订阅者按自己的 max_articles / final_items 在自己的会话中生成。
+        只合并到能满足本次回填深度的抓取上（见 _join_flight）；prefetch 只影响抓取速度，以发起者为准。
+        订阅者被取消或提前关闭（客户端断开）即退订；最后一个订阅者离开时放弃抓取（断点已逐页保存），
+        任一离开的订阅者 handoff=True 时转交后台任务继续。
+        backpressure 为本订阅者的背压策略（block / coalesce / drop，默认 STREAM_BACKPRESSURE），见 _CrawlFlight。
+        """
+        backpressure = backpressure or settings.STREAM_BACKPRESSURE
+        # 订阅期间可能等待数分钟，不占用本会话（通常是请求的会话）的连接
+        await asyncio.to_thread(self._release_connection)
+        flight = await self._join_flight(owner_email, entry, max_articles=max_articles, prefetch=prefetch, shallow=shallow)
+        sub = flight.attach(backpressure)
+        try:
+            async for evt in flight.subscribe(sub):
+                if evt["type"] == "page" and not delta:
+                    evt = {**evt, "items": await asyncio.to_thread(self._top_items, entry['nickname'], max_articles)}
+                yield evt
+                if evt["type"] == "error":
+                    return
+        finally:
+            flight.detach(sub, handoff=handoff)
+        acc = await asyncio.to_thread(self._account_by_biz, entry['fakeid'])
+        yield await asyncio.to_thread(self._done_event, acc, max_articles=max_articles, final_items=final_items, backfill_job=flight.backfill_job)
 
-        existed_before = bool(self.db.scalar(select(MpAccount).where(MpAccount.name == nickname)))
-        acc = self.db.scalar(select(MpAccount).where(MpAccount.name == nickname))
-        if not acc:
-            acc = MpAccount(
-                name=nickname,
-                biz=fakeid,
-                description=signature,
-                category_id=None,
-                owner_email=owner_email,
-                avatar_url=avatar_url,
-                avatar=avatar_local,
-                article_account=0,
-            )
-            self.db.add(acc)
-        else:
-            acc.biz = fakeid
-            acc.description = signature
-            acc.avatar_url = avatar_url
-            acc.avatar = avatar_local
-            acc.update_time = datetime.now(timezone.utc)
-            self.db.add(acc)
-        self.db.commit()
-        self.db.refresh(acc)
+    async def _join_flight(self, owner_email: str, entry: dict, *, max_articles: int, prefetch: bool, shallow: bool) -> _CrawlFlight:
+        """
+        返回该公众号进行中且能满足本次请求的抓取，没有则发起一次。进行中的是更浅的浅抓取时，等它结束后再发起新的抓取：
+        否则全量请求（包括该浅抓取 defer 时排入的回填任务）会挂到浅抓取上而拿不到剩余历史。
+        """
+        key = entry['fakeid']
+        loop = asyncio.get_running_loop()
+        depth = max_articles if (shallow and max_articles > 0) else 0
+        while (flight := _flights.get(key)) is not None and flight.loop is loop and not flight.finished and not flight.abandoned:
+            if flight.covers(depth):
+                return flight
+            await flight.wait_finished()
+        flight = _flights[key] = _CrawlFlight(loop, depth)
+        flight.task = loop.create_task(
+            self._arun_flight(key, flight, owner_email, entry, max_articles=max_articles, prefetch=prefetch, shallow=shallow)
+        )
+        return flight
 
-        # 发送账号信息事件
-        yield {"type": "account", "account": acc}
+    async def _arun_flight(self, key: str, flight: _CrawlFlight, owner_email: str, entry: dict, *, max_articles: int, prefetch: bool, shallow: bool) -> None:
+        # 抓取在独立任务与独立会话中进行：发起请求断开后，其它订阅者仍能收到完整进度
+        db = SessionLocal()
+        try:
+            leader = GzhAccountService(db)
+            async for evt in leader._acrawl_pages(owner_email, entry, flight, max_articles=max_articles, prefetch=prefetch, shallow=shallow):
+                flight.publish(event_to_dict(evt))
+                await flight.drain()
+            if flight.abandoned and flight.handoff:
+                await asyncio.to_thread(leader._enqueue_crawl, owner_email, entry['nickname'], max_articles)
+        except Exception as e:
+            flight.publish({"type": "error", "message": f"抓取异常: {e}"})
+        finally:
+            if _flights.get(key) is flight:
+                del _flights[key]
+            flight.finish()
+            db.close()
 
-        # 工具：获取并返回当前前 n 条
-        def current_top_items() -> list[MpArticle]:
-            q = select(MpArticle).where(MpArticle.mp_account == nickname).order_by(desc(MpArticle.publish_date), desc(MpArticle.create_time))
-            if max_articles and max_articles > 0:
-                q = q.limit(max_articles)
-            return self.db.scalars(q).all()
+    async def _acrawl_pages(self, owner_email: str, entry: dict, flight: _CrawlFlight, *, max_articles: int, prefetch: bool, shallow: bool) -> AsyncIterator[dict]:
+        """抓取本体：产出 account / page（delta）/ error 事件，不产出 done。"""
+        acc, existed_before = await asyncio.to_thread(self._upsert_entry, owner_email, entry)
 
-        page_no = 0
-        if not existed_before:
-            # 首次：全量抓取
-            begin = 0
-            while True:
-                page_no += 1
-                page, count = self._fetch_articles_page(session=session, token=token, fakeid=fakeid, begin=begin, count=5)
-                if not page:
-                    break
-                new_objs = self._persist_articles(nickname, page)
-                # 更新统计
-                acc.article_account = self.db.scalar(select(func.count()).where(MpArticle.mp_account == nickname)) or 0
-                acc.update_time = datetime.now(timezone.utc)
-                self.db.add(acc)
-                self.db.commit()
-                self.db.refresh(acc)
-
-                items = current_top_items()
-                has_more = bool(count and begin + 5 < count)
-                yield {
-                    "type": "page",
-                    "page": page_no,
-                    "new_added": len(new_objs),
-                    "total_db": acc.article_account,
-                    "items": items,
-                    "has_more": has_more,
-                }
-                begin += 5
-                if count and begin >= count:
-                    break
-        else:
-            # 增量：遇到第一条已存在即停止
-            begin = 0
-            stop = False
-            while not stop:
-                page_no += 1
-                page, count = self._fetch_articles_page(session=session, token=token, fakeid=fakeid, begin=begin, count=5)
-                if not page:
-                    break
-                new_objs: list[MpArticle] = []
-                for a in page:
-                    url = a.get('link') or ''
-                    if not url:
-                        continue
-                    exists = self.db.scalar(select(MpArticle).where(MpArticle.url == url))
-                    if exists:
-                        stop = True
-                        break
-                    ist = a.get('item_show_type')
-                    ist_int = int(ist) if isinstance(ist, int) else (int(ist) if isinstance(ist, str) and ist.isdigit() else None)
-                    obj = MpArticle(
-                        title=a.get('title') or '无标题',
-                        url=url,
-                        cover_url=a.get('cover') or None,
-                        publish_date=datetime.fromtimestamp(a.get('update_time') or 0, tz=timezone.utc).isoformat() if a.get('update_time') else None,
-                        item_show_type=ist_int,
-                        mp_account=nickname,
-                    )
-                    self.db.add(obj)
-                    new_objs.append(obj)
-                if new_objs:
-                    self.db.commit()
-                    for o in new_objs:
-                        self.db.refresh(o)
-                # 更新统计
-                acc.article_account = self.db.scalar(select(func.count()).where(MpArticle.mp_account == nickname)) or 0
-                acc.update_time = datetime.now(timezone.utc)
-                self.db.add(acc)
-                self.db.commit()
-                self.db.refresh(acc)
-
-                items = current_top_items()
-                has_more = not stop and bool(count and begin + 5 < count)
-                yield {
-                    "type": "page",
-                    "page": page_no,
-                    "new_added": len(new_objs),
-                    "total_db": acc.article_account,
-                    "items": items,
-                    "has_more": has_more,
-                }
-                if stop:
-                    break
-                begin += 5
-                if count and begin >= count:
-                    break
-
-        # 完成事件
-        final_items = current_top_items()
-        yield {"type": "done", "total_db": len(final_items) if (max_articles and max_articles > 0) else acc.article_account, "items": final_items, "account": acc}
-
-    def _get_current_cookie(self, owner_email: str) -> Cookie:
-        stmt = select(Cookie).where(and_(Cookie.owner_email == owner_email, Cookie.is_current == True))
-        ck = self.db.scalar(stmt)
-        if not ck:
-            raise ValueError("当前没有可用的cookie，请先登录并设置当前cookie")
-        # 过期检查
-        from datetime import datetime, timezone
-        if ck.expire_time <= datetime.now(timezone.utc):
-            raise ValueError("当前cookie已过期，请重新登录")
-        return ck
-
-    def _requests_session_from_cookie(self, folder: str, cookie_string: Optional[str] = None) -> requests.Session:
-        import pickle
-        s = requests.Session()
-        # headers 基础设置
-        s.headers.update({
-            'accept': '*/*',
-            'accept-language': 'zh-CN,zh;q=0.9',
-            'referer': 'https://mp.weixin.qq.com/',
-            'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
-            'x-requested-with': 'XMLHttpRequest'
-        })
-        # 载入 cookies
-        cookie_path = os.path.join(folder, 'gzhcookies.cookie')
-        if os.path.exists(cookie_path):
-            try:
-                with open(cookie_path, 'rb') as f:
-                    s.cookies = pickle.load(f)
-            except Exception:
-                pass
-        if cookie_string:
-            s.headers['Cookie'] = cookie_string
-        return s
-
-    def _download_avatar(self, name: str, avatar_url: str) -> str:
-        safe_name = ''.join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        folder = os.path.join(self.static_root, safe_name)
-        os.makedirs(folder, exist_ok=True)
-        import urllib.parse
-        ext = '.jpg'
-        try:
-            path = urllib.parse.urlparse(avatar_url).path
-            _, e = os.path.splitext(path)
-            if e:
-                ext = e
-        except Exception:
-            pass
-        local = os.path.join(folder, f"avatar{ext}")
+        yield {"type": "account", "account": acc}
+
+        # 抓取状态机内的数据库操作在线程中推进
+        steps = self._crawl_steps(acc, existed_before, max_articles=max_articles, prefetch=prefetch, shallow=shallow)
+        prefetcher = None
+        side_db = None
+        if prefetch:
+            # 预取请求与状态机的入库并发执行，cookie 池使用独立会话
+            side_db = SessionLocal()
+            pool = CookiePool(side_db)
+            prefetcher = _PagePrefetcher(
+                lambda b: self._afetch_articles_page(owner_email=owner_email, fakeid=entry['fakeid'], begin=b, count=PAGE_SIZE, pool=pool),
+                settings.CRAWL_PREFETCH_CONCURRENCY,
+            )
+        reply = None
         try:
-            r = requests.get(avatar_url, timeout=10)
-            if r.status_code == 200:
-                with open(local, 'wb') as f:
-                    f.write(r.content)
-        except Exception:
-            pass
-        return local
-
-    # ------------------- Search account -------------------
-    def search_account(self, *, owner_email: str, name: str, max_articles: int = 0) -> tuple[Optional[MpAccount], list[MpArticle]]:
+            # 每一步之前检查是否已被放弃：数据库步骤在线程中执行，不能中途取消
+            while not flight.abandoned and (step := await asyncio.to_thread(self._next_step, steps, reply)) is not None:
+                kind, arg = step
+                reply = None
+                if kind == "fetch":
+                    try:
+                        if prefetcher is not None:
+                            reply = await flight.guard(prefetcher.get(arg))
+                        else:
+                            reply = await flight.guard(self._afetch_articles_page(owner_email=owner_email, fakeid=entry['fakeid'], begin=arg, count=PAGE_SIZE))
+                    except GzhFetchError as e:
+                        yield {"type": "error", "message": f"{MSG_INTERRUPTED}: {e}"}
+                        return
+                    except asyncio.CancelledError:
+                        if not flight.abandoned:
+                            raise
+                        return
+                elif kind == "prefetch":
+                    prefetcher.plan(arg)
+                elif kind == "defer":
+                    flight.backfill_job = await asyncio.to_thread(self._enqueue_backfill, owner_email, acc.name)
+                else:
+                    yield arg
+        finally:
+            steps.close()
+            if prefetcher is not None:
+                prefetcher.close()
+                side_db.close()
+
+    def _account_by_biz(self, fakeid: str) -> Optional[MpAccount]:
+        return self.db.scalar(select(MpAccount).where(MpAccount.biz == fakeid))
+
+    async def asearch_account(self, *, owner_email: str, name: str, max_articles: int = 0, prefetch: bool = False, shallow: bool = False) -> tuple[Optional[MpAccount], list[MpArticle]]:
+        """
+        搜索并抓取：首次搜索全量回填，再次搜索增量抓取（遇到第一条已存在即停止），回填中断的账号从断点续抓；
+        返回账号与库中按发布时间倒序的前 n 条（n<=0 表示全量）。未找到返回 (None, [])，cookie 等问题抛 ValueError。
         """
-        新逻辑：
-        1) 首次搜索（库中无该账号）：先全量抓取并入库，再返回按发布时间倒序的前 n 条（n<=0 表示全量返回）。
-        2) 再次搜索（库中已有该账号）：进行增量抓取，从第 1 页开始按时间从新到旧遍历；
-           在同一页内遇到第一条“已存在”的文章即停止继续翻页（认为已到达重叠边界），
-           将本页之前的新文章入库；然后返回按发布时间倒序的前 n 条（n<=0 表示全量返回）。
-        返回的 articles 为“当前库中的前 n 条”，不再仅限于“本次新增”。
+        biz: Optional[str] = None
+        async for evt in self.astream_search(owner_email=owner_email, name=name, max_articles=max_articles, delta=True, final_items=True, prefetch=prefetch, shallow=shallow):
+            if evt["type"] == "account" and evt.get("account"):
+                biz = evt["account"]["biz"]
+            elif evt["type"] == "error":
+                if evt["message"] in (MSG_NOT_FOUND, MSG_INCOMPLETE):
+                    return None, []
+                if evt["message"].startswith(MSG_INTERRUPTED) and biz is not None:
+                    # 分页中断不报错，返回库中现有的前 n 条，断点留待下次续抓
+                    return await asyncio.to_thread(self._account_with_top_items, biz, max_articles)
+                raise ValueError(evt["message"])
+            elif evt["type"] == "done":
+                return evt["account"], evt["items"]
+        return None, []
+
+    def _account_with_top_items(self, biz: str, max_articles: int) -> tuple[Optional[MpAccount], list[MpArticle]]:
+        acc = self._account_by_biz(biz)
+        if acc is None:
+            return None, []
+        return acc, self._top_items(acc.name, max_articles)
+
+    async def astream_batch(
+        self,
+        *,
+        owner_email: str,
+        names: list[str],
+        bizs: list[str],
+        max_articles: int = 0,
+        final_items: bool = False,
+        prefetch: bool = False,
+        shallow: bool = False,
+        handoff: bool = False,
+        backpressure: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
         """
-        from sqlalchemy import desc
+        批量抓取多个公众号（名称或 biz），并发执行，事件按完成先后交错产出。
+        每个账号的 account / page / done / error 事件原样转发（已转为 dict），附带 index（请求中的序号）与 target；
+        每个账号结束后产出 {"type": "summary", "index", "target", "ok", "account", "new_added", "total_db", "message"}，
+        全部结束后产出 {"type": "batch_done", "total", "succeeded", "failed"}。
+        并发受进程级闸门限制（全局 BATCH_CONCURRENCY，每用户按未熔断 cookie 数 × BATCH_PER_COOKIE_CONCURRENCY），
+        每个账号在独立会话中抓取，同名 / 同 biz 的并发抓取仍由 single-flight 合并。
+        汇总队列有界（STREAM_BUFFER_EVENTS）：写出跟不上时各账号的订阅按 backpressure 策略积压 / 合并，不拖慢抓取。
+        """
+        try:
+            cookies = await asyncio.to_thread(self.cookie_pool.cookies, owner_email)
+            await asyncio.to_thread(self.cookie_pool.ensure_available, owner_email)
+        except ValueError as e:
+            yield {"type": "error", "message": str(e)}
+            return
+        cap = max(1, sum(1 for c in cookies if not breaker.is_open(c.token))) * settings.BATCH_PER_COOKIE_CONCURRENCY
 
-        ck = self._get_current_cookie(owner_email)
-        session = self._requests_session_from_cookie(folder=ck.local, cookie_string=None)
-        token = ck.token
+        targets = [{"name": n} for n in dict.fromkeys(names)] + [{"biz": b} for b in dict.fromkeys(bizs)]
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.STREAM_BUFFER_EVENTS)
+        tasks = [
+            asyncio.create_task(
+                self._abatch_target(
+                    queue,
+                    owner_email,
+                    i,
+                    t,
+                    cap=cap,
+                    max_articles=max_articles,
+                    final_items=final_items,
+                    prefetch=prefetch,
+                    shallow=shallow,
+                    handoff=handoff,
+                    backpressure=backpressure,
+                )
+            )
+            for i, t in enumerate(targets)
+        ]
+        succeeded = 0
+        try:
+            for _ in range(len(targets)):
+                while (evt := await queue.get())["type"] != "summary":
+                    yield evt
+                succeeded += evt["ok"]
+                yield evt
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        yield {"type": "batch_done", "total": len(targets), "succeeded": succeeded, "failed": len(targets) - succeeded}
+
+    async def _abatch_target(
+        self,
+        queue: asyncio.Queue,
+        owner_email: str,
+        index: int,
+        target: dict,
+        *,
+        cap: int,
+        max_articles: int,
+        final_items: bool,
+        prefetch: bool,
+        shallow: bool,
+        handoff: bool,
+        backpressure: Optional[str],
+    ) -> None:
+        summary = {"type": "summary", "index": index, "target": target, "ok": False, "account": None, "new_added": 0, "total_db": 0, "message": None}
+        await _batch_slots.acquire(owner_email, cap)
+        db = SessionLocal()
+        try:
+            svc = GzhAccountService(db)
+            options = dict(
+                owner_email=owner_email,
+                max_articles=max_articles,
+                final_items=final_items,
+                prefetch=prefetch,
+                shallow=shallow,
+                handoff=handoff,
+                backpressure=backpressure,
+            )
+            if "name" in target:
+                events = svc.astream_search(name=target["name"], **options)
+            else:
+                events = svc.astream_biz(biz=target["biz"], **options)
+            async for evt in events:
+                evt = event_to_dict(evt)
+                if evt["type"] == "account" and evt.get("account"):
+                    summary["account"] = evt["account"]["name"]
+                elif evt["type"] == "page":
+                    summary["new_added"] += evt["new_added"]
+                elif evt["type"] == "done":
+                    summary["ok"], summary["total_db"] = True, evt["total_db"]
+                elif evt["type"] == "error":
+                    summary["message"] = evt["message"]
+                await queue.put({"index": index, "target": target, **evt})
+        except Exception as e:
+            summary["message"] = f"抓取异常: {e}"
+        finally:
+            db.close()
+            await _batch_slots.release(owner_email)
+        await queue.put(summary)
+
+    async def _aresolve_entry(self, owner_email: str, name: str) -> tuple[Optional[dict], Optional[str]]:
+        """名称 -> entry：先查解析缓存，未命中再请求 searchbiz 并缓存全部候选。返回 (entry, error_message)。"""
+        entry = await asyncio.to_thread(self.search_cache.lookup, name)
+        if entry is not None:
+            return entry, None
+        data = await self._asearch_biz(owner_email, name)
+        await asyncio.to_thread(self.search_cache.store, name, data)
+        return self._pick_search_entry(data)
+
+    async def _asearch_biz(self, owner_email: str, name: str) -> dict:
+        return await UpstreamFetcher(self.cookie_pool).aget(owner_email, lambda token: self._search_url(token, name), dict)
+
+    async def _afetch_articles_page(self, *, owner_email: str, fakeid: str, begin: int, count: int, pool: Optional[CookiePool] = None) -> tuple[list[dict], int | None]:
+        # 每次尝试单独从 cookie 池挑选登录态并在其令牌桶排队，额度不足时等待而不是失败；瞬时错误 / 频控退避重试
+        return await UpstreamFetcher(pool or self.cookie_pool).aget(
+            owner_email, lambda token: self._articles_url(token, fakeid, begin, count), self._parse_articles_page
+        )
+
+    # ------------------- Crawl steps -------------------
+    def _search_url(self, token: str, name: str) -> str:
+        return f"https://mp.weixin.qq.com/cgi-bin/searchbiz?action=search_biz&token={token}&lang=zh_CN&f=json&ajax=1&random={time.time()}&fingerprint={fingerprint()}&query={quote(name)}&begin=0&count=5"
+
+    def _articles_url(self, token: str, fakeid: str, begin: int, count: int) -> str:
+        return f"https://mp.weixin.qq.com/cgi-bin/appmsgpublish?sub=list&search_field=null&begin={begin}&count={count}&query=&fakeid={fakeid}&type=101_1&free_publish_type=1&sub_action=list_ex&fingerprint={fingerprint()}&token={token}&lang=zh_CN&f=json&ajax=1"
 
-        # 1) 搜索账号
-        search_url = f"https://mp.weixin.qq.com/cgi-bin/searchbiz?action=search_biz&token={token}&lang=zh_CN&f=json&ajax=1&random={time.time()}&query={quote(name)}&begin=0&count=5"
-        data = session.get(search_url, timeout=30).json()
+    def _pick_search_entry(self, data: dict) -> tuple[Optional[dict], Optional[str]]:
+        """从 searchbiz 响应中取第一个候选，返回 (entry, error_message)。"""
         if not data or not data.get('list'):
-            return None, []
-        entry = data['list'][0]
-        nickname = entry.get('nickname')
-        fakeid = entry.get('fakeid')
-        avatar_url = entry.get('round_head_img') or ''
-        signature = entry.get('signature') or None
-        if not nickname or not fakeid:
-            return None, []
+            return None, MSG_NOT_FOUND
+        entry = normalize_search_entry(data['list'][0])
+        if entry is None:
+            return None, MSG_INCOMPLETE
+        return entry, None
 
-        # 下载头像
-        if avatar_url and avatar_url.startswith('http://'):
-            avatar_url = avatar_url.replace('http://', 'https://')
-        avatar_local = self._download_avatar(nickname, avatar_url) if avatar_url else None
+    def _avatar_for(self, entry: dict) -> Optional[str]:
+        """头像走内容寻址缓存：请求路径只查缓存，下载 / 条件重新验证在后台完成并回填 avatar。"""
+        return self.avatars.resolve(entry['avatar_url'])
 
-        # 记录是否为首次（库中是否已有该账号）
-        existed_before = bool(self.db.scalar(select(MpAccount).where(MpAccount.name == nickname)))
+    def _upsert_entry(self, owner_email: str, entry: dict) -> tuple[MpAccount, bool]:
+        return self._upsert_account(owner_email, entry, self._avatar_for(entry))
 
-        # Upsert mp_accounts
-        acc = self.db.scalar(select(MpAccount).where(MpAccount.name == nickname))
+    def _upsert_account(self, owner_email: str, entry: dict, avatar_local: Optional[str]) -> tuple[MpAccount, bool]:
+        """按昵称 upsert mp_accounts，返回 (账号, 库中是否已存在)。"""
+        acc = self.db.scalar(select(MpAccount).where(MpAccount.name == entry['nickname']))
+        existed_before = acc is not None
         if not acc:
             acc = MpAccount(
-                name=nickname,
-                biz=fakeid,
-                description=signature,
+                name=entry['nickname'],
+                biz=entry['fakeid'],
+                description=entry['signature'],
                 category_id=None,
                 owner_email=owner_email,
-                avatar_url=avatar_url,
+                avatar_url=entry['avatar_url'],
                 avatar=avatar_local,
                 article_account=0,
+                crawl_state=CrawlState.backfilling,
+                crawl_offset=0,
             )
             self.db.add(acc)
         else:
-            acc.biz = fakeid
-            acc.description = signature
-            acc.avatar_url = avatar_url
-            acc.avatar = avatar_local
+            acc.biz = entry['fakeid']
+            acc.description = entry['signature']
+            if not entry['avatar_url']:
+                acc.avatar = None
+            elif avatar_local:
+                acc.avatar = avatar_local
+            # 否则新头像尚未下载完成：保留旧文件，后台下载完成后按 avatar_url 回填
+            acc.avatar_url = entry['avatar_url']
             acc.update_time = datetime.now(timezone.utc)
             self.db.add(acc)
         self.db.commit()
         self.db.refresh(acc)
+        return acc, existed_before
 
-        # 2) 抓取文章
-        if not existed_before:
-            # 首次：全量抓取
-            begin = 0
-            while True:
-                page, count = self._fetch_articles_page(session=session, token=token, fakeid=fakeid, begin=begin, count=5)
-                if not page:
-                    break
-                _ = self._persist_articles(nickname, page)
-                begin += 5
-                if count and begin >= count:
-                    break
+    def _ingest_page(
+        self,
+        acc: MpAccount,
+        page: list[dict],
+        *,
+        incremental: bool,
+        checkpoint: Optional[tuple[int, Optional[int]]] = None,
+        watermark: Optional[tuple[int, str]] = None,
+    ) -> tuple[list[dict], bool]:
+        """
+        入库一页，返回 (新插入的行, 是否到达重叠边界)。增量模式下只入库第一条已存在文章之前的部分：
+        有水位线时在内存中比对，不查询文章表；存量账号尚无水位线时回退为一次 URL 的 IN 查询。
+        watermark 为本次抓取首页的头条；回填页直接写入，增量页仅在到达边界时写入（中途失败不前移，避免漏抓缺口）。
+        """
+        if incremental:
+            if acc.watermark_time is not None:
+                fresh, stop = self._take_until_watermark(acc, page)
+            else:
+                fresh, stop = self._take_until_known(page)
+            if not stop:
+                watermark = None
         else:
-            # 存在：增量抓取，遇到第一条已存在即停止
-            begin = 0
-            stop = False
-            while not stop:
-                page, count = self._fetch_articles_page(session=session, token=token, fakeid=fakeid, begin=begin, count=5)
-                if not page:
-                    break
-                new_objs: list[MpArticle] = []
-                for a in page:
-                    url = a.get('link') or ''
-                    if not url:
-                        continue
-                    exists = self.db.scalar(select(MpArticle).where(MpArticle.url == url))
-                    if exists:
-                        stop = True
-                        break
-                    # 未存在则入内存，稍后批量提交
-                    ist = a.get('item_show_type')
-                    ist_int = int(ist) if isinstance(ist, int) else (int(ist) if isinstance(ist, str) and ist.isdigit() else None)
-                    obj = MpArticle(
-                        title=a.get('title') or '无标题',
-                        url=url,
-                        cover_url=a.get('cover') or None,
-                        publish_date=datetime.fromtimestamp(a.get('update_time') or 0, tz=timezone.utc).isoformat() if a.get('update_time') else None,
-                        item_show_type=ist_int,
-                        mp_account=nickname,
-                    )
-                    self.db.add(obj)
-                    new_objs.append(obj)
-                if new_objs:
-                    self.db.commit()
-                    for o in new_objs:
-                        self.db.refresh(o)
-                if stop:
-                    break
-                begin += 5
-                if count and begin >= count:
-                    break
-
-        # 3) 更新统计
-        acc.article_account = self.db.scalar(select(func.count()).where(MpArticle.mp_account == nickname)) or 0
-        acc.update_time = datetime.now(timezone.utc)
-        self.db.add(acc)
+            fresh, stop = page, False
+        if watermark is not None and acc.watermark_time is not None and (watermark[0], watermark[1]) == (acc.watermark_time, acc.watermark_msgid or ''):
+            watermark = None
+        return self._persist_articles(acc.name, fresh, checkpoint=checkpoint, watermark=watermark), stop
+
+    def _crawl_steps(self, acc: MpAccount, existed_before: bool, *, max_articles: int, prefetch: bool = False, shallow: bool = False):
+        """
+        抓取状态机：yield ("fetch", begin) 请求上游分页，由驱动方 send((page, total_count)) 回传；
+        yield ("event", evt) 产出 page 事件。
+          - 新账号：从 begin=0 全量回填，每页与入库同事务写入断点（crawl_offset / crawl_total）。
+          - 已回填完成的账号：增量抓取，遇到第一条已存在即停止。
+          - 回填中断的账号：先增量追平头部新文章，再从断点继续回填；
+            断点按 total_count 的变化修正偏移（期间新发布会把旧文章往后推），并回退一页兜底，重叠部分由 URL 去重吸收。
+        读到列表末尾即标记回填完成。上游失败由驱动方以 GzhFetchError 处理，断点保持不变。
+        prefetch=True 时，回填段拿到首页的 total_count 后 yield ("prefetch", [begin, ...]) 告知驱动方后续全部偏移，
+        驱动方可并发预取；状态机仍按偏移顺序逐页消费。
+        shallow=True 时，回填段一旦库中已有 max_articles 条即 yield ("defer", None) 并结束：断点保留为 backfilling，
+        由驱动方把剩余历史排入后台任务（任务再次进入本状态机时从断点续抓）。
+        """
+        backfilling = acc.crawl_state == CrawlState.backfilling
+        head = existed_before  # 头部增量阶段
+        planned = False
+        mark: Optional[tuple[int, str]] = None  # 本次抓取首页头条，作为新的水位线
+        page_no = 0
+        begin = 0
+        while True:
+            page_no += 1
+            page, count = yield ("fetch", begin)
+            if not page:
+                break
+            if prefetch and not head and not planned and count:
+                planned = True
+                yield ("prefetch", list(range(begin + PAGE_SIZE, count, PAGE_SIZE)))
+            if mark is None:
+                mark = self._page_mark(page)
+            if head:
+                new_objs, stop = self._ingest_page(acc, page, incremental=True, watermark=mark)
+            else:
+                new_objs, stop = self._ingest_page(
+                    acc, page, incremental=False, checkpoint=(begin + PAGE_SIZE, count), watermark=mark if begin == 0 else None
+                )
+            resume = self._resume_offset(acc, count, begin) if (stop and backfilling) else None
+            yield ("event", self._page_event(acc, page_no, begin, count, new_objs, stop and resume is None))
+            if stop:
+                if resume is None:
+                    return
+                if self._shallow_satisfied(acc, shallow, max_articles):
+                    yield ("defer", None)
+                    return
+                head, begin = False, resume
+                continue
+            begin += PAGE_SIZE
+            if count and begin >= count:
+                break
+            if not head and self._shallow_satisfied(acc, shallow, max_articles):
+                yield ("defer", None)
+                return
+        if backfilling or not existed_before:
+            self._mark_backfill_complete(acc.name)
+
+    def _shallow_satisfied(self, acc: MpAccount, shallow: bool, max_articles: int) -> bool:
+        return shallow and max_articles > 0 and acc.article_account >= max_articles
+
+    def _enqueue_backfill(self, owner_email: str, account_name: str) -> str:
+        """把剩余历史的回填排入低优先级后台任务；已有未结束的同名任务时复用。"""
+        from app.services.crawl_jobs import PRIORITY_BACKFILL, CrawlJobService, runner
+
+        jobs = CrawlJobService(self.db)
+        job = jobs.find_active_job(owner_email=owner_email, name=account_name)
+        if job is None:
+            job = jobs.create_job(owner_email=owner_email, name=account_name, max_articles=0, priority=PRIORITY_BACKFILL)
+            runner.submit(job.id, PRIORITY_BACKFILL)
+        return job.id
+
+    def _enqueue_crawl(self, owner_email: str, account_name: str, max_articles: int) -> str:
+        """把被放弃的流式抓取转交后台任务（从已保存的断点 / 水位线继续）；已有未结束的同名任务时复用。"""
+        from app.services.crawl_jobs import PRIORITY_NORMAL, CrawlJobService, runner
+
+        jobs = CrawlJobService(self.db)
+        job = jobs.find_active_job(owner_email=owner_email, name=account_name)
+        if job is None:
+            job = jobs.create_job(owner_email=owner_email, name=account_name, max_articles=max_articles, priority=PRIORITY_NORMAL)
+            runner.submit(job.id, PRIORITY_NORMAL)
+        return job.id
+
+    def _next_step(self, steps, reply):
+        # StopIteration 不能穿过线程 / Future 边界，统一转换为 None
+        try:
+            return steps.send(reply)
+        except StopIteration:
+            return None
+        finally:
+            # 下一步通常是等待上游分页：先把连接还给连接池
+            self._release_connection()
+
+    def _release_connection(self) -> None:
+        """
+        结束会话当前的事务（此时只剩读取，写入均已提交），把连接还给连接池；会话本身继续使用，
+        ORM 对象在下次访问时按主键重新加载。长时间抓取因此只在数据库步骤期间占用连接，
+        连接池大小不再限制并发抓取数。
+        """
+        if self.db.in_transaction():
+            self.db.commit()
+
+    def _resume_offset(self, acc: MpAccount, count: int | None, head_begin: int) -> int:
+        offset = acc.crawl_offset or 0
+        if count and acc.crawl_total:
+            offset += count - acc.crawl_total
+        return max(head_begin, offset - PAGE_SIZE, 0)
+
+    def _mark_backfill_complete(self, account_name: str) -> None:
+        self.db.execute(
+            update(MpAccount)
+            .where(MpAccount.name == account_name)
+            .values(crawl_state=CrawlState.complete, crawl_offset=None, crawl_total=None)
+            .execution_options(synchronize_session=False)
+        )
         self.db.commit()
-        self.db.refresh(acc)
 
-        # 4) 返回：按发布时间从近到远取前 n 条（n<=0 表示全量）
-        q = select(MpArticle).where(MpArticle.mp_account == nickname).order_by(desc(MpArticle.publish_date), desc(MpArticle.create_time))
+    def _top_items(self, account_name: str, max_articles: int) -> list[MpArticle]:
+        # 按发布时间从近到远取前 n 条（n<=0 表示全量）
+        q = select(MpArticle).where(MpArticle.mp_account == account_name).order_by(desc(MpArticle.publish_date), desc(MpArticle.create_time))
         if max_articles and max_articles > 0:
             q = q.limit(max_articles)
-        top_items = self.db.scalars(q).all()
-        return acc, top_items
+        return self.db.scalars(q).all()
 
-    def _fetch_articles_page(self, *, session: requests.Session, token: str, fakeid: str, begin: int, count: int) -> tuple[list[dict], int | None]:
-        url = f"https://mp.weixin.qq.com/cgi-bin/appmsgpublish?sub=list&search_field=null&begin={begin}&count={count}&query=&fakeid={fakeid}&type=101_1&free_publish_type=1&sub_action=list_ex&fingerprint={int(time.time())}&token={token}&lang=zh_CN&f=json&ajax=1"
+    def _page_event(self, acc: MpAccount, page_no: int, begin: int, count: int | None, new_objs: list[dict], stop: bool) -> dict:
+        return {
+            "type": "page",
+            "page": page_no,
+            "new_added": len(new_objs),
+            "total_db": acc.article_account,
+            "items": new_objs,
+            "has_more": not stop and bool(count and begin + PAGE_SIZE < count),
+        }
+
+    def _done_event(self, acc: MpAccount, *, max_articles: int, final_items: bool, backfill_job: Optional[str] = None) -> dict:
+        if not final_items:
+            return {"type": "done", "total_db": acc.article_account, "items": [], "account": acc, "backfill_job": backfill_job}
+        top_items = self._top_items(acc.name, max_articles)
+        total_db = len(top_items) if (max_articles and max_articles > 0) else acc.article_account
+        return {"type": "done", "total_db": total_db, "items": top_items, "account": acc, "backfill_job": backfill_job}
+
+    def _parse_articles_page(self, data: dict) -> tuple[list[dict], int | None]:
+        """解析 appmsgpublish 响应；结构异常时抛 GzhFetchError（错误码已由请求层分类），空列表才表示已到末尾。"""
+        check_base_resp(data)
         try:
-            r = session.get(url, timeout=30)
-            data = r.json()
             publish_page = json.loads(data.get('publish_page', '{}'))
-            total_count = publish_page.get('total_count')
-            out: list[dict] = []
-            for item in publish_page.get('publish_list', []):
-                try:
-                    pub = json.loads(item.get('publish_info', '{}'))
-                except Exception:
-                    pub = {}
-                for art in pub.get('appmsgex', []) or []:
-                    # 注意：item_show_type 可能为 0（有效值），不能用 "or" 回退
-                    item_show_type_raw = art.get('item_show_type')
-                    out.append({
-                        'title': art.get('title') or '无标题',
-                        'cover': art.get('cover') or '',
-                        'link': art.get('link') or '',
-                        'update_time': art.get('update_time') or 0,
-                        'item_show_type': item_show_type_raw if item_show_type_raw is not None else None,
-                    })
-            return out, total_count
-        except Exception:
-            return [], None
-
-    def _persist_articles(self, account_name: str, items: list[dict]) -> list[MpArticle]:
-        new_objs: list[MpArticle] = []
+        except Exception as e:
+            raise GzhFetchError(f"publish_page 无法解析: {e}") from e
+        total_count = publish_page.get('total_count')
+        out: list[dict] = []
+        for item in publish_page.get('publish_list', []):
+            try:
+                pub = json.loads(item.get('publish_info', '{}'))
+            except Exception:
+                pub = {}
+            for art in pub.get('appmsgex', []) or []:
+                # 注意：item_show_type 可能为 0（有效值），不能用 "or" 回退
+                item_show_type_raw = art.get('item_show_type')
+                out.append({
+                    'title': art.get('title') or '无标题',
+                    'cover': art.get('cover') or '',
+                    'link': art.get('link') or '',
+                    'update_time': art.get('update_time') or 0,
+                    'item_show_type': item_show_type_raw if item_show_type_raw is not None else None,
+                    'msgid': self._msgid(art),
+                })
+        return out, total_count
+
+    def _msgid(self, art: dict) -> str:
+        # aid 形如 "<appmsgid>_<itemidx>"，唯一标识一次群发中的一篇
+        aid = art.get('aid')
+        if aid:
+            return str(aid)[:64]
+        if art.get('appmsgid'):
+            return f"{art.get('appmsgid')}_{art.get('itemidx') or 1}"[:64]
+        return ''
+
+    def _page_mark(self, page: list[dict]) -> Optional[tuple[int, str]]:
+        head = next((a for a in page if a.get('update_time')), None)
+        return (int(head['update_time']), head.get('msgid') or '') if head else None
+
+    def _article_row(self, account_name: str, a: dict) -> dict:
+        ist = a.get('item_show_type')
+        # 0/8/11 等有效整数，不要用 or 造成 0 被当空值
+        ist_int = int(ist) if isinstance(ist, (int,)) else (int(ist) if isinstance(ist, str) and ist.isdigit() else None)
+        return {
+            'id': str(uuid.uuid4()),
+            'title': a.get('title') or '无标题',
+            'url': a.get('link') or '',
+            'cover_url': a.get('cover') or None,
+            'publish_date': datetime.fromtimestamp(a.get('update_time') or 0, tz=timezone.utc).isoformat() if a.get('update_time') else None,
+            'item_show_type': ist_int,
+            'mp_account': account_name,
+            'create_time': datetime.now(timezone.utc),
+        }
+
+    def _existing_urls(self, urls: list[str]) -> set[str]:
+        if not urls:
+            return set()
+        return set(self.db.scalars(select(MpArticle.url).where(MpArticle.url.in_(urls))).all())
+
+    def _take_until_known(self, items: list[dict]) -> tuple[list[dict], bool]:
+        """
+        增量判定：一次 IN 查询取出本页已入库的 URL，返回第一条已存在文章之前的新文章，
+        以及是否遇到了重叠边界（遇到即应停止翻页）。
+        """
+        existing = self._existing_urls([a.get('link') for a in items if a.get('link')])
+        fresh: list[dict] = []
         for a in items:
             url = a.get('link') or ''
             if not url:
                 continue
-            exists = self.db.scalar(select(MpArticle).where(MpArticle.url == url))
-            if exists:
+            if url in existing:
+                return fresh, True
+            fresh.append(a)
+        return fresh, False
+
+    def _take_until_watermark(self, acc: MpAccount, items: list[dict]) -> tuple[list[dict], bool]:
+        """
+        按水位线在内存中判定：早于水位时间、或与水位同一时间且为水位消息（无消息 id 时按时间）即视为已入库。
+        与水位同一时间的其它消息（同一秒的另一次群发）仍交给入库去重，不会漏抓。
+        """
+        wm_time, wm_msgid = acc.watermark_time, acc.watermark_msgid or ''
+        fresh: list[dict] = []
+        for a in items:
+            if not a.get('link'):
                 continue
-            ist = a.get('item_show_type')
-            # 0/8/11 等有效整数，不要用 or 造成 0 被当空值
-            ist_int = int(ist) if isinstance(ist, (int,)) else (int(ist) if isinstance(ist, str) and ist.isdigit() else None)
-            obj = MpArticle(
-                title=a.get('title') or '无标题',
-                url=url,
-                cover_url=a.get('cover') or None,
-                publish_date=datetime.fromtimestamp(a.get('update_time') or 0, tz=timezone.utc).isoformat() if a.get('update_time') else None,
-                item_show_type=ist_int,
-                mp_account=account_name,
-            )
-            self.db.add(obj)
-            new_objs.append(obj)
-        if new_objs:
-            self.db.commit()
-            for o in new_objs:
-                self.db.refresh(o)
-        return new_objs
+            t = int(a.get('update_time') or 0)
+            if t < wm_time or (t == wm_time and (not wm_msgid or a.get('msgid') == wm_msgid)):
+                return fresh, True
+            fresh.append(a)
+        return fresh, False
+
+    def _persist_articles(
+        self,
+        account_name: str,
+        items: list[dict],
+        *,
+        checkpoint: Optional[tuple[int, Optional[int]]] = None,
+        watermark: Optional[tuple[int, str]] = None,
+    ) -> list[dict]:
+        """
+        批量入库一页文章，返回实际新插入的行（按原顺序，dict 形式，不做逐行 refresh）。
+        PostgreSQL / SQLite 使用 INSERT ... ON CONFLICT (url) DO NOTHING RETURNING，一条语句完成去重与插入；
+        其它方言回退为一次 IN 查询 + executemany 插入。
+        同一事务内按实际插入行数增量更新 mp_accounts.article_account（提交后账号对象过期，访问时按主键重新加载），
+        回填阶段同时写入断点 checkpoint=(下一页 begin, total_count)，watermark 非空时同事务写入水位线。
+        无新文章且无需更新断点 / 水位线时不访问数据库（“没有新发布”的刷新为零写入）。
+        """
+        if not items and checkpoint is None and watermark is None:
+            return []
+        rows: list[dict] = []
+        seen: set[str] = set()
+        for a in items:
+            url = a.get('link') or ''
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            rows.append(self._article_row(account_name, a))
+
+        table = MpArticle.__table__
+        dialect = self.db.get_bind().dialect.name
+        if not rows:
+            inserted: set[str] = set()
+        elif dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            stmt = dialect_insert(table).values(rows).on_conflict_do_nothing(index_elements=['url']).returning(table.c.url)
+            inserted = set(self.db.execute(stmt).scalars().all())
+        else:
+            existing = self._existing_urls([r['url'] for r in rows])
+            rows = [r for r in rows if r['url'] not in existing]
+            if rows:
+                self.db.execute(insert(table), rows)
+            inserted = {r['url'] for r in rows}
+        self._bump_article_count(account_name, len(inserted), checkpoint=checkpoint, watermark=watermark)
+        self.db.commit()
+        return [r for r in rows if r['url'] in inserted]
+
+    def _bump_article_count(
+        self,
+        account_name: str,
+        added: int,
+        *,
+        checkpoint: Optional[tuple[int, Optional[int]]] = None,
+        watermark: Optional[tuple[int, str]] = None,
+    ) -> None:
+        """按实际插入行数原子地增量维护 article_account（不提交，由调用方与插入一起提交）。"""
+        values: dict = {'update_time': datetime.now(timezone.utc)}
+        if added:
+            values['article_account'] = MpAccount.article_account + added
+        if checkpoint is not None:
+            values['crawl_offset'], values['crawl_total'] = checkpoint
+        if watermark is not None:
+            values['watermark_time'], values['watermark_msgid'] = watermark[0], watermark[1] or None
+        self.db.execute(
+            update(MpAccount)
+            .where(MpAccount.name == account_name)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    # ------------------- Reconcile counters -------------------
+    def reconcile_article_counts(self, *, name: Optional[str] = None, owner_email: Optional[str] = None) -> int:
+        """
+        纠偏：用一次 UPDATE ... SET article_account = (SELECT COUNT(*) ...) 修正计数漂移，
+        只改动与实际行数不一致的账号。返回被修正的账号数。
+        """
+        actual = (
+            select(func.count())
+            .select_from(MpArticle)
+            .where(MpArticle.mp_account == MpAccount.name)
+            .correlate(MpAccount)
+            .scalar_subquery()
+        )
+        stmt = update(MpAccount).where(MpAccount.article_account != actual)
+        if name:
+            stmt = stmt.where(MpAccount.name == name)
+        if owner_email:
+            stmt = stmt.where(MpAccount.owner_email == owner_email)
+        res = self.db.execute(stmt.values(article_account=actual).execution_options(synchronize_session=False))
+        self.db.commit()
+        return int(res.rowcount or 0)
 
     # ------------------- List articles -------------------
-    def list_articles(self, *, owner_email: str, name: str, offset: int, limit: int) -> tuple[list[MpArticle], int]:
-        # 若增量策略：先尝试从远端拉取最新一页，若发现已有，则直接从DB读取
-        acc = self.db.scalar(select(MpAccount).where(MpAccount.name == name))
-        if not acc:
-            raise ValueError("先执行 /gzhaccount/search 完成账号建档，再获取文章列表")
-        # 简化：仅从DB分页
-        from sqlalchemy import desc
-        stmt = select(MpArticle).where(MpArticle.mp_account == name).order_by(desc(MpArticle.create_time)).offset(offset).limit(limit)
-        items = self.db.scalars(stmt).all()
-        total = self.db.scalar(select(func.count()).where(MpArticle.mp_account == name)) or 0
+    @staticmethod
+    async def alist_articles(db: AsyncSession, *, owner_email: str, name: str, offset: int, limit: int) -> tuple[list[MpArticle], int]:
+        """按发布时间倒序分页读取库中文章，使用 AsyncSession（供 async def 路由，不占用线程池）。"""
+        acc_stmt, items_stmt, total_stmt = _list_articles_stmts(name, offset, limit)
+        if not await db.scalar(acc_stmt):
+            raise ValueError(MSG_ACCOUNT_NOT_FOUND)
+        items = (await db.scalars(items_stmt)).all()
+        total = await db.scalar(total_stmt) or 0
         return items, int(total)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.account import Account
+
+
+_COLUMNS = tuple(attr.key for attr in inspect(Account).column_attrs)
+
+
+class PrincipalCache:
+    """
+    进程内的已认证用户缓存：user id -> Account 列值快照，LRU 淘汰（最多 maxsize 条），每条 ttl 秒后过期。
+    命中时返回由快照新建的 detached Account（每次一个新实例，请求之间不共享 ORM 对象），
+    鉴权中间件因此无需查询 accounts 表。修改角色 / 激活状态 / 有效期或删除用户的服务在提交后调用 invalidate；
+    多 worker 部署时其它进程的缓存仍按 ttl 过期。maxsize 或 ttl 为 0 时不缓存。
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # user id -> (过期的 monotonic 时间, 列值快照)
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        # 每次失效递增；查库前取一次，写入时若已变化则放弃，避免查库期间的失效被旧快照覆盖
+        self._generation = 0
+        self._mutex = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, user_id: str) -> Optional[Account]:
+        if not self.enabled:
+            return None
+        with self._mutex:
+            hit = self._entries.get(user_id)
+            if hit is None:
+                return None
+            if hit[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            values = hit[1]
+        account = Account(**values)
+        make_transient_to_detached(account)
+        return account
+
+    def generation(self) -> int:
+        with self._mutex:
+            return self._generation
+
+    def put(self, account: Account, generation: int) -> None:
+        if not self.enabled:
+            return
+        values = {key: getattr(account, key) for key in _COLUMNS}
+        with self._mutex:
+            if generation != self._generation:
+                return
+            self._entries[account.id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(account.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        with self._mutex:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._mutex:
+            self._generation += 1
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
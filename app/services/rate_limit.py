@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.cookie_rate_limit import CookieRateLimit
+
+
+@dataclass
+class CookieBudget:
+    token: str
+    capacity: int
+    remaining: float  # 当前可立即使用的请求数（向下取整前）
+    queued: int  # 已排队等待令牌的请求数
+    wait_seconds: float  # 新请求需要等待的秒数
+    error_rate: float = 0.0  # 近期请求失败率（滑动平均）
+
+
+class CookieRateLimiter:
+    """
+    按 Cookie.token 的令牌桶：容量 COOKIE_RATE_CAPACITY，每小时匀速补充 COOKIE_RATE_PER_HOUR 个。
+    状态存库（乐观锁 CAS 更新），多个 uvicorn worker 共享同一额度。
+    额度不足时不报错而是排队：先扣成负数预约位置，再睡到该令牌补满的时刻。
+    欠额至多 COOKIE_RATE_MAX_QUEUE 个请求，排满后新的预约先等待腾出位置；预约后未发出的请求用 release 退还。
+    """
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self.capacity = float(settings.COOKIE_RATE_CAPACITY)
+        self.rate = settings.COOKIE_RATE_PER_HOUR / 3600.0  # 每秒补充
+        self.max_queue = float(settings.COOKIE_RATE_MAX_QUEUE)
+
+    def reserve(self, token: str, cost: float = 1.0) -> tuple[bool, float]:
+        """
+        预约 cost 个令牌，返回 (是否已预约, 需要等待的秒数)。已预约时等待后即可请求（0 表示立即）；
+        排队已满时不扣减，返回腾出位置所需的秒数，调用方等待后重新预约。
+        """
+        while True:
+            row = self._load(token)
+            now = time.time()
+            available = self._refilled(row, now)
+            remaining = available - cost
+            if remaining < -self.max_queue:
+                return False, (-self.max_queue - remaining) / self.rate
+            if self._swap(row, remaining, now):
+                return True, 0.0 if remaining >= 0 else -remaining / self.rate
+            # 版本冲突：其他 worker 抢先扣减，重读后重试
+
+    def release(self, token: str, cost: float = 1.0) -> None:
+        """退还一次未发出请求的预约（等待期间被取消等），不超过桶容量；排在其后的请求随之提前。"""
+        while True:
+            row = self._load(token)
+            now = time.time()
+            if self._swap(row, min(self.capacity, self._refilled(row, now) + cost), now):
+                return
+
+    async def aacquire(self, token: str, cost: float = 1.0) -> None:
+        while True:
+            reserved, wait = await asyncio.to_thread(self.reserve, token, cost)
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                except asyncio.CancelledError:
+                    if reserved:
+                        refund_later(token, cost)
+                    raise
+            if reserved:
+                return
+
+    def budget(self, token: str) -> CookieBudget:
+        row = self.db.get(CookieRateLimit, token)
+        available = self._refilled(row, time.time()) if row else self.capacity
+        return CookieBudget(
+            token=token,
+            capacity=int(self.capacity),
+            remaining=max(available, 0.0),
+            queued=int(-available) if available < 0 else 0,
+            wait_seconds=0.0 if available >= 1 else (1 - available) / self.rate,
+            error_rate=row.error_rate if row else 0.0,
+        )
+
+    def _swap(self, row: CookieRateLimit, tokens: float, now: float) -> bool:
+        """乐观锁 CAS：仅当版本未变时写入新的令牌数。"""
+        res = self.db.execute(
+            update(CookieRateLimit)
+            .where(and_(CookieRateLimit.token == row.token, CookieRateLimit.version == row.version))
+            .values(tokens=tokens, refill_at=now, version=row.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return bool(res.rowcount)
+
+    def _refilled(self, row: CookieRateLimit, now: float) -> float:
+        return min(self.capacity, row.tokens + max(now - row.refill_at, 0.0) * self.rate)
+
+    def _load(self, token: str) -> CookieRateLimit:
+        stmt = select(CookieRateLimit).where(CookieRateLimit.token == token).execution_options(populate_existing=True)
+        row = self.db.scalar(stmt)
+        if row is not None:
+            return row
+        try:
+            self.db.execute(insert(CookieRateLimit).values(token=token, tokens=self.capacity, refill_at=time.time(), version=0, error_rate=0.0))
+            self.db.commit()
+        except IntegrityError:
+            # 并发首建：另一个 worker 已插入
+            self.db.rollback()
+        return self.db.scalar(stmt)
+
+
+def refund(token: str, cost: float = 1.0) -> None:
+    """在独立的短会话中退还预约：取消发生时调用方的会话可能正被其它步骤使用或已关闭。"""
+    db = SessionLocal()
+    try:
+        CookieRateLimiter(db).release(token, cost)
+    finally:
+        db.close()
+
+
+def refund_later(token: str, cost: float = 1.0) -> None:
+    """在事件循环中（通常是处理取消时）安排退还，不等待其完成：被取消的协程不应再挂起。"""
+    asyncio.get_running_loop().run_in_executor(None, refund, token, cost)
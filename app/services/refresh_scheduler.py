@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Optional
+
+from sqlalchemy import Float, and_, case, cast, desc, extract, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.mp_account import MpAccount
+from app.models.mp_article import MpArticle
+from app.services.cookie_pool import CookiePool, breaker
+from app.services.gzhaccount import GzhAccountService, _flights
+
+
+logger = logging.getLogger(__name__)
+
+# 估算发布间隔时参考的最近发布次数
+INTERVAL_SAMPLE = 20
+
+
+@dataclass(frozen=True)
+class RefreshCandidate:
+    biz: str
+    name: str
+    owner_email: str
+    priority: float  # 陈旧度 / 目标刷新间隔，>= 1 即到期
+
+
+def refresh_target():
+    """目标刷新间隔（秒，SQL 表达式）：发布越频繁越短；尚无估算（或从未发布）时按上限。"""
+    low, high = float(settings.REFRESH_MIN_SECONDS), float(settings.REFRESH_MAX_SECONDS)
+    interval = MpAccount.publish_interval * settings.REFRESH_INTERVAL_FACTOR
+    return case(
+        (or_(MpAccount.publish_interval.is_(None), MpAccount.publish_interval == 0), high),
+        (interval < low, low),
+        (interval > high, high),
+        else_=cast(interval, Float),
+    )
+
+
+def refresh_priority(now: datetime):
+    """
+    陈旧度（距上次探测或上次更新，取较近者；都没有时按创建时间）与目标刷新间隔之比（SQL 表达式）。
+    时间换算为 epoch 秒比较：PostgreSQL 为 EXTRACT(epoch ...)，SQLite 为 strftime('%s', ...)。
+    """
+    refreshed = extract('epoch', MpAccount.refresh_time)
+    updated = extract('epoch', MpAccount.update_time)
+    a = func.coalesce(refreshed, updated, extract('epoch', MpAccount.create_time))
+    b = func.coalesce(updated, a)
+    last = case((a > b, a), else_=b)
+    return (literal(now.timestamp(), Float) - last) / refresh_target()
+
+
+class RefreshService:
+    """定时刷新相关的 mp_accounts 读写，均为短事务。"""
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def due_accounts(self, *, limit: int, exclude_biz: Collection[str] = (), exclude_owners: Collection[str] = ()) -> list[RefreshCandidate]:
+        """
+        到期账号按优先级从高到低，至多 limit 个；优先级、排序与截断都在 SQL 中完成，不加载全部账号。
+        最近 REFRESH_MIN_SECONDS 内探测过的账号（走 refresh_time 索引）以及 exclude_* 中的账号直接排除。
+        """
+        now = datetime.now(timezone.utc)
+        priority = refresh_priority(now).label('priority')
+        stmt = (
+            select(MpAccount.biz, MpAccount.name, MpAccount.owner_email, priority)
+            .where(self._unclaimed(now), priority >= 1)
+            .order_by(desc(priority))
+            .limit(limit)
+        )
+        if exclude_biz:
+            stmt = stmt.where(MpAccount.biz.not_in(list(exclude_biz)))
+        if exclude_owners:
+            stmt = stmt.where(MpAccount.owner_email.not_in(list(exclude_owners)))
+        return [RefreshCandidate(biz=r.biz, name=r.name, owner_email=r.owner_email, priority=float(r.priority)) for r in self.db.execute(stmt)]
+
+    def available_cookies(self, owners: Collection[str]) -> dict[str, int]:
+        """owner_email -> 当前可用（未熔断）cookie 数。"""
+        pool = CookiePool(self.db)
+        return {owner: sum(1 for c in pool.cookies(owner) if not breaker.is_open(c.token)) for owner in owners}
+
+    def claim(self, name: str) -> bool:
+        """
+        认领一次探测：条件 UPDATE 把 refresh_time 置为现在，仅当它仍不在 REFRESH_MIN_SECONDS 内时成功。
+        多个 worker 进程各自运行调度器，同一账号只有一个能认领成功；认领后的账号在冷却期内不再出现在 due_accounts 中。
+        """
+        now = datetime.now(timezone.utc)
+        res = self.db.execute(
+            update(MpAccount)
+            .where(and_(MpAccount.name == name, self._unclaimed(now)))
+            .values(refresh_time=now)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return bool(res.rowcount)
+
+    def _unclaimed(self, now: datetime):
+        cutoff = now - timedelta(seconds=settings.REFRESH_MIN_SECONDS)
+        return or_(MpAccount.refresh_time.is_(None), MpAccount.refresh_time < cutoff)
+
+    def record(self, name: str, *, added: int) -> None:
+        """记录一次探测；有新文章（或尚无估算）时按最近的发布时间重新估算发布间隔。"""
+        values: dict = {'refresh_time': datetime.now(timezone.utc)}
+        current = self.db.scalar(select(MpAccount.publish_interval).where(MpAccount.name == name))
+        if added or current is None:
+            interval = self._estimate_interval(name)
+            if interval is not None:
+                values['publish_interval'] = interval
+        self.db.execute(
+            update(MpAccount).where(MpAccount.name == name).values(**values).execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def _estimate_interval(self, name: str) -> Optional[int]:
+        # publish_date 为同一时区的 ISO 字符串，字典序即时间序；同一次群发的多篇只算一次
+        stmt = (
+            select(MpArticle.publish_date)
+            .where(MpArticle.mp_account == name, MpArticle.publish_date.is_not(None))
+            .group_by(MpArticle.publish_date)
+            .order_by(desc(MpArticle.publish_date))
+            .limit(INTERVAL_SAMPLE)
+        )
+        dates = [datetime.fromisoformat(d) for d in self.db.scalars(stmt)]
+        if len(dates) < 2:
+            return None
+        return max(1, int((dates[0] - dates[-1]).total_seconds() / (len(dates) - 1)))
+
+
+class RefreshScheduler:
+    """
+    进程内的定时刷新：每 REFRESH_TICK_SECONDS 按“陈旧度 / 目标刷新间隔”挑出到期账号，从高到低发起增量探测。
+    探测走与搜索相同的抓取路径（按 biz，不请求 searchbiz；与进行中的同一账号抓取合并）：
+    首页即遇到水位线则停止，无新文章时零写入；回填未完成的账号只追平头部，剩余历史交给低优先级回填任务。
+    全局最多 REFRESH_CONCURRENCY 个探测在途；同一用户的在途探测不超过其未熔断 cookie 数 × REFRESH_PER_COOKIE_CONCURRENCY，
+    每次上游请求仍经 cookie 池在令牌桶上排队预约额度。
+    每个 worker 进程都运行调度器，探测前以条件 UPDATE 认领账号（RefreshService.claim），同一账号同一时段只会被探测一次。
+    """
+
+    def __init__(self, concurrency: int, per_cookie: int) -> None:
+        self.concurrency = max(1, concurrency)
+        self.per_cookie = max(1, per_cookie)
+        self._task: Optional[asyncio.Task] = None
+        # biz -> 探测任务；owner_email -> 在途探测数
+        self._running: dict[str, asyncio.Task] = {}
+        self._owner_load: dict[str, int] = {}
+
+    async def start(self) -> None:
+        if self._task is not None or not settings.REFRESH_ENABLED:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._running.values()) if t is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._running.clear()
+        self._owner_load.clear()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("refresh tick failed")
+            await asyncio.sleep(settings.REFRESH_TICK_SECONDS)
+
+    async def tick(self) -> int:
+        """发起一轮到期账号的探测，返回本轮新发起的数量。"""
+        slots = self.concurrency - len(self._running)
+        if slots <= 0:
+            return 0
+        # 已在探测，或有搜索 / 任务正在抓取该账号
+        busy = set(self._running) | set(_flights)
+        due = await asyncio.to_thread(self._due_accounts, slots, busy, dict(self._owner_load))
+        started = 0
+        for c in due:
+            if c.biz in self._running or c.biz in _flights:
+                continue
+            if not await asyncio.to_thread(self._claim, c.name):
+                # 其它 worker 已认领
+                continue
+            self._owner_load[c.owner_email] = self._owner_load.get(c.owner_email, 0) + 1
+            self._running[c.biz] = asyncio.create_task(self._probe(c))
+            started += 1
+        return started
+
+    def _due_accounts(self, slots: int, busy: set[str], owner_load: dict[str, int]) -> list[RefreshCandidate]:
+        """
+        至多 slots 个可以发起探测的到期账号，按优先级从高到低。没有可用 cookie 或在途探测已达上限的用户加入 exclude_owners 后继续往下取：
+        否则这些用户的高优先级账号会一直占满前 slots 个，其它用户的到期账号永远轮不到。
+        """
+        db = SessionLocal()
+        try:
+            svc = RefreshService(db)
+            load = dict(owner_load)
+            cookies = svc.available_cookies(load)
+            excluded = {owner for owner, n in load.items() if n >= cookies[owner] * self.per_cookie}
+            picked: list[RefreshCandidate] = []
+            while len(picked) < slots:
+                due = svc.due_accounts(limit=slots - len(picked), exclude_biz=busy | {c.biz for c in picked}, exclude_owners=excluded)
+                if not due:
+                    break
+                cookies.update(svc.available_cookies({c.owner_email for c in due} - cookies.keys()))
+                for c in due:
+                    cap = cookies[c.owner_email] * self.per_cookie
+                    if load.get(c.owner_email, 0) >= cap:
+                        excluded.add(c.owner_email)
+                        continue
+                    picked.append(c)
+                    load[c.owner_email] = load.get(c.owner_email, 0) + 1
+                    if load[c.owner_email] >= cap:
+                        excluded.add(c.owner_email)
+            return picked
+        finally:
+            db.close()
+
+    def _claim(self, name: str) -> bool:
+        db = SessionLocal()
+        try:
+            return RefreshService(db).claim(name)
+        finally:
+            db.close()
+
+    async def _probe(self, c: RefreshCandidate) -> None:
+        db = SessionLocal()
+        added = 0
+        try:
+            svc = GzhAccountService(db)
+            async for evt in svc.astream_biz(owner_email=c.owner_email, biz=c.biz, max_articles=1, final_items=False, shallow=True):
+                if evt["type"] == "page":
+                    added += evt["new_added"]
+                elif evt["type"] == "error":
+                    logger.warning("refresh of %s stopped: %s", c.name, evt["message"])
+        except asyncio.CancelledError:
+            db.close()
+            self._release(c)
+            raise
+        except Exception:
+            logger.exception("refresh of %s crashed", c.name)
+        try:
+            # 失败也记录探测时间，按目标间隔稍后再试，避免每轮重复打同一个账号
+            await asyncio.to_thread(RefreshService(db).record, c.name, added=added)
+        except Exception:
+            logger.exception("failed to record refresh of %s", c.name)
+        finally:
+            db.close()
+            self._release(c)
+
+    def _release(self, c: RefreshCandidate) -> None:
+        self._running.pop(c.biz, None)
+        left = self._owner_load.get(c.owner_email, 1) - 1
+        if left > 0:
+            self._owner_load[c.owner_email] = left
+        else:
+            self._owner_load.pop(c.owner_email, None)
+
+
+scheduler = RefreshScheduler(settings.REFRESH_CONCURRENCY, settings.REFRESH_PER_COOKIE_CONCURRENCY)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, delete, desc, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.mp_account import MpAccount
+from app.models.mp_search_candidate import MpSearchCandidate
+
+
+def normalize_search_entry(raw: dict) -> Optional[dict]:
+    """searchbiz 的单个候选 -> entry dict；缺少昵称或 fakeid 时返回 None。"""
+    nickname = raw.get('nickname')
+    fakeid = raw.get('fakeid')
+    if not nickname or not fakeid:
+        return None
+    avatar_url = raw.get('round_head_img') or ''
+    if avatar_url and avatar_url.startswith('http://'):
+        avatar_url = avatar_url.replace('http://', 'https://')
+    return {
+        'nickname': nickname,
+        'fakeid': fakeid,
+        'avatar_url': avatar_url,
+        'signature': raw.get('signature') or None,
+    }
+
+
+class SearchbizCache:
+    """
+    公众号名称 -> fakeid 的解析缓存，TTL 为 SEARCHBIZ_CACHE_TTL_SECONDS：
+      1) 同名查询的首选候选（与上游 searchbiz 取 list[0] 一致）；
+      2) 其它查询结果中昵称完全匹配的候选；
+      3) mp_accounts 中已入库、近期更新过的同名账号（biz 即 fakeid）。
+    命中即可跳过一次 searchbiz 请求，节省 cookie 每小时额度。
+    """
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def lookup(self, name: str) -> Optional[dict]:
+        cutoff = self._cutoff()
+        row = self.db.scalar(
+            select(MpSearchCandidate).where(
+                and_(MpSearchCandidate.query == name, MpSearchCandidate.rank == 0, MpSearchCandidate.fetched_at >= cutoff)
+            )
+        )
+        if row is None:
+            row = self.db.scalar(
+                select(MpSearchCandidate)
+                .where(and_(MpSearchCandidate.nickname == name, MpSearchCandidate.fetched_at >= cutoff))
+                .order_by(desc(MpSearchCandidate.fetched_at))
+                .limit(1)
+            )
+        if row is not None:
+            return self._candidate_entry(row)
+        acc = self.db.scalar(select(MpAccount).where(and_(MpAccount.name == name, MpAccount.update_time >= cutoff)))
+        return self._account_entry(acc) if acc else None
+
+    def store(self, name: str, data: dict) -> None:
+        """以本次 searchbiz 响应替换该查询的候选列表（最多 5 条）；空结果不缓存。"""
+        entries = [normalize_search_entry(raw) for raw in (data or {}).get('list') or []]
+        if not entries:
+            return
+        now = datetime.now(timezone.utc)
+        self.db.execute(delete(MpSearchCandidate).where(MpSearchCandidate.query == name))
+        for rank, e in enumerate(entries):
+            if e is None:
+                continue
+            self.db.add(
+                MpSearchCandidate(
+                    query=name,
+                    rank=rank,
+                    nickname=e['nickname'],
+                    fakeid=e['fakeid'],
+                    avatar_url=e['avatar_url'] or None,
+                    signature=e['signature'],
+                    fetched_at=now,
+                )
+            )
+        self.db.commit()
+
+    def entry_for_biz(self, biz: str) -> Optional[dict]:
+        """按 biz 直接取 entry：优先已入库账号，其次任意搜索候选（不看 TTL，fakeid 不随昵称变化）。"""
+        acc = self.db.scalar(select(MpAccount).where(MpAccount.biz == biz))
+        if acc:
+            return self._account_entry(acc)
+        row = self.db.scalar(
+            select(MpSearchCandidate).where(MpSearchCandidate.fakeid == biz).order_by(desc(MpSearchCandidate.fetched_at)).limit(1)
+        )
+        return self._candidate_entry(row) if row else None
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=settings.SEARCHBIZ_CACHE_TTL_SECONDS)
+
+    def _candidate_entry(self, row: MpSearchCandidate) -> dict:
+        return {'nickname': row.nickname, 'fakeid': row.fakeid, 'avatar_url': row.avatar_url or '', 'signature': row.signature}
+
+    def _account_entry(self, acc: MpAccount) -> dict:
+        return {'nickname': acc.name, 'fakeid': acc.biz, 'avatar_url': acc.avatar_url or '', 'signature': acc.description}
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import random
+import time
+import uuid
+from enum import Enum
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.services import wechat_http
+from app.services.cookie_pool import CookiePool, PooledCookie
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# base_resp.ret 分类
+RET_RATE_LIMITED = {200013}  # freq control
+RET_AUTH = {200003, 200040}  # invalid session / invalid csrf token：登录态失效
+RET_TRANSIENT = {-1}  # system error, try again
+
+
+class FetchErrorKind(str, Enum):
+    transient = "transient"  # 网络异常 / 超时 / 5xx / 响应无法解析：退避后重试
+    rate_limited = "rate_limited"  # 频控：熔断该 cookie、重新生成 fingerprint，换 cookie 重试
+    auth = "auth"  # 登录态失效：熔断该 cookie，换 cookie 重试
+    fatal = "fatal"  # 其它错误码：不重试
+
+
+class GzhFetchError(Exception):
+    """上游分页请求失败（网络异常 / base_resp.ret 非 0 / 响应无法解析），区别于“列表已到末尾”。"""
+
+    def __init__(self, message: str, kind: FetchErrorKind = FetchErrorKind.transient, ret: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.kind = kind
+        self.ret = ret
+
+
+def _new_fingerprint() -> str:
+    return hashlib.md5(f"fingerprint_{time.time()}_{uuid.uuid4().hex}".encode('utf-8')).hexdigest()
+
+
+# 进程内共享的请求 fingerprint；遇到 200013 时重新生成
+_fingerprint = _new_fingerprint()
+
+
+def fingerprint() -> str:
+    return _fingerprint
+
+
+def regenerate_fingerprint() -> str:
+    global _fingerprint
+    _fingerprint = _new_fingerprint()
+    return _fingerprint
+
+
+def check_base_resp(data: Any) -> dict:
+    """校验上游 JSON 的 base_resp，按错误码分类抛 GzhFetchError；返回 data。"""
+    if not isinstance(data, dict):
+        raise GzhFetchError("响应不是 JSON 对象")
+    base = data.get('base_resp') or {}
+    ret = base.get('ret', 0)
+    if ret in (0, None):
+        return data
+    message = f"ret={ret} {base.get('err_msg', '')}".strip()
+    if ret in RET_RATE_LIMITED:
+        raise GzhFetchError(message, FetchErrorKind.rate_limited, ret)
+    if ret in RET_AUTH:
+        raise GzhFetchError(message, FetchErrorKind.auth, ret)
+    if ret in RET_TRANSIENT:
+        raise GzhFetchError(message, FetchErrorKind.transient, ret)
+    raise GzhFetchError(message, FetchErrorKind.fatal, ret)
+
+
+def backoff_delay(attempt: int, kind: FetchErrorKind) -> float:
+    """full-jitter 指数退避；频控时直接按上限的后半段等待。"""
+    cap = settings.FETCH_BACKOFF_MAX_SECONDS
+    if kind == FetchErrorKind.rate_limited:
+        return random.uniform(cap / 2, cap)
+    return random.uniform(0, min(cap, settings.FETCH_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class UpstreamFetcher:
+    """
+    公众号后台接口的请求层：每次尝试从 cookie 池取登录态（跳过熔断中的 cookie，并在其令牌桶预约额度），
+    按错误分类决定是否重试——瞬时错误 full-jitter 指数退避，频控 / 登录失效立即熔断该 cookie 并换 cookie 重试，
+    频控同时重新生成 fingerprint；其它错误码不重试。最多 FETCH_MAX_ATTEMPTS 次，仍失败则抛出最后一次的 GzhFetchError。
+    url_for(token) 生成请求地址，parse(data) 解析响应（可抛 GzhFetchError 参与分类）。
+    """
+
+    def __init__(self, pool: CookiePool) -> None:
+        self.pool = pool
+
+    async def aget(self, owner_email: str, url_for: Callable[[str], str], parse: Callable[[dict], T]) -> T:
+        attempt = 0
+        while True:
+            ck = await self.pool.aacquire(owner_email)
+            try:
+                result = parse(check_base_resp(await self._aget_json(ck, url_for(ck.token))))
+            except GzhFetchError as e:
+                await self._aon_failure(ck, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, e.kind))
+                attempt += 1
+                continue
+            await self.pool.areport(ck.token, ok=True)
+            return result
+
+    async def _aget_json(self, ck: PooledCookie, url: str) -> Any:
+        try:
+            r = await wechat_http.aget(ck.local, url)
+        except Exception as e:
+            raise GzhFetchError(f"请求失败: {e}") from e
+        return self._decode(r.status_code, r.json)
+
+    def _decode(self, status: int, read_json: Callable[[], Any]) -> Any:
+        if status == 429 or status >= 500:
+            raise GzhFetchError(f"HTTP {status}")
+        if status >= 400:
+            raise GzhFetchError(f"HTTP {status}", FetchErrorKind.fatal)
+        try:
+            return read_json()
+        except Exception as e:
+            raise GzhFetchError(f"响应无法解析: {e}") from e
+
+    def _should_retry(self, e: GzhFetchError, attempt: int) -> bool:
+        return e.kind != FetchErrorKind.fatal and attempt + 1 < settings.FETCH_MAX_ATTEMPTS
+
+    def _trip(self, ck: PooledCookie, e: GzhFetchError) -> bool:
+        if e.kind == FetchErrorKind.rate_limited:
+            logger.warning("cookie %s hit frequency control; regenerating fingerprint", ck.name or ck.token[:6])
+            regenerate_fingerprint()
+        return e.kind in (FetchErrorKind.rate_limited, FetchErrorKind.auth)
+
+    async def _aon_failure(self, ck: PooledCookie, e: GzhFetchError) -> None:
+        await self.pool.areport(ck.token, ok=False, trip=self._trip(ck, e))
+
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import pickle
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+DEFAULT_HEADERS = {
+    'accept': '*/*',
+    'accept-language': 'zh-CN,zh;q=0.9',
+    'referer': 'https://mp.weixin.qq.com/',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'x-requested-with': 'XMLHttpRequest'
+}
+
+# 进程内共享的连接池客户端（keep-alive），所有抓取共用；cookie 不进客户端级 jar，按 cookie 目录隔离
+_client: Optional[httpx.AsyncClient] = None
+# cookie 目录 -> 该登录态的 cookie jar（懒加载自 gzhcookies.cookie，并随响应的 Set-Cookie 更新）
+_jars: dict[str, httpx.Cookies] = {}
+_jars_lock = asyncio.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        # 客户端级 jar 拒绝所有 cookie，避免不同用户的登录态在共享客户端上串号
+        blocking_jar = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        _client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            cookies=blocking_jar,
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def aclose_async_client() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _jars.clear()
+
+
+def _load_jar(folder: str) -> httpx.Cookies:
+    jar = httpx.Cookies()
+    cookie_path = os.path.join(folder, 'gzhcookies.cookie')
+    if os.path.exists(cookie_path):
+        try:
+            with open(cookie_path, 'rb') as f:
+                saved = pickle.load(f)
+            for c in saved:
+                jar.jar.set_cookie(c)
+        except Exception:
+            pass
+    return jar
+
+
+async def cookie_jar_for(folder: str) -> httpx.Cookies:
+    jar = _jars.get(folder)
+    if jar is not None:
+        return jar
+    async with _jars_lock:
+        jar = _jars.get(folder)
+        if jar is None:
+            jar = await asyncio.to_thread(_load_jar, folder)
+            _jars[folder] = jar
+    return jar
+
+
+def forget_cookie_jar(folder: str) -> None:
+    """删除 / 过期清理 cookie 或重新登录覆盖其目录时调用，移出进程内缓存的 jar。"""
+    _jars.pop(folder, None)
+
+
+async def aget(folder: str, url: str, *, timeout: Optional[float] = None) -> httpx.Response:
+    """以 folder 对应的登录态发起 GET：请求前写入 Cookie 头，响应后回收 Set-Cookie 到该 jar。"""
+    client = get_async_client()
+    jar = await cookie_jar_for(folder)
+    request = client.build_request('GET', url, timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+    jar.set_cookie_header(request)
+    response = await client.send(request)
+    jar.extract_cookies(response)
+    return response
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准脚本：对比鉴权中间件两种实现的吞吐
+  - before：@app.middleware("http")（BaseHTTPMiddleware），数据库会话在整个响应期间保持打开
+  - after ：app.api.middleware.AuthActivationMiddleware（纯 ASGI），校验后即释放会话
+两种实现挂在同一组基准路由上，分别用 uvicorn 在本机端口启动，通过真实 HTTP 连接压测：
+  - /bench/ping   ：小 JSON 响应，统计 req/s
+  - /bench/stream ：NDJSON 流（STREAM_LINES 行），统计流/s 与 MB/s
+同时统计压测期间连接池同时签出连接数的峰值。
+注意：before 在事件循环中同步签出连接，并发超过连接池上限（默认 5 + 10）时会阻塞整个事件循环直至池超时，
+因此默认并发取 8；可调高 BENCH_CONCURRENCY 观察 before 的超时与错误。
+使用说明：
+  python script/auth_middleware_bench.py
+可通过环境变量调整：BENCH_SECONDS、BENCH_CONCURRENCY、STREAM_LINES、STREAM_LINE_BYTES。
+脚本使用临时 SQLite 数据库，不会读写 ./app.db。
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# 必须在导入 app 之前指定数据库
+_TMP = tempfile.mkdtemp(prefix="auth_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse, StreamingResponse  # noqa: E402
+from jose import JWTError  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.api.middleware import AuthActivationMiddleware, decode_user_id  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.models.account import Account, ActivationStatus, UserRole  # noqa: E402
+from app.services.security import create_access_token, hash_password  # noqa: E402
+
+# ============ 配置区 ============
+BENCH_SECONDS = float(os.getenv("BENCH_SECONDS", "5"))
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "8"))
+STREAM_LINES = int(os.getenv("STREAM_LINES", "200"))
+STREAM_LINE_BYTES = int(os.getenv("STREAM_LINE_BYTES", "512"))
+# ===============================
+
+# 连接池同时签出连接数的峰值（服务端与压测在同一进程，直接挂在连接池事件上）
+_pool_peak = 0
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_conn, record, proxy) -> None:
+    global _pool_peak
+    _pool_peak = max(_pool_peak, engine.pool.checkedout())
+
+
+def legacy_enforce_auth_activation(app: FastAPI) -> None:
+    """改造前的实现（BaseHTTPMiddleware），仅用于对比。"""
+
+    @app.middleware("http")
+    async def enforce_auth_activation(request, call_next):
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+        try:
+            user_id = decode_user_id(auth_header.split(" ", 1)[1])
+        except JWTError:
+            return JSONResponse(status_code=401, content={"detail": "Could not validate credentials"})
+
+        db = SessionLocal()
+        try:
+            user = db.get(Account, user_id)
+            if not user:
+                return JSONResponse(status_code=401, content={"detail": "Could not validate credentials"})
+            if user.role != UserRole.admin:
+                if user.activation_status != ActivationStatus.active:
+                    return JSONResponse(status_code=403, content={"detail": "Account not activated"})
+                if user.expired_time is not None and user.expired_time <= datetime.now(timezone.utc):
+                    return JSONResponse(status_code=403, content={"detail": "Activation expired"})
+            request.state.user = user
+            return await call_next(request)
+        finally:
+            db.close()
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+    line = json.dumps({"type": "page", "pad": "x" * STREAM_LINE_BYTES}) + "\n"
+
+    @app.get("/bench/ping")
+    def ping(request: Request):
+        return {"ok": True, "user": request.state.user.email}
+
+    @app.get("/bench/stream")
+    async def stream():
+        async def gen():
+            for i in range(STREAM_LINES):
+                yield line
+                if i % 20 == 0:
+                    await asyncio.sleep(0)
+
+        return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+    if variant == "before":
+        legacy_enforce_auth_activation(app)
+    else:
+        app.add_middleware(AuthActivationMiddleware)
+    return app
+
+
+def seed_user() -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = Account(
+            email="bench@example.com",
+            password_hash=hash_password("bench"),
+            activation_status=ActivationStatus.active,
+        )
+        db.add(user)
+        db.commit()
+        return create_access_token(user.id)
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(app: FastAPI) -> tuple[uvicorn.Server, threading.Thread, str]:
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def load(base_url: str, token: str, path: str) -> dict:
+    limits = httpx.Limits(max_connections=BENCH_CONCURRENCY, max_keepalive_connections=BENCH_CONCURRENCY)
+    headers = {"Authorization": f"Bearer {token}"}
+    stats = {"requests": 0, "bytes": 0, "errors": 0}
+    deadline = time.perf_counter() + BENCH_SECONDS
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30.0) as client:
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                try:
+                    async with client.stream("GET", path) as r:
+                        if r.status_code != 200:
+                            stats["errors"] += 1
+                            await r.aread()
+                            continue
+                        async for chunk in r.aiter_lines():
+                            stats["bytes"] += len(chunk) + 1
+                except httpx.HTTPError:
+                    stats["errors"] += 1
+                    continue
+                stats["requests"] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(BENCH_CONCURRENCY)))
+        stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def run_variant(variant: str, token: str) -> dict:
+    global _pool_peak
+    _pool_peak = 0
+    server, thread, base_url = serve(build_app(variant))
+    try:
+        ping = asyncio.run(load(base_url, token, "/bench/ping"))
+        stream = asyncio.run(load(base_url, token, "/bench/stream"))
+    finally:
+        server.should_exit = True
+        thread.join()
+    return {"ping": ping, "stream": stream, "pool_peak": _pool_peak}
+
+
+def main() -> None:
+    token = seed_user()
+    print(f"concurrency={BENCH_CONCURRENCY} seconds={BENCH_SECONDS} stream={STREAM_LINES}x{STREAM_LINE_BYTES}B")
+    print(f"{'variant':<8} {'ping req/s':>11} {'stream/s':>9} {'NDJSON MB/s':>12} {'pool peak':>10} {'errors':>7}")
+    for variant in ("before", "after"):
+        r = run_variant(variant, token)
+        ping, stream = r["ping"], r["stream"]
+        print(
+            f"{variant:<8} "
+            f"{ping['requests'] / ping['elapsed']:>11.1f} "
+            f"{stream['requests'] / stream['elapsed']:>9.1f} "
+            f"{stream['bytes'] / stream['elapsed'] / 1e6:>12.2f} "
+            f"{r['pool_peak']:>10} "
+            f"{ping['errors'] + stream['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
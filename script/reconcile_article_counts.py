@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运维脚本：按实际文章数纠偏 mp_accounts.article_account（与 POST /gzhaccount/reconcile 相同的单条 UPDATE）。
+计数随入库增量维护，服务启动时不再自动纠偏；怀疑计数漂移（如手工删改过 mp_articles）时运行一次即可。
+使用说明：
+  python script/reconcile_article_counts.py                 # 全部账号
+  python script/reconcile_article_counts.py --name 公众号名称
+  python script/reconcile_article_counts.py --owner user@example.com
+数据库取自 DATABASE_URL（.env），与服务一致。
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.session import SessionLocal  # noqa: E402
+from app.services.gzhaccount import GzhAccountService  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按实际文章数修正 mp_accounts.article_account")
+    parser.add_argument("--name", help="只修正该公众号")
+    parser.add_argument("--owner", help="只修正该用户（owner_email）的公众号")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        fixed = GzhAccountService(db).reconcile_article_counts(name=args.name, owner_email=args.owner)
+    finally:
+        db.close()
+    print(f"fixed {fixed} account(s)")
+
+
+if __name__ == "__main__":
+    main()
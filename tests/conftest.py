@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models import Account, Cookie
+from app.services import gzhaccount, rate_limit
+from app.services.gzhaccount import GzhAccountService
+
+OWNER = 'mem@example.com'
+
+
+def article(n: int, publish: int) -> dict:
+    """上游 appmsgpublish 分页中的一条文章；publish 为群发序号（越大越旧）。"""
+    return {
+        'title': f'synthetic article {n}',
+        'cover': f'https://mmbiz.qpic.cn/synthetic/{n}.jpg',
+        'link': f'https://mp.weixin.qq.com/s/synthetic-{n}',
+        'update_time': 1700000000 - publish,
+        'item_show_type': 0,
+        'msgid': f'{publish}_1',
+    }
+
+
+@pytest.fixture()
+def session_factory(tmp_path, monkeypatch):
+    """临时 SQLite 库（已建表），带一个用户与一个有效 cookie；抓取与退还额度使用的 SessionLocal 指向它。"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    monkeypatch.setattr(gzhaccount, 'SessionLocal', factory)
+    monkeypatch.setattr(rate_limit, 'SessionLocal', factory)
+
+    db = factory()
+    db.add(Account(email=OWNER, password_hash='x'))
+    db.commit()
+    db.add(Cookie(
+        token='tok',
+        owner_email=OWNER,
+        expire_time=datetime.now(timezone.utc) + timedelta(hours=1),
+        name='mem',
+        local=str(tmp_path),
+        is_current=True,
+    ))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def entry_for(name: str) -> dict:
+    """假上游解析出的公众号：fakeid 为 <name>-fakeid。"""
+    return {'nickname': name, 'fakeid': f'{name}-fakeid', 'avatar_url': '', 'signature': None}
+
+
+@pytest.fixture()
+def upstream(monkeypatch):
+    """
+    假上游：替换账号解析（按名称返回 entry_for(name)）与分页请求，测试通过返回的 state 调整行为：
+      - feed：从新到旧的文章列表，按偏移分页，total_count 为其长度；
+      - page：begin -> (items, total_count)，设置后代替 feed（用于不宜整体放进内存的合成账号）；
+      - fail_at：偏移 -> 请求该页时抛出的异常；
+      - gate：非 None 时分页请求等待该 Event 放行；
+      - fetched：按请求先后记录的偏移。
+    """
+    state = {'feed': [], 'page': None, 'fail_at': {}, 'gate': None, 'fetched': []}
+
+    async def resolve(self, owner_email, name):
+        return entry_for(name), None
+
+    async def fetch(self, *, owner_email, fakeid, begin, count, pool=None):
+        state['fetched'].append(begin)
+        if state['gate'] is not None:
+            await state['gate'].wait()
+        if begin in state['fail_at']:
+            raise state['fail_at'][begin]
+        if state['page'] is not None:
+            return state['page'](begin)
+        return state['feed'][begin:begin + count], len(state['feed'])
+
+    monkeypatch.setattr(GzhAccountService, '_aresolve_entry', resolve)
+    monkeypatch.setattr(GzhAccountService, '_afetch_articles_page', fetch)
+    yield state
+    gzhaccount._flights.clear()
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.deps import get_async_db, get_db, require_active_user
+from app.api.v1.routes.cookie import router as cookie_router
+from app.api.v1.routes.gzharticle import router as gzharticle_router
+from app.api.v1.routes.gzhaccount import router as gzhaccount_router
+from app.models import Account, Cookie
+from app.models.mp_account import MpAccount
+from app.services.gzhaccount import GzhAccountService
+from tests.conftest import OWNER, article
+
+
+@pytest.fixture()
+def client(session_factory, tmp_path):
+    """只挂载被测路由的应用：异步会话指向同一个临时库，同步会话依赖一旦被使用即报错。"""
+    db = session_factory()
+    db.add(MpAccount(name='listed', biz='listed-biz', owner_email=OWNER, article_account=0))
+    db.commit()
+    GzhAccountService(db)._persist_articles('listed', [article(p, p) for p in range(3)])
+    expired = tmp_path / 'expired'
+    expired.mkdir()
+    db.add(Cookie(
+        token='old',
+        owner_email=OWNER,
+        expire_time=datetime.now(timezone.utc) - timedelta(hours=1),
+        name='old',
+        local=str(expired),
+        is_current=False,
+    ))
+    db.commit()
+    user = db.query(Account).filter_by(email=OWNER).one()
+    db.expunge(user)
+    db.close()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def async_db():
+        async with factory() as session:
+            yield session
+
+    def sync_db():
+        raise AssertionError('async route used the sync session')
+
+    app = FastAPI()
+    for router in (cookie_router, gzharticle_router, gzhaccount_router):
+        app.include_router(router)
+    app.dependency_overrides[get_async_db] = async_db
+    app.dependency_overrides[get_db] = sync_db
+    app.dependency_overrides[require_active_user] = lambda: user
+    with TestClient(app) as c:
+        c.async_engine = async_engine
+        c.expired = expired
+        yield c
+        c.portal.call(async_engine.dispose)
+
+
+def test_account_article_list_pages(client):
+    first = client.get('/gzhaccount/list', params={'name': 'listed', 'limit': 2}).json()
+    rest = client.get('/gzhaccount/list', params={'name': 'listed', 'offset': 2, 'limit': 2}).json()
+
+    assert first['total'] == rest['total'] == 3
+    assert sorted(i['url'] for i in first['items'] + rest['items']) == sorted(article(p, p)['link'] for p in range(3))
+    assert first['items'][0]['item_show_type'] == 0
+    assert client.get('/gzhaccount/list', params={'name': 'missing'}).status_code == 400
+
+
+def test_article_list_filters_to_own_accounts(client):
+    r = client.post('/gzharticle/list', json={'title_contains': 'article 2'})
+
+    assert r.status_code == 200
+    assert r.json()['total'] == 1
+    assert [i['url'] for i in r.json()['items']] == [article(2, 2)['link']]
+
+
+def test_cookie_list_drops_expired_cookies(client):
+    r = client.get('/cookie/list')
+
+    assert r.status_code == 200
+    assert [i['token'] for i in r.json()['items']] == ['tok']
+    assert not client.expired.exists()
+
+
+def test_connections_return_to_the_pool_after_each_request(client):
+    for _ in range(3):
+        assert client.get('/gzhaccount/list', params={'name': 'listed'}).status_code == 200
+        assert client.post('/gzharticle/list', json={}).status_code == 200
+        assert client.get('/cookie/list').status_code == 200
+        assert client.async_engine.pool.checkedout() == 0
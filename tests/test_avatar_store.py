@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from app.models import MpAccount
+from app.models.avatar_cache import AvatarCache
+from app.services import avatar_store
+from app.services.avatar_store import AvatarStore, _url_key
+from app.services.gzhaccount import GzhAccountService
+from tests.conftest import OWNER
+
+PNG = b'\x89PNG synthetic avatar'
+
+
+class _Response:
+    def __init__(self, status_code: int, content: bytes = b'', headers: dict | None = None) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+@pytest.fixture()
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture()
+def upstream(monkeypatch):
+    """假头像服务：按 URL 返回响应，记录每次请求带的条件头。"""
+    state = {'responses': {}, 'requests': []}
+
+    def get(url, headers=None, timeout=None):
+        state['requests'].append((url, dict(headers or {})))
+        return state['responses'][url]
+
+    monkeypatch.setattr(avatar_store.requests, 'get', get)
+    return state
+
+
+def _files(root) -> list[str]:
+    return sorted(os.path.join(d, f) for d, _, names in os.walk(root) for f in names)
+
+
+def test_revalidation_sends_conditional_headers_and_keeps_file_on_304(db, upstream, tmp_path):
+    store = AvatarStore(db, root=str(tmp_path / 'avatars'))
+    url = 'https://wx.qlogo.cn/a'
+    upstream['responses'][url] = _Response(200, PNG, {'content-type': 'image/png', 'etag': '"v1"', 'last-modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+    path = store.fetch(url)
+
+    upstream['responses'][url] = _Response(304)
+    again = store.fetch(url)
+
+    assert path.endswith('.png') and again == path
+    first, second = upstream['requests']
+    assert 'If-None-Match' not in first[1]
+    assert second[1]['If-None-Match'] == '"v1"'
+    assert second[1]['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    with open(path, 'rb') as f:
+        assert f.read() == PNG
+    assert db.get(AvatarCache, _url_key(url)).etag == '"v1"'
+
+
+def test_identical_images_share_one_file(db, upstream, tmp_path):
+    store = AvatarStore(db, root=str(tmp_path / 'avatars'))
+    for url in ('https://wx.qlogo.cn/a', 'https://wx.qlogo.cn/b'):
+        upstream['responses'][url] = _Response(200, PNG, {'content-type': 'image/png'})
+
+    a = store.fetch('https://wx.qlogo.cn/a')
+    b = store.fetch('https://wx.qlogo.cn/b')
+
+    # 内容寻址：两个 URL 指向同一文件
+    assert a == b
+    assert _files(tmp_path / 'avatars') == [a]
+
+
+def test_changed_avatar_url_keeps_old_file_until_new_one_is_stored(db, upstream, tmp_path):
+    store = AvatarStore(db, root=str(tmp_path / 'avatars'))
+    svc = GzhAccountService(db)
+    entry = {'nickname': 'avatar', 'fakeid': 'avatar-fakeid', 'avatar_url': 'https://wx.qlogo.cn/old', 'signature': None}
+    svc._upsert_account(OWNER, entry, 'static/avatars/old.png')
+
+    # 新 URL 尚无缓存：保留旧文件
+    acc, _ = svc._upsert_account(OWNER, {**entry, 'avatar_url': 'https://wx.qlogo.cn/new'}, None)
+    assert acc.avatar == 'static/avatars/old.png'
+
+    # 后台下载完成后按 avatar_url 回填
+    upstream['responses']['https://wx.qlogo.cn/new'] = _Response(200, PNG, {'content-type': 'image/png'})
+    path = store.fetch('https://wx.qlogo.cn/new')
+    db.expire_all()
+    assert db.query(MpAccount).filter_by(name='avatar').one().avatar == path
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.cookie_pool import breaker
+from app.services.gzhaccount import GzhAccountService
+from tests.conftest import OWNER
+
+
+@pytest.fixture()
+def crawls(monkeypatch):
+    """替换单账号抓取：记录同时在抓的账号数峰值；bad 产出 error，boom 抛异常，其余各产出两页。"""
+    state = {'active': 0, 'peak': 0}
+
+    async def crawl(target: str):
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        try:
+            await asyncio.sleep(0.02)
+            if target == 'boom':
+                raise RuntimeError('upstream exploded')
+            yield {'type': 'account', 'account': {'name': target}}
+            if target == 'bad':
+                yield {'type': 'error', 'message': '未找到公众号'}
+                return
+            for page in (1, 2):
+                yield {'type': 'page', 'page': page, 'new_added': page, 'total_db': 3, 'items': [], 'has_more': page == 1}
+                await asyncio.sleep(0.01)
+            yield {'type': 'done', 'total_db': 3, 'items': [], 'account': None, 'backfill_job': None}
+        finally:
+            state['active'] -= 1
+
+    async def search(self, *, name, **kwargs):
+        async for evt in crawl(name):
+            yield evt
+
+    async def by_biz(self, *, biz, **kwargs):
+        async for evt in crawl(biz):
+            yield evt
+
+    monkeypatch.setattr(GzhAccountService, 'astream_search', search)
+    monkeypatch.setattr(GzhAccountService, 'astream_biz', by_biz)
+    breaker._state.clear()
+    yield state
+    breaker._state.clear()
+
+
+def _batch(session_factory, names: list[str], bizs: list[str] = ()) -> list[dict]:
+    async def run():
+        db = session_factory()
+        try:
+            svc = GzhAccountService(db)
+            return [evt async for evt in svc.astream_batch(owner_email=OWNER, names=names, bizs=list(bizs))]
+        finally:
+            db.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('global_cap, per_cookie, peak', [(8, 2, 2), (3, 5, 3)])
+def test_concurrency_is_capped_globally_and_per_cookie(session_factory, crawls, monkeypatch, global_cap, per_cookie, peak):
+    monkeypatch.setattr(settings, 'BATCH_CONCURRENCY', global_cap)
+    monkeypatch.setattr(settings, 'BATCH_PER_COOKIE_CONCURRENCY', per_cookie)
+
+    events = _batch(session_factory, [f'acc{i}' for i in range(8)])
+
+    # 用户只有一个 cookie：上限为 min(全局, 1 × 每 cookie)
+    assert crawls['peak'] == peak
+    assert events[-1] == {'type': 'batch_done', 'total': 8, 'succeeded': 8, 'failed': 0}
+
+
+def test_each_target_ends_with_a_summary_and_the_batch_with_totals(session_factory, crawls):
+    events = _batch(session_factory, ['ok', 'bad', 'ok', 'boom'], ['biz1'])
+
+    targets = [{'name': 'ok'}, {'name': 'bad'}, {'name': 'boom'}, {'biz': 'biz1'}]
+    summaries = {e['index']: e for e in events if e['type'] == 'summary'}
+    assert sorted(summaries) == [0, 1, 2, 3]
+    for index, target in enumerate(targets):
+        assert summaries[index]['target'] == target
+        # 每个账号的事件都带 index / target，且都在其 summary 之前
+        own = [i for i, e in enumerate(events) if e.get('index') == index]
+        assert events[own[-1]]['type'] == 'summary'
+        assert all(events[i]['target'] == target for i in own)
+
+    ok, bad, boom, biz = (summaries[i] for i in range(4))
+    assert (ok['ok'], ok['account'], ok['new_added'], ok['total_db'], ok['message']) == (True, 'ok', 3, 3, None)
+    assert (biz['ok'], biz['account']) == (True, 'biz1')
+    assert (bad['ok'], bad['account'], bad['message']) == (False, 'bad', '未找到公众号')
+    assert boom['ok'] is False and boom['message'] == '抓取异常: upstream exploded'
+    assert events[-1] == {'type': 'batch_done', 'total': 4, 'succeeded': 2, 'failed': 2}
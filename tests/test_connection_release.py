@@ -0,0 +1,32 @@
+import asyncio
+
+from app.services.gzhaccount import PAGE_SIZE, GzhAccountService
+from tests.conftest import OWNER, article
+
+PUBLISHES = 4 * PAGE_SIZE
+
+
+def test_crawl_holds_no_connection_while_waiting_for_upstream(session_factory, upstream):
+    pool = session_factory.kw['bind'].pool
+    checked_out: list[int] = []
+
+    def page(begin: int) -> tuple[list[dict], int]:
+        checked_out.append(pool.checkedout())
+        return [article(p, p) for p in range(begin, min(begin + PAGE_SIZE, PUBLISHES))], PUBLISHES
+
+    upstream['page'] = page
+
+    async def crawl():
+        db = session_factory()
+        try:
+            # 订阅者的会话先做一次读取（相当于请求里的鉴权 / cookie 检查），随后整段订阅都不应占着连接
+            GzhAccountService(db).cookie_pool.ensure_available(OWNER)
+            return [evt async for evt in GzhAccountService(db).astream_search(owner_email=OWNER, name='pooled', final_items=False)]
+        finally:
+            db.close()
+
+    events = asyncio.run(crawl())
+
+    assert events[-1]['type'] == 'done' and events[-1]['total_db'] == PUBLISHES
+    # 每次等待上游分页时，订阅者与抓取方的会话都已把连接还给连接池
+    assert checked_out == [0] * (PUBLISHES // PAGE_SIZE)
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models import Cookie
+from app.models.cookie_rate_limit import CookieRateLimit
+from app.services.cookie_pool import CookiePool, breaker
+from app.services.rate_limit import CookieRateLimiter
+from tests.conftest import OWNER
+
+
+@pytest.fixture()
+def pool(session_factory, monkeypatch):
+    """当前 cookie tok 与第二个 cookie tok2；容量 10，额度不随时间补充。"""
+    monkeypatch.setattr(settings, 'COOKIE_RATE_CAPACITY', 10)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_PER_HOUR', 0.001)
+    db = session_factory()
+    db.add(Cookie(
+        token='tok2',
+        owner_email=OWNER,
+        expire_time=datetime.now(timezone.utc) + timedelta(hours=1),
+        name='second',
+        local='',
+        is_current=False,
+    ))
+    db.commit()
+    breaker._state.clear()
+    yield CookiePool(db)
+    breaker._state.clear()
+    db.close()
+
+
+def _set(pool: CookiePool, token: str, *, tokens: float, error_rate: float = 0.0) -> None:
+    row = CookieRateLimiter(pool.db)._load(token)
+    row.tokens, row.error_rate = tokens, error_rate
+    pool.db.commit()
+
+
+def test_ties_go_to_the_current_cookie(pool):
+    assert pool.pick(OWNER).token == 'tok'
+
+
+def test_prefers_the_cookie_with_more_quota_left(pool):
+    for _ in range(5):
+        pool.limiter.reserve('tok')
+
+    assert pool.pick(OWNER).token == 'tok2'
+
+
+def test_recent_errors_discount_the_remaining_quota(pool):
+    _set(pool, 'tok', tokens=6)
+    # 剩余 10 × (1 - 0.5) = 5 < 6
+    _set(pool, 'tok2', tokens=10, error_rate=0.5)
+    assert pool.pick(OWNER).token == 'tok'
+
+    _set(pool, 'tok2', tokens=10, error_rate=0.3)
+    assert pool.pick(OWNER).token == 'tok2'
+
+
+def test_failed_reports_raise_the_error_rate(pool, monkeypatch):
+    monkeypatch.setattr(settings, 'COOKIE_POOL_ERROR_ALPHA', 0.5)
+    monkeypatch.setattr(settings, 'FETCH_BREAKER_THRESHOLD', 100)
+    _set(pool, 'tok', tokens=10)
+    _set(pool, 'tok2', tokens=8)
+    pool.report('tok', ok=False)
+    pool.report('tok', ok=False)
+
+    assert pool.db.get(CookieRateLimit, 'tok').error_rate == pytest.approx(0.75)
+    assert pool.pick(OWNER).token == 'tok2'
+
+
+def test_exhausted_cookies_rank_by_queue_length(pool):
+    _set(pool, 'tok', tokens=-1)
+    _set(pool, 'tok2', tokens=0.5)
+    assert pool.pick(OWNER).token == 'tok2'
+
+    # 有可用额度的 cookie 总是排在已耗尽的之前，即使失败率很高
+    _set(pool, 'tok', tokens=1, error_rate=0.99)
+    assert pool.pick(OWNER).token == 'tok'
+
+
+def test_tripped_breaker_skips_the_cookie_unless_all_are_open(pool):
+    _set(pool, 'tok2', tokens=1)
+    breaker.record('tok', ok=False, trip=True)
+    assert pool.pick(OWNER).token == 'tok2'
+
+    breaker.record('tok2', ok=False, trip=True)
+    assert pool.pick(OWNER).token == 'tok'
@@ -0,0 +1,226 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.models.crawl_job import CrawlJob
+from app.models.mp_account import CrawlState, MpAccount
+from app.services.gzhaccount import PAGE_SIZE, GzhAccountService, _CrawlFlight, _flights
+from tests.conftest import OWNER, article
+
+PUBLISHES = 4 * PAGE_SIZE
+
+
+@pytest.fixture()
+def upstream(upstream):
+    upstream['feed'] = [article(p, p) for p in range(PUBLISHES)]
+    return upstream
+
+
+async def _collect(session_factory, **kwargs) -> list[dict]:
+    db = session_factory()
+    try:
+        svc = GzhAccountService(db)
+        return [evt async for evt in svc.astream_search(owner_email=OWNER, name='flight', final_items=False, **kwargs)]
+    finally:
+        db.close()
+
+
+def test_full_crawl_waits_for_shallow_flight_instead_of_attaching(session_factory, upstream):
+    async def scenario():
+        upstream['gate'] = asyncio.Event()
+        shallow = asyncio.ensure_future(_collect(session_factory, max_articles=PAGE_SIZE, shallow=True))
+        while not upstream['fetched']:
+            await asyncio.sleep(0)
+        full = asyncio.ensure_future(_collect(session_factory))
+        await asyncio.sleep(0.05)
+        upstream['gate'].set()
+        return await shallow, await full
+
+    shallow_events, full_events = asyncio.run(scenario())
+
+    shallow_done, full_done = shallow_events[-1], full_events[-1]
+    assert shallow_done['type'] == full_done['type'] == 'done'
+    # 浅抓取抓完首页即 defer；全量请求在它结束后另起一次抓取：头部增量一页，再从断点（回退一页）续抓到末尾
+    assert shallow_done['total_db'] == PAGE_SIZE and shallow_done['backfill_job']
+    assert full_done['total_db'] == PUBLISHES
+    assert upstream['fetched'] == [0, 0] + list(range(0, PUBLISHES, PAGE_SIZE))
+
+    db = session_factory()
+    try:
+        acc = db.query(MpAccount).filter_by(name='flight').one()
+        assert acc.crawl_state == CrawlState.complete
+        assert acc.article_account == PUBLISHES
+        assert db.query(CrawlJob).filter_by(name='flight').count() == 1
+    finally:
+        db.close()
+
+
+def test_shallow_request_attaches_to_covering_flight(session_factory, upstream):
+    async def scenario():
+        upstream['gate'] = asyncio.Event()
+        first = asyncio.ensure_future(_collect(session_factory))
+        while not upstream['fetched']:
+            await asyncio.sleep(0)
+        second = asyncio.ensure_future(_collect(session_factory, max_articles=PAGE_SIZE, shallow=True))
+        await asyncio.sleep(0.05)
+        upstream['gate'].set()
+        return await first, await second
+
+    first, second = asyncio.run(scenario())
+
+    # 全量抓取满足浅抓取请求：两者共享同一次抓取，每页只请求一次
+    assert upstream['fetched'] == list(range(0, PUBLISHES, PAGE_SIZE))
+    assert first[-1]['total_db'] == second[-1]['total_db'] == PUBLISHES
+    assert second[-1]['backfill_job'] is None
+
+
+def _page_event(n: int) -> dict:
+    return {'type': 'page', 'page': n + 1, 'new_added': 1, 'total_db': n + 1, 'items': [{'n': n}], 'has_more': True}
+
+
+def test_consumed_events_are_trimmed_and_replayed_as_summary():
+    async def scenario():
+        flight = _CrawlFlight(asyncio.get_running_loop())
+        fast, slow = flight.attach('coalesce'), flight.attach('coalesce')
+        flight.publish({'type': 'account', 'account': {'name': 'flight'}})
+        for n in range(3):
+            flight.publish(_page_event(n))
+        stream = flight.subscribe(fast)
+        seen = [await stream.__anext__() for _ in range(4)]
+        # slow 尚未消费：缓存保留全部事件
+        buffered = len(flight.events)
+        flight.detach(slow, handoff=False)
+        trimmed = len(flight.events)
+        late = flight.attach('coalesce')
+        flight.finish()
+        replay = [evt async for evt in flight.subscribe(late)]
+        await stream.aclose()
+        return seen, buffered, trimmed, replay, flight.abandoned
+
+    seen, buffered, trimmed, replay, abandoned = asyncio.run(scenario())
+
+    assert [e['type'] for e in seen] == ['account', 'page', 'page', 'page']
+    # fast 已取走全部事件：slow 离开后缓存清空
+    assert (buffered, trimmed) == (4, 0)
+    # 后加入的订阅者：account 原样回放，已移出的 page 合并为一条不带 items 的摘要
+    assert replay[0] == {'type': 'account', 'account': {'name': 'flight'}}
+    assert {k: replay[1][k] for k in ('type', 'truncated', 'new_added', 'items', 'total_db')} == {
+        'type': 'page', 'truncated': 3, 'new_added': 3, 'items': [], 'total_db': 3,
+    }
+    assert len(replay) == 2
+    assert not abandoned
+
+
+def test_abandoned_stream_hands_off_to_background_job(session_factory, upstream):
+    async def scenario():
+        upstream['gate'] = asyncio.Event()
+        db = session_factory()
+        try:
+            svc = GzhAccountService(db)
+            stream = svc.astream_search(owner_email=OWNER, name='flight', final_items=False, handoff=True)
+            first = await stream.__anext__()
+            flight = _flights['flight-fakeid']
+            while not upstream['fetched']:
+                await asyncio.sleep(0)
+            # 客户端断开：最后一个订阅者离开，在途请求被取消，抓取转交后台任务
+            await stream.aclose()
+            await flight.wait_finished()
+            await asyncio.sleep(0)
+            return first, flight.abandoned, flight.handoff
+        finally:
+            db.close()
+
+    first, abandoned, handoff = asyncio.run(scenario())
+
+    assert first['type'] == 'account'
+    assert abandoned and handoff
+    assert upstream['fetched'] == [0]
+    db = session_factory()
+    try:
+        jobs = db.query(CrawlJob).filter_by(name='flight').all()
+        assert [(j.max_articles, j.priority) for j in jobs] == [(0, 0)]
+        assert db.query(MpAccount).filter_by(name='flight').one().article_account == 0
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize('policy', ['coalesce', 'drop'])
+def test_lagging_subscriber_gets_compacted_pages(monkeypatch, policy):
+    monkeypatch.setattr(settings, 'STREAM_BUFFER_EVENTS', 2)
+
+    async def scenario():
+        flight = _CrawlFlight(asyncio.get_running_loop())
+        sub = flight.attach(policy)
+        for n in range(5):
+            flight.publish(_page_event(n))
+            # 非 block 订阅者不拖慢抓取
+            await asyncio.wait_for(flight.drain(), 0.1)
+        flight.finish()
+        return [evt async for evt in flight.subscribe(sub)]
+
+    events = asyncio.run(scenario())
+
+    # 积压到第 3 条时在 publish 中压缩为一条，之后的两页未超限逐条送达
+    merged, rest = events[0], events[1:]
+    assert rest == [_page_event(3), _page_event(4)]
+    assert merged['new_added'] == 3 and merged['total_db'] == 3
+    if policy == 'coalesce':
+        # 只保留最近 STREAM_BUFFER_EVENTS 页的 items，更早的计入 dropped
+        assert merged['coalesced'] == 3 and merged['dropped'] == 1
+        assert merged['items'] == [{'n': 1}, {'n': 2}]
+    else:
+        assert merged['dropped'] == 2 and merged['items'] == [{'n': 2}]
+
+
+def test_stalled_subscriber_stays_bounded(monkeypatch):
+    monkeypatch.setattr(settings, 'STREAM_BUFFER_EVENTS', 8)
+
+    async def scenario():
+        flight = _CrawlFlight(asyncio.get_running_loop())
+        sub = flight.attach('coalesce')
+        flight.publish({'type': 'account', 'account': {'name': 'flight'}})
+        peak = 0
+        for n in range(5000):
+            flight.publish(_page_event(n))
+            await asyncio.wait_for(flight.drain(), 0.1)
+            backlog = flight._overflow.get(sub, [])
+            peak = max(peak, len(flight.events) + sum(1 + len(e.get('items') or []) for e in backlog))
+        flight.finish()
+        return peak, [evt async for evt in flight.subscribe(sub)]
+
+    peak, events = asyncio.run(scenario())
+
+    # 订阅者一直不读：共享缓存与它的溢出缓冲都不随页数增长
+    assert peak <= 3 * 8
+    assert events[0]['type'] == 'account'
+    pages = [e for e in events if e['type'] == 'page']
+    assert sum(e['new_added'] for e in pages) == 5000
+    assert pages[-1]['total_db'] == 5000
+    assert pages[0]['coalesced'] + len(pages) - 1 == 5000
+    assert len(pages[0]['items']) <= 8
+
+
+def test_blocking_subscriber_makes_the_producer_wait(monkeypatch):
+    monkeypatch.setattr(settings, 'STREAM_BUFFER_EVENTS', 2)
+
+    async def scenario():
+        flight = _CrawlFlight(asyncio.get_running_loop())
+        sub = flight.attach('block')
+        for n in range(3):
+            flight.publish(_page_event(n))
+        drain = asyncio.ensure_future(flight.drain())
+        await asyncio.sleep(0.05)
+        waiting = not drain.done()
+        stream = flight.subscribe(sub)
+        first = await stream.__anext__()
+        await stream.__anext__()
+        await asyncio.wait_for(drain, 0.1)
+        await stream.aclose()
+        return waiting, first
+
+    waiting, first = asyncio.run(scenario())
+
+    # 积压 3 条 > 2：生产者在 drain 中等待；订阅者追上后放行，事件逐条送达不合并
+    assert waiting
+    assert first == _page_event(0)
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models.crawl_job import CrawlJob, CrawlJobEvent, CrawlJobStatus
+from app.services import crawl_jobs
+from app.services.crawl_jobs import CrawlJobRunner, CrawlJobService
+from app.services.gzhaccount import GzhAccountService
+from tests.conftest import OWNER
+
+
+@pytest.fixture()
+def jobs_db(session_factory, monkeypatch):
+    monkeypatch.setattr(crawl_jobs, 'SessionLocal', session_factory)
+    return session_factory
+
+
+def _job(db, **values) -> CrawlJob:
+    job = CrawlJob(owner_email=OWNER, name='acc', **values)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_running_job_keeps_heartbeat_while_waiting_without_events(jobs_db, monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_JOB_HEARTBEAT_SECONDS', 0.05)
+    stale_seconds = 0.3
+
+    async def slow_search(self, **kwargs):
+        # 例如在令牌桶中排队：长时间没有任何进度事件
+        await asyncio.sleep(1.0)
+        yield {"type": "done", "total_db": 0, "items": [], "account": None, "backfill_job": None}
+
+    monkeypatch.setattr(GzhAccountService, 'astream_search', slow_search)
+
+    db = jobs_db()
+    job_id = _job(db).id
+    db.close()
+    recovered: list = []
+
+    async def scenario():
+        runner = CrawlJobRunner(1)
+        run = asyncio.ensure_future(runner._run(job_id))
+        for _ in range(3):
+            await asyncio.sleep(0.3)
+            check = jobs_db()
+            try:
+                recovered.extend(CrawlJobService(check).recoverable_jobs(stale_seconds=stale_seconds))
+            finally:
+                check.close()
+        await run
+
+    asyncio.run(scenario())
+
+    assert recovered == []
+    db = jobs_db()
+    try:
+        assert db.get(CrawlJob, job_id).status == CrawlJobStatus.succeeded
+    finally:
+        db.close()
+
+
+def test_purge_events_only_removes_expired_finished_jobs(jobs_db):
+    now = datetime.now(timezone.utc)
+    db = jobs_db()
+    try:
+        old = _job(db, status=CrawlJobStatus.succeeded, finish_time=now - timedelta(days=10)).id
+        recent = _job(db, status=CrawlJobStatus.failed, finish_time=now - timedelta(hours=1)).id
+        running = _job(db, status=CrawlJobStatus.running).id
+        for job_id in (old, recent, running):
+            db.add_all(CrawlJobEvent(job_id=job_id, seq=seq, payload=json.dumps({"seq": seq})) for seq in range(3))
+        db.commit()
+
+        assert CrawlJobService(db).purge_events(older_than_seconds=7 * 86400) == 3
+
+        left = {job_id: db.query(CrawlJobEvent).filter_by(job_id=job_id).count() for job_id in (old, recent, running)}
+        assert left == {old: 0, recent: 3, running: 3}
+        # 任务记录保留
+        assert db.get(CrawlJob, old) is not None
+    finally:
+        db.close()
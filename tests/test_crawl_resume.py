@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.models.mp_account import CrawlState, MpAccount
+from app.models.mp_article import MpArticle
+from app.services.gzhaccount import MSG_INTERRUPTED, PAGE_SIZE, GzhAccountService
+from app.services.wechat_fetch import GzhFetchError
+from tests.conftest import OWNER, article
+
+
+@pytest.fixture()
+def feed(upstream):
+    """6 页文章，从新到旧。"""
+    upstream['feed'] = [article(p, p) for p in range(6 * PAGE_SIZE)]
+    return upstream
+
+
+def _crawl(session_factory) -> list[dict]:
+    async def run():
+        db = session_factory()
+        try:
+            svc = GzhAccountService(db)
+            return [evt async for evt in svc.astream_search(owner_email=OWNER, name='resume', final_items=False)]
+        finally:
+            db.close()
+
+    return asyncio.run(run())
+
+
+def _account(session_factory) -> MpAccount:
+    db = session_factory()
+    try:
+        return db.query(MpAccount).filter_by(name='resume').one()
+    finally:
+        db.close()
+
+
+def _article_count(session_factory) -> int:
+    db = session_factory()
+    try:
+        return db.query(MpArticle).count()
+    finally:
+        db.close()
+
+
+def test_interrupted_backfill_resumes_from_checkpoint(session_factory, feed):
+    total = len(feed['feed'])
+    feed['fail_at'] = {3 * PAGE_SIZE: GzhFetchError("HTTP 502")}
+    events = _crawl(session_factory)
+
+    assert events[-1]['type'] == 'error' and events[-1]['message'].startswith(MSG_INTERRUPTED)
+    acc = _account(session_factory)
+    assert (acc.crawl_state, acc.crawl_offset, acc.crawl_total) == (CrawlState.backfilling, 3 * PAGE_SIZE, total)
+    assert acc.article_account == 3 * PAGE_SIZE
+
+    # 中断期间新发布 2 篇：旧文章整体后移 2 位，断点按 total_count 的变化修正
+    feed['feed'][:0] = [article(1000 + k, -1 - k) for k in (1, 0)]
+    feed['fail_at'] = {}
+    feed['fetched'].clear()
+    events = _crawl(session_factory)
+
+    assert events[-1]['type'] == 'done'
+    # 先增量追平头部（首页），再从修正后的断点回退一页续抓：3*5 + 2 - 5 = 12
+    resume = 3 * PAGE_SIZE + 2 - PAGE_SIZE
+    assert feed['fetched'] == [0] + list(range(resume, total + 2, PAGE_SIZE))
+    acc = _account(session_factory)
+    assert (acc.crawl_state, acc.crawl_offset, acc.crawl_total) == (CrawlState.complete, None, None)
+    assert acc.article_account == _article_count(session_factory) == total + 2
+
+
+def test_incremental_crawl_stops_at_watermark(session_factory, feed):
+    _crawl(session_factory)
+    acc = _account(session_factory)
+    head = feed['feed'][0]
+    assert (acc.watermark_time, acc.watermark_msgid) == (head['update_time'], head['msgid'])
+
+    # 新发布 2 篇；紧随其后的旧文章换了链接：按水位线判定为已入库，不再按 URL 查询，也不会重复入库
+    new = [article(1000 + k, -1 - k) for k in (1, 0)]
+    feed['feed'][:0] = new
+    feed['feed'][2] = {**feed['feed'][2], 'link': 'https://mp.weixin.qq.com/s/relinked'}
+    feed['fetched'].clear()
+    events = _crawl(session_factory)
+
+    pages = [e for e in events if e['type'] == 'page']
+    assert feed['fetched'] == [0]
+    assert [p['new_added'] for p in pages] == [2]
+    acc = _account(session_factory)
+    assert (acc.watermark_time, acc.watermark_msgid) == (new[0]['update_time'], new[0]['msgid'])
+    assert acc.article_account == _article_count(session_factory) == 6 * PAGE_SIZE + 2
+
+    # 没有新发布：首页即停在水位线
+    feed['fetched'].clear()
+    events = _crawl(session_factory)
+    assert feed['fetched'] == [0]
+    assert [e['new_added'] for e in events if e['type'] == 'page'] == [0]
+    assert _article_count(session_factory) == 6 * PAGE_SIZE + 2
@@ -0,0 +1,28 @@
+import asyncio
+
+from app.services.gzhaccount import PAGE_SIZE, GzhAccountService
+from app.services.wechat_fetch import FetchErrorKind, GzhFetchError
+from tests.conftest import OWNER, article
+
+PUBLISHES = 40
+
+
+def test_search_returns_saved_articles_when_upstream_fails_mid_pagination(session_factory, upstream):
+    upstream['feed'] = [article(p, p) for p in range(PUBLISHES)]
+    upstream['fail_at'] = {2 * PAGE_SIZE: GzhFetchError("ret=200013 freq control", FetchErrorKind.rate_limited, 200013)}
+
+    async def search():
+        db = session_factory()
+        try:
+            acc, arts = await GzhAccountService(db).asearch_account(owner_email=OWNER, name='interrupted', max_articles=3)
+            return acc.name, acc.biz, acc.crawl_offset, [a.url for a in arts]
+        finally:
+            db.close()
+
+    name, biz, offset, urls = asyncio.run(search())
+
+    assert upstream['fetched'] == [0, PAGE_SIZE, 2 * PAGE_SIZE]
+    assert (name, biz) == ('interrupted', 'interrupted-fakeid')
+    # 前两页已入库并记下断点，返回其中最新的 3 篇
+    assert offset == 2 * PAGE_SIZE
+    assert urls == [article(n, n)['link'] for n in range(3)]
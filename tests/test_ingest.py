@@ -0,0 +1,73 @@
+import pytest
+
+from app.models.mp_account import MpAccount
+from app.models.mp_article import MpArticle
+from app.services.gzhaccount import GzhAccountService
+from tests.conftest import OWNER, article
+
+
+@pytest.fixture()
+def svc(session_factory):
+    db = session_factory()
+    db.add_all([
+        MpAccount(name='acc', biz='acc-biz', owner_email=OWNER, article_account=0),
+        MpAccount(name='other', biz='other-biz', owner_email=OWNER, article_account=0),
+    ])
+    db.commit()
+    yield GzhAccountService(db)
+    db.close()
+
+
+def _urls(db, account: str) -> list[str]:
+    return sorted(u for (u,) in db.query(MpArticle.url).filter_by(mp_account=account))
+
+
+def test_persist_skips_duplicates_within_page_and_already_stored(svc):
+    db = svc.db
+    svc._persist_articles('other', [article(0, 0)])
+
+    page = [article(1, 1), article(1, 1), article(0, 0), article(2, 2), {**article(3, 3), 'link': ''}]
+    inserted = svc._persist_articles('acc', page)
+
+    # 页内重复、已被其它账号收录的 URL 与空链接都不插入；返回值按原顺序只含新行
+    assert [r['url'] for r in inserted] == [article(1, 1)['link'], article(2, 2)['link']]
+    assert _urls(db, 'acc') == sorted([article(1, 1)['link'], article(2, 2)['link']])
+    assert _urls(db, 'other') == [article(0, 0)['link']]
+
+    # 重放同一页：ON CONFLICT DO NOTHING，不报错也不产生新行
+    assert svc._persist_articles('acc', page) == []
+    assert db.query(MpArticle).count() == 3
+
+
+def _count(db, name: str) -> int:
+    db.expire_all()
+    return db.query(MpAccount).filter_by(name=name).one().article_account
+
+
+def test_article_count_is_bumped_by_inserted_rows_only(svc):
+    db = svc.db
+    svc._persist_articles('acc', [article(n, n) for n in range(3)])
+    assert _count(db, 'acc') == 3
+
+    # 与已入库文章重叠的一页：只按实际插入的 2 行累加
+    svc._persist_articles('acc', [article(n, n) for n in range(1, 5)])
+    assert _count(db, 'acc') == 5
+
+    # 无新文章但写断点：计数不变，断点照常写入
+    svc._persist_articles('acc', [article(4, 4)], checkpoint=(10, 40))
+    db.expire_all()
+    acc = db.query(MpAccount).filter_by(name='acc').one()
+    assert (acc.article_account, acc.crawl_offset, acc.crawl_total) == (5, 10, 40)
+
+
+def test_reconcile_fixes_only_drifted_counters(svc):
+    db = svc.db
+    svc._persist_articles('acc', [article(n, n) for n in range(3)])
+    svc._persist_articles('other', [article(n, n) for n in range(10, 12)])
+    db.query(MpAccount).filter_by(name='acc').update({'article_account': 99})
+    db.commit()
+
+    assert svc.reconcile_article_counts(owner_email='someone-else@example.com') == 0
+    assert svc.reconcile_article_counts() == 1
+    assert (_count(db, 'acc'), _count(db, 'other')) == (3, 2)
+    assert svc.reconcile_article_counts() == 0
@@ -0,0 +1,63 @@
+import asyncio
+import sys
+
+import pytest
+
+from app.services.gzhaccount import PAGE_SIZE, GzhAccountService
+from tests.conftest import OWNER
+
+resource = pytest.importorskip("resource")
+
+# 合成账号：5 万篇，每次群发 10 篇，每页 PAGE_SIZE 次群发
+ARTICLES = 50_000
+PER_PUBLISH = 10
+PUBLISHES = ARTICLES // PER_PUBLISH
+# 抓完前 1 万篇后记录一次峰值 RSS，之后的 4 万篇不应再明显增长
+WARMUP_ARTICLES = 10_000
+MAX_GROWTH_MB = 16
+
+
+def _synthetic_page(begin: int) -> tuple[list[dict], int]:
+    items = []
+    for p in range(begin, min(begin + PAGE_SIZE, PUBLISHES)):
+        for k in range(PER_PUBLISH):
+            n = p * PER_PUBLISH + k
+            items.append({
+                'title': f'synthetic article {n}',
+                'cover': f'https://mmbiz.qpic.cn/synthetic/{n}.jpg',
+                'link': f'https://mp.weixin.qq.com/s/synthetic-{n}',
+                'update_time': 1700000000 - p,
+                'item_show_type': 0,
+                'msgid': f'{p}_{k + 1}',
+            })
+    return items, PUBLISHES
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def test_full_crawl_memory_stays_flat(session_factory, upstream):
+    upstream['page'] = _synthetic_page
+
+    async def crawl() -> tuple[float, float, dict]:
+        db = session_factory()
+        try:
+            svc = GzhAccountService(db)
+            warm = None
+            done = None
+            async for evt in svc.astream_search(owner_email=OWNER, name='synthetic', final_items=False):
+                if evt['type'] == 'page' and warm is None and evt['total_db'] >= WARMUP_ARTICLES:
+                    warm = _peak_rss_mb()
+                elif evt['type'] == 'done':
+                    done = evt
+            return warm, _peak_rss_mb(), done
+        finally:
+            db.close()
+
+    warm, end, done = asyncio.run(crawl())
+
+    assert done is not None and done['total_db'] == ARTICLES
+    assert end - warm < MAX_GROWTH_MB, f"peak RSS grew {end - warm:.1f} MB while ingesting {ARTICLES - WARMUP_ARTICLES} more articles"
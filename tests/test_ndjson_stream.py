@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.v1.routes.gzhaccount import _ndjson_response
+from app.core.config import settings
+
+
+class _ConnectedRequest:
+    """客户端一直在线：断开检测不会先于外部取消触发。"""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.mark.parametrize('request_obj', [None, _ConnectedRequest()], ids=['plain', 'disconnect-watch'])
+def test_cancelling_response_while_page_pending_closes_events(request_obj, monkeypatch):
+    monkeypatch.setattr(settings, 'STREAM_DISCONNECT_POLL_SECONDS', 0.01)
+    state = {'pending': None, 'cancelled': False, 'closed': False}
+
+    async def events():
+        try:
+            yield {'type': 'page', 'page': 1, 'new_added': 0, 'total_db': 0, 'items': [], 'has_more': True}
+            state['pending'].set()
+            try:
+                # 第二页的上游请求迟迟不返回
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                state['cancelled'] = True
+                raise
+            yield {'type': 'done'}
+        finally:
+            state['closed'] = True
+
+    async def scenario():
+        state['pending'] = asyncio.Event()
+        lines: list[str] = []
+
+        async def consume():
+            async for line in _ndjson_response(events(), request_obj).body_iterator:
+                lines.append(line)
+
+        task = asyncio.ensure_future(consume())
+        await state['pending'].wait()
+        await asyncio.sleep(0.05)
+        # 例如服务器关闭或 ASGI 层取消了响应任务
+        task.cancel()
+        results = await asyncio.gather(task, return_exceptions=True)
+        return lines, results[0]
+
+    lines, outcome = asyncio.run(scenario())
+
+    assert [json.loads(line)['type'] for line in lines] == ['page']
+    assert isinstance(outcome, asyncio.CancelledError)
+    assert state['cancelled'] and state['closed']
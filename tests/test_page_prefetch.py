@@ -0,0 +1,94 @@
+import asyncio
+import json
+import re
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models.mp_account import CrawlState, MpAccount
+from app.models.mp_article import MpArticle
+from app.services import wechat_http
+from app.services.cookie_pool import breaker
+from app.services.gzhaccount import PAGE_SIZE, GzhAccountService, _flights
+from tests.conftest import OWNER, article
+
+ENTRY = {'nickname': 'prefetch', 'fakeid': 'prefetch-fakeid', 'avatar_url': '', 'signature': None}
+PAGES = 6
+RATE = 10.0  # 每秒补充的令牌
+
+
+def _body(begin: int) -> dict:
+    """appmsgpublish 响应：每次群发一篇。"""
+    publish_list = [
+        {'publish_info': json.dumps({'appmsgex': [{**article(p, p), 'aid': f'{p}_1'}]})}
+        for p in range(begin, min(begin + PAGE_SIZE, PAGES * PAGE_SIZE))
+    ]
+    return {'base_resp': {'ret': 0}, 'publish_page': json.dumps({'total_count': PAGES * PAGE_SIZE, 'publish_list': publish_list})}
+
+
+@pytest.fixture()
+def upstream(monkeypatch):
+    """
+    假上游（替换 httpx 请求，cookie 池与令牌桶照常工作）：越靠后的分页响应越快，预取结果乱序返回；
+    记录每个请求的偏移、发出时间与在途请求数峰值。
+    """
+    monkeypatch.setattr(settings, 'CRAWL_PREFETCH_CONCURRENCY', 3)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_CAPACITY', 2)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_PER_HOUR', RATE * 3600)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_MAX_QUEUE', PAGES)
+    state = {'requests': [], 'inflight': 0, 'peak': 0}
+
+    async def resolve(self, owner_email, name):
+        return ENTRY, None
+
+    async def aget(folder, url, *, timeout=None):
+        begin = int(re.search(r'[?&]begin=(\d+)', url).group(1))
+        state['requests'].append((begin, asyncio.get_running_loop().time()))
+        state['inflight'] += 1
+        state['peak'] = max(state['peak'], state['inflight'])
+        try:
+            await asyncio.sleep(0.02 * (PAGES - begin // PAGE_SIZE))
+        finally:
+            state['inflight'] -= 1
+        return httpx.Response(200, json=_body(begin))
+
+    monkeypatch.setattr(GzhAccountService, '_aresolve_entry', resolve)
+    monkeypatch.setattr(wechat_http, 'aget', aget)
+    breaker._state.clear()
+    yield state
+    breaker._state.clear()
+    _flights.clear()
+
+
+def test_prefetched_pages_are_ingested_in_publish_order_within_cookie_budget(session_factory, upstream):
+    async def run():
+        db = session_factory()
+        try:
+            svc = GzhAccountService(db)
+            return [evt async for evt in svc.astream_search(owner_email=OWNER, name='prefetch', final_items=False, prefetch=True)]
+        finally:
+            db.close()
+
+    events = asyncio.run(run())
+
+    pages = [e for e in events if e['type'] == 'page']
+    assert [e['page'] for e in pages] == list(range(1, PAGES + 1))
+    # 乱序到达的分页仍按偏移顺序入库并产出
+    assert [i['url'] for e in pages for i in e['items']] == [article(p, p)['link'] for p in range(PAGES * PAGE_SIZE)]
+    assert sorted(b for b, _ in upstream['requests']) == list(range(0, PAGES * PAGE_SIZE, PAGE_SIZE))
+    assert 1 < upstream['peak'] <= settings.CRAWL_PREFETCH_CONCURRENCY
+
+    # 每个请求在 cookie 令牌桶上预约：容量用完后按补充速率放行
+    started = sorted(t for _, t in upstream['requests'])
+    for i, t in enumerate(started):
+        allowed = max(0, i - settings.COOKIE_RATE_CAPACITY + 1) / RATE
+        assert t - started[0] >= allowed - 0.02
+
+    db = session_factory()
+    try:
+        acc = db.query(MpAccount).filter_by(name='prefetch').one()
+        assert acc.crawl_state == CrawlState.complete
+        assert db.query(MpArticle).count() == PAGES * PAGE_SIZE
+    finally:
+        db.close()
@@ -0,0 +1,111 @@
+import pytest
+
+from app.api.middleware import load_user
+from app.models import Account
+from app.models.account import ActivationStatus, UserRole
+from app.services import principal_cache as principal_cache_module
+from app.services.activation import ActivationService
+from app.services.admin import AdminUserService
+from app.services.principal_cache import PrincipalCache, principal_cache
+from tests.conftest import OWNER
+
+
+def _account(user_id: str) -> Account:
+    return Account(id=user_id, email=f'{user_id}@example.com', password_hash='x', role=UserRole.user)
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_get_returns_fresh_detached_copy():
+    cache = PrincipalCache(maxsize=4, ttl=30)
+    cache.put(_account('u1'), cache.generation())
+
+    first, second = cache.get('u1'), cache.get('u1')
+
+    assert first.email == 'u1@example.com' and first is not second
+    assert cache.get('missing') is None
+
+
+def test_invalidate_drops_entry_and_rejects_stale_put():
+    cache = PrincipalCache(maxsize=4, ttl=30)
+    cache.put(_account('u1'), cache.generation())
+    # 查库前取的代数，查库期间发生了失效
+    generation = cache.generation()
+    cache.invalidate('u1')
+    cache.put(_account('u1'), generation)
+
+    assert cache.get('u1') is None
+    cache.put(_account('u1'), cache.generation())
+    assert cache.get('u1') is not None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PrincipalCache(maxsize=4, ttl=30)
+    cache.put(_account('u1'), cache.generation())
+
+    clock[0] += 29
+    assert cache.get('u1') is not None
+    clock[0] += 2
+    assert cache.get('u1') is None
+
+
+def test_lru_eviction_and_disabled_cache():
+    cache = PrincipalCache(maxsize=2, ttl=30)
+    for user_id in ('u1', 'u2'):
+        cache.put(_account(user_id), cache.generation())
+    cache.get('u1')
+    cache.put(_account('u3'), cache.generation())
+
+    assert cache.get('u2') is None
+    assert cache.get('u1') is not None and cache.get('u3') is not None
+
+    disabled = PrincipalCache(maxsize=0, ttl=30)
+    disabled.put(_account('u1'), disabled.generation())
+    assert disabled.get('u1') is None
+
+
+@pytest.fixture()
+def cached_user(session_factory):
+    """已由鉴权路径（load_user）写入全局缓存的用户 id。"""
+    principal_cache.clear()
+    db = session_factory()
+    user_id = db.query(Account).filter_by(email=OWNER).one().id
+    load_user(session_factory(), user_id)
+    assert principal_cache.get(user_id).activation_status == ActivationStatus.pending
+    yield db, user_id
+    principal_cache.clear()
+    db.close()
+
+
+def test_admin_update_invalidates(cached_user):
+    db, user_id = cached_user
+
+    AdminUserService(db).update_user(user_id=user_id, role=UserRole.admin)
+
+    assert principal_cache.get(user_id) is None
+    assert load_user(db, user_id).role == UserRole.admin
+    assert principal_cache.get(user_id).role == UserRole.admin
+
+
+def test_admin_delete_invalidates(cached_user):
+    db, user_id = cached_user
+
+    AdminUserService(db).delete_user(user_id=user_id)
+
+    assert principal_cache.get(user_id) is None
+
+
+def test_activation_invalidates(cached_user):
+    db, user_id = cached_user
+    service = ActivationService(db)
+    code = service.generate(valid_days=30, count=1)[0].activation_code
+
+    service.activate(account=db.get(Account, user_id), activation_code=code)
+
+    assert principal_cache.get(user_id) is None
+    assert load_user(db, user_id).activation_status == ActivationStatus.active
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.models.cookie_rate_limit import CookieRateLimit
+from app.services.cookie_pool import CookiePool
+from app.services.rate_limit import CookieRateLimiter
+from tests.conftest import OWNER
+
+
+@pytest.fixture()
+def bucket(monkeypatch):
+    """容量 2、每秒补充 1 个、至多排队 1 个的令牌桶。"""
+    monkeypatch.setattr(settings, 'COOKIE_RATE_CAPACITY', 2)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_PER_HOUR', 3600.0)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_MAX_QUEUE', 1)
+
+
+def _tokens(session_factory, token='tok') -> CookieRateLimit:
+    db = session_factory()
+    try:
+        return db.get(CookieRateLimit, token)
+    finally:
+        db.close()
+
+
+def test_stale_version_loses_the_compare_and_swap(session_factory, bucket):
+    a, b = session_factory(), session_factory()
+    try:
+        limiter_a, limiter_b = CookieRateLimiter(a), CookieRateLimiter(b)
+        stale = limiter_a._load('tok')
+        stale_version = stale.version
+        assert limiter_b.reserve('tok') == (True, 0.0)
+        # A 读到的版本已被 B 推进：写入失败，不覆盖 B 的扣减
+        assert not limiter_a._swap(stale, 2.0, 0.0)
+    finally:
+        a.close()
+        b.close()
+    row = _tokens(session_factory)
+    assert row.version == stale_version + 1
+    assert row.tokens == pytest.approx(1.0, abs=0.05)
+
+
+def test_concurrent_reservations_are_not_lost(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, 'COOKIE_RATE_CAPACITY', 100)
+    monkeypatch.setattr(settings, 'COOKIE_RATE_PER_HOUR', 0.001)
+    db = session_factory()
+    CookieRateLimiter(db)._load('tok')
+    db.close()
+
+    def worker():
+        db = session_factory()
+        try:
+            limiter = CookieRateLimiter(db)
+            for _ in range(5):
+                limiter.reserve('tok')
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    row = _tokens(session_factory)
+    assert row.version == 20
+    assert row.tokens == pytest.approx(80.0, abs=0.01)
+
+
+def test_debt_is_bounded_by_max_queue(session_factory, bucket):
+    db = session_factory()
+    try:
+        limiter = CookieRateLimiter(db)
+        assert limiter.reserve('tok') == (True, 0.0)
+        assert limiter.reserve('tok') == (True, 0.0)
+        reserved, wait = limiter.reserve('tok')
+        assert reserved and wait == pytest.approx(1.0, abs=0.05)
+        # 已排队 1 个：不再扣减，返回腾出位置前的等待
+        reserved, wait = limiter.reserve('tok')
+        assert not reserved and wait == pytest.approx(1.0, abs=0.05)
+    finally:
+        db.close()
+    assert _tokens(session_factory).tokens == pytest.approx(-1.0, abs=0.05)
+
+
+def test_release_refunds_up_to_capacity(session_factory, bucket):
+    db = session_factory()
+    try:
+        limiter = CookieRateLimiter(db)
+        limiter.reserve('tok')
+        limiter.release('tok')
+        limiter.release('tok')
+    finally:
+        db.close()
+    assert _tokens(session_factory).tokens == pytest.approx(2.0)
+
+
+def test_cancelled_wait_refunds_the_reservation(session_factory, bucket):
+    async def scenario():
+        db = session_factory()
+        try:
+            pool = CookiePool(db)
+            await pool.aacquire(OWNER)
+            await pool.aacquire(OWNER)
+            # 额度已用完：第三次预约后等待约 1 秒，期间被取消
+            waiter = asyncio.ensure_future(pool.aacquire(OWNER))
+            await asyncio.sleep(0.2)
+            assert _tokens(session_factory).tokens < 0
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                if _tokens(session_factory).tokens >= 0:
+                    break
+        finally:
+            db.close()
+
+    asyncio.run(scenario())
+    # 未退还时约为 -1（加上等待期间补充的零头）
+    assert _tokens(session_factory).tokens >= 0
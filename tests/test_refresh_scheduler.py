@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models import Account
+from app.models.mp_account import MpAccount
+from app.services import refresh_scheduler
+from app.services.refresh_scheduler import RefreshScheduler, RefreshService
+from tests.conftest import OWNER
+
+
+@pytest.fixture()
+def accounts(session_factory, monkeypatch):
+    """目标间隔 = clamp(发布间隔 × 0.5, 60, 3600) 秒；priority = 陈旧度 / 目标间隔。"""
+    monkeypatch.setattr(refresh_scheduler, 'SessionLocal', session_factory)
+    monkeypatch.setattr(settings, 'REFRESH_MIN_SECONDS', 60)
+    monkeypatch.setattr(settings, 'REFRESH_MAX_SECONDS', 3600)
+    monkeypatch.setattr(settings, 'REFRESH_INTERVAL_FACTOR', 0.5)
+    now = datetime.now(timezone.utc)
+    rows = {
+        'hot': dict(publish_interval=600, update_time=now - timedelta(seconds=900)),  # 3.0
+        'cold': dict(publish_interval=None, update_time=now - timedelta(seconds=7200)),  # 2.0
+        'clamped': dict(publish_interval=10, update_time=now - timedelta(seconds=90)),  # 目标间隔取下限 60：1.5
+        'fresh': dict(publish_interval=None, update_time=now - timedelta(seconds=600)),  # 未到期
+        'probed': dict(publish_interval=600, update_time=now - timedelta(days=1), refresh_time=now - timedelta(seconds=30)),  # 冷却中
+    }
+    db = session_factory()
+    db.add_all(MpAccount(name=name, biz=f'{name}-biz', owner_email=OWNER, article_account=0, **values) for name, values in rows.items())
+    db.commit()
+    db.close()
+    return session_factory
+
+
+def test_due_accounts_are_ranked_and_limited_in_sql(accounts):
+    db = accounts()
+    try:
+        svc = RefreshService(db)
+        due = svc.due_accounts(limit=10)
+        assert [c.name for c in due] == ['hot', 'cold', 'clamped']
+        assert [round(c.priority, 1) for c in due] == [3.0, 2.0, 1.5]
+        assert [c.name for c in svc.due_accounts(limit=2)] == ['hot', 'cold']
+        assert [c.name for c in svc.due_accounts(limit=2, exclude_biz={'hot-biz'})] == ['cold', 'clamped']
+        assert svc.due_accounts(limit=10, exclude_owners={OWNER}) == []
+    finally:
+        db.close()
+
+
+def test_claim_succeeds_once_per_cooldown(accounts):
+    a, b = accounts(), accounts()
+    try:
+        assert RefreshService(a).claim('hot')
+        assert not RefreshService(b).claim('hot')
+        assert 'hot' not in [c.name for c in RefreshService(b).due_accounts(limit=10)]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_schedulers_in_two_workers_probe_each_account_once(accounts, monkeypatch):
+    probed: list[str] = []
+
+    async def probe(self, c):
+        probed.append(c.name)
+        self._release(c)
+
+    monkeypatch.setattr(RefreshScheduler, '_probe', probe)
+
+    async def scenario():
+        # 两个 worker 进程各自的调度器：进程内状态互不可见，只通过数据库认领
+        first, second = RefreshScheduler(2, 5), RefreshScheduler(2, 5)
+        counts = [await first.tick(), await second.tick(), await first.tick(), await second.tick()]
+        await asyncio.sleep(0)
+        return counts
+
+    counts = asyncio.run(scenario())
+
+    assert sorted(probed) == ['clamped', 'cold', 'hot']
+    assert sum(counts) == 3
+
+
+def test_owners_without_cookies_do_not_starve_other_due_accounts(session_factory, monkeypatch):
+    monkeypatch.setattr(refresh_scheduler, 'SessionLocal', session_factory)
+    monkeypatch.setattr(settings, 'REFRESH_MIN_SECONDS', 60)
+    monkeypatch.setattr(settings, 'REFRESH_MAX_SECONDS', 3600)
+    now = datetime.now(timezone.utc)
+    db = session_factory()
+    db.add(Account(email='nocookie@example.com', password_hash='x'))
+    db.commit()
+    # 没有 cookie 的用户：两个 30 天未更新的账号，优先级远高于 OWNER 的到期账号
+    db.add_all([
+        MpAccount(name='stale-1', biz='stale-1-biz', owner_email='nocookie@example.com', article_account=0, update_time=now - timedelta(days=30)),
+        MpAccount(name='stale-2', biz='stale-2-biz', owner_email='nocookie@example.com', article_account=0, update_time=now - timedelta(days=30)),
+        MpAccount(name='due', biz='due-biz', owner_email=OWNER, article_account=0, update_time=now - timedelta(seconds=7200)),
+    ])
+    db.commit()
+    db.close()
+    probed: list[str] = []
+
+    async def probe(self, c):
+        probed.append(c.name)
+        self._release(c)
+
+    monkeypatch.setattr(RefreshScheduler, '_probe', probe)
+
+    async def scenario():
+        started = await RefreshScheduler(2, 1).tick()
+        await asyncio.sleep(0)
+        return started
+
+    assert asyncio.run(scenario()) == 1
+    assert probed == ['due']
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models import MpAccount
+from app.models.mp_search_candidate import MpSearchCandidate
+from app.services.searchbiz_cache import SearchbizCache
+from tests.conftest import OWNER
+
+
+def _raw(nickname: str, fakeid: str) -> dict:
+    return {'nickname': nickname, 'fakeid': fakeid, 'round_head_img': f'http://wx.qlogo.cn/{fakeid}', 'signature': ''}
+
+
+@pytest.fixture()
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+def _age(db, seconds: float) -> None:
+    """把所有缓存候选的抓取时间往前拨 seconds 秒。"""
+    for row in db.query(MpSearchCandidate):
+        row.fetched_at = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    db.commit()
+
+
+def test_first_candidate_hits_within_ttl(db):
+    cache = SearchbizCache(db)
+    cache.store('keyword', {'list': [_raw('First', 'fk1'), _raw('Second', 'fk2')]})
+
+    entry = cache.lookup('keyword')
+
+    assert entry == {'nickname': 'First', 'fakeid': 'fk1', 'avatar_url': 'https://wx.qlogo.cn/fk1', 'signature': None}
+    # 其它查询结果中昵称完全匹配的候选同样命中
+    assert cache.lookup('Second')['fakeid'] == 'fk2'
+
+
+def test_expired_candidates_miss(db):
+    cache = SearchbizCache(db)
+    cache.store('keyword', {'list': [_raw('First', 'fk1')]})
+    _age(db, settings.SEARCHBIZ_CACHE_TTL_SECONDS + 60)
+
+    assert cache.lookup('keyword') is None
+    assert cache.lookup('First') is None
+    # 按 biz 取 entry 不看 TTL
+    assert cache.entry_for_biz('fk1')['nickname'] == 'First'
+
+
+def test_store_replaces_previous_candidates_and_skips_empty(db):
+    cache = SearchbizCache(db)
+    cache.store('keyword', {'list': [_raw('Old', 'old')]})
+    cache.store('keyword', {'list': [_raw('New', 'new')]})
+    cache.store('keyword', {'list': []})
+
+    assert cache.lookup('keyword')['fakeid'] == 'new'
+    assert db.query(MpSearchCandidate).count() == 1
+
+
+def test_falls_back_to_recently_updated_account(db):
+    db.add(MpAccount(name='Stored', biz='biz1', owner_email=OWNER, update_time=datetime.now(timezone.utc)))
+    db.commit()
+    cache = SearchbizCache(db)
+
+    assert cache.lookup('Stored')['fakeid'] == 'biz1'
+
+    acc = db.query(MpAccount).one()
+    acc.update_time = datetime.now(timezone.utc) - timedelta(seconds=settings.SEARCHBIZ_CACHE_TTL_SECONDS + 60)
+    db.commit()
+    assert cache.lookup('Stored') is None
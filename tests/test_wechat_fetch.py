@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models import Cookie
+from app.services import wechat_fetch, wechat_http
+from app.services.cookie import CookieService
+from app.services.cookie_pool import CookiePool, breaker
+from app.services.wechat_fetch import FetchErrorKind, GzhFetchError, UpstreamFetcher, backoff_delay
+from tests.conftest import OWNER
+
+OK = {'base_resp': {'ret': 0}, 'value': 'ok'}
+
+
+def _ret(code: int) -> dict:
+    return {'base_resp': {'ret': code, 'err_msg': 'upstream says no'}}
+
+
+@pytest.fixture()
+def fetcher(session_factory, tmp_path, monkeypatch):
+    """两个 cookie（tok / tok2）；上游按 replies 顺序应答，记录每次请求使用的 cookie 目录与 fingerprint。"""
+    db = session_factory()
+    db.add(Cookie(
+        token='tok2',
+        owner_email=OWNER,
+        expire_time=datetime.now(timezone.utc) + timedelta(hours=1),
+        name='second',
+        local=str(tmp_path / 'second'),
+        is_current=False,
+    ))
+    db.commit()
+    breaker._state.clear()
+    state = {'replies': [], 'calls': []}
+
+    async def aget(folder, url, *, timeout=None):
+        state['calls'].append((folder, wechat_fetch.fingerprint()))
+        reply = state['replies'].pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        status, body = reply if isinstance(reply, tuple) else (200, reply)
+        return httpx.Response(status, json=body)
+
+    async def no_sleep(seconds):
+        state.setdefault('sleeps', []).append(seconds)
+
+    monkeypatch.setattr(wechat_http, 'aget', aget)
+    monkeypatch.setattr(wechat_fetch.asyncio, 'sleep', no_sleep)
+    monkeypatch.setattr(settings, 'FETCH_MAX_ATTEMPTS', 3)
+    state['fetcher'] = UpstreamFetcher(CookiePool(db))
+    yield state
+    breaker._state.clear()
+    db.close()
+
+
+def _get(state):
+    return asyncio.run(state['fetcher'].aget(OWNER, lambda token: f'https://mp.weixin.qq.com/x?token={token}', lambda d: d['value']))
+
+
+def test_rate_limited_trips_cookie_and_regenerates_fingerprint(fetcher):
+    fetcher['replies'] = [_ret(200013), OK]
+
+    assert _get(fetcher) == 'ok'
+
+    (first, fp1), (second, fp2) = fetcher['calls']
+    assert first != second and fp1 != fp2
+    tripped = [t for t in ('tok', 'tok2') if breaker.is_open(t)]
+    assert len(tripped) == 1
+    # 频控按退避上限的后半段等待
+    assert settings.FETCH_BACKOFF_MAX_SECONDS / 2 <= fetcher['sleeps'][0] <= settings.FETCH_BACKOFF_MAX_SECONDS
+
+
+@pytest.mark.parametrize('code', [200003, 200040])
+def test_auth_errors_trip_cookie_and_switch(fetcher, code):
+    fetcher['replies'] = [_ret(code), OK]
+
+    assert _get(fetcher) == 'ok'
+
+    (first, fp1), (second, fp2) = fetcher['calls']
+    assert first != second and fp1 == fp2
+    assert sum(breaker.is_open(t) for t in ('tok', 'tok2')) == 1
+
+
+def test_transport_errors_and_5xx_retry_without_tripping(fetcher):
+    fetcher['replies'] = [httpx.ConnectError('boom'), (502, {}), OK]
+
+    assert _get(fetcher) == 'ok'
+
+    assert len(fetcher['calls']) == 3
+    assert not breaker.is_open('tok') and not breaker.is_open('tok2')
+    assert len(fetcher['sleeps']) == 2
+
+
+def test_unknown_ret_code_is_fatal(fetcher):
+    fetcher['replies'] = [_ret(200002), OK]
+
+    with pytest.raises(GzhFetchError) as err:
+        _get(fetcher)
+
+    assert err.value.kind == FetchErrorKind.fatal and err.value.ret == 200002
+    assert len(fetcher['calls']) == 1
+
+
+def test_gives_up_after_max_attempts(fetcher):
+    fetcher['replies'] = [(503, {})] * 3
+
+    with pytest.raises(GzhFetchError) as err:
+        _get(fetcher)
+
+    assert err.value.kind == FetchErrorKind.transient
+    assert len(fetcher['calls']) == settings.FETCH_MAX_ATTEMPTS
+
+
+def test_backoff_is_full_jitter_capped(monkeypatch):
+    monkeypatch.setattr(settings, 'FETCH_BACKOFF_BASE_SECONDS', 1.0)
+    monkeypatch.setattr(settings, 'FETCH_BACKOFF_MAX_SECONDS', 8.0)
+    for attempt, bound in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 8.0)]:
+        delays = [backoff_delay(attempt, FetchErrorKind.transient) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= bound
+    rate_limited = [backoff_delay(0, FetchErrorKind.rate_limited) for _ in range(200)]
+    assert 4.0 <= min(rate_limited) and max(rate_limited) <= 8.0
+
+
+def test_deleting_a_cookie_evicts_its_cached_jar(session_factory, tmp_path):
+    folder = tmp_path / 'jar'
+    folder.mkdir()
+    db = session_factory()
+    db.add(Cookie(
+        token='jar',
+        owner_email=OWNER,
+        expire_time=datetime.now(timezone.utc) + timedelta(hours=1),
+        name='jar',
+        local=str(folder),
+        is_current=False,
+    ))
+    db.commit()
+
+    async def cached_jar():
+        return await wechat_http.cookie_jar_for(str(folder))
+
+    try:
+        asyncio.run(cached_jar())
+        assert str(folder) in wechat_http._jars
+        CookieService(db, static_root=str(tmp_path / 'cookies')).delete_cookie(OWNER, 'jar')
+    finally:
+        db.close()
+
+    assert str(folder) not in wechat_http._jars
+    assert not folder.exists()